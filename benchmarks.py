@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки отрисовки планов и парсинга ответов LLM
+Функции, которые выполняются при каждом просмотре плана или генерации,
+замеряются на реалистичных данных: план на 7 дней по 5 приемов пищи
+из 6 продуктов, длинные ответы LLM, обрезанный JSON. Для каждого случая
+выводятся вызовы в секунду и пик выделенной памяти на вызов (tracemalloc);
+результат сравнивается с сохраненной базой, и при регрессии код выхода - 1.
+
+Пример:
+    python benchmarks.py                        # замер и сравнение с benchmarks_baseline.json
+    python benchmarks.py --save-baseline        # сохранить новую базу после оптимизации
+    python benchmarks.py --filter render --min-time 2
+"""
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from llm_integration import llm
+from load_test import FOODS, compact_plan_fixture
+from plan_renderer import render_plan_day, render_plan_stats
+from utils import escape_markdown
+
+BASELINE_FILE = 'benchmarks_baseline.json'
+
+# Допустимое ухудшение относительно базы: скорость шумит сильнее, чем память
+SPEED_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+# Абсолютный запас по памяти, байт: мелкие функции выделяют сотни байт, и 10% от них - шум
+MEMORY_SLACK = 1024
+
+# Сколько раз вызывать функцию под tracemalloc для оценки памяти на вызов
+MEMORY_CALLS = 20
+
+
+class Case:
+    """Случай бенчмарка: функция без аргументов над заранее подготовленными данными"""
+
+    def __init__(self, name: str, func: Callable[[], object], description: str):
+        self.name = name
+        self.func = func
+        self.description = description
+
+
+def plan_text_fixture(compact_plan: Dict) -> str:
+    """Ответ LLM в режиме JSON: компактный план без пробелов"""
+    return json.dumps(compact_plan, ensure_ascii=False, separators=(',', ':'))
+
+
+def long_questions_fixture(rng: random.Random) -> str:
+    """Длинный ответ LLM с вопросами интервью: вступление, вопросы с пояснениями, заключение"""
+    intro = (
+        "Спасибо за подробные ответы! Чтобы составить точный план питания, учитывающий "
+        "твои тренировки, восстановление и цели, мне нужно уточнить еще несколько деталей. "
+    ) * 4
+    topics = ('тренировки', 'сон', 'перекусы', 'воду', 'добавки', 'соревнования', 'аппетит')
+    questions = [
+        f"{i}. Расскажи подробнее про {topic}: как часто, в какое время суток, сколько по времени "
+        f"и как ты себя чувствуешь после ({rng.choice(('утром', 'днем', 'вечером'))})?"
+        for i, topic in enumerate(topics, 1)
+    ]
+    outro = (
+        "Отвечай в свободной форме - можно коротко. Если на какой-то вопрос ответа нет, "
+        "просто напиши \"не знаю\", и я учту это при расчете калорийности и макронутриентов. "
+    ) * 4
+    return f"{intro}\n\n" + '\n\n'.join(questions) + f"\n\n{outro}"
+
+
+def escape_text_fixture(rng: random.Random, lines: int = 60) -> str:
+    """Текст со списком продуктов и рекомендациями: много символов, которые нужно экранировать"""
+    foods = [rng.choice(FOODS) for _ in range(lines)]
+    return '\n'.join(
+        f"• {name} - {portion} ({calories} ккал, Б: {protein}г, У: {carbs}г, Ж: {fat}г). "
+        f"Рекомендация #{i}: [за 2-3 часа] до тренировки!"
+        for i, (name, portion, calories, protein, carbs, fat) in enumerate(foods, 1)
+    )
+
+
+def build_cases(seed: int = 1) -> List[Case]:
+    """Случаи бенчмарка над детерминированными данными"""
+    rng = random.Random(seed)
+    compact_plan = compact_plan_fixture(rng, days=7, meals=5, items=6)
+    plan_data = llm._expand_compact_plan(compact_plan)
+    plan_data.update({'total_calories': 2850, 'protein_grams': 165, 'carbs_grams': 340, 'fat_grams': 85})
+    plan_text = plan_text_fixture(compact_plan)
+    wrapped_plan_text = f"Вот твой план питания на неделю:\n```json\n{plan_text}\n```\nУдачных тренировок!"
+    truncated_plan_text = plan_text[:len(plan_text) * 2 // 3]
+    questions_text = long_questions_fixture(rng)
+    escape_text = escape_text_fixture(rng)
+    user_data = {'telegram_id': 1}
+
+    def render_week(parse_mode: str) -> Callable[[], object]:
+        def render():
+            for day_number in range(1, 8):
+                render_plan_day(plan_data, day_number, parse_mode)
+        return render
+
+    return [
+        Case('render_plan_day[HTML]', render_week('HTML'), '7 дней × 5 приемов × 6 продуктов'),
+        Case('render_plan_day[MarkdownV2]', render_week('MarkdownV2'), '7 дней × 5 приемов × 6 продуктов'),
+        Case('render_plan_stats[HTML]', lambda: render_plan_stats(plan_data, 'HTML'), 'макросы и список покупок'),
+        Case('escape_markdown', lambda: escape_markdown(escape_text), f'{len(escape_text)} символов'),
+        Case('_parse_questions', lambda: llm._parse_questions(questions_text), f'{len(questions_text)} символов'),
+        Case('_parse_meal_plan[json]', lambda: llm._parse_meal_plan(plan_text, user_data),
+             f'{len(plan_text)} символов'),
+        Case('_parse_meal_plan[text]', lambda: llm._parse_meal_plan(wrapped_plan_text, user_data),
+             'JSON внутри текста'),
+        Case('_parse_meal_plan[truncated]', lambda: llm._parse_meal_plan(truncated_plan_text, user_data),
+             'обрезанный JSON'),
+    ]
+
+
+def measure_speed(func: Callable[[], object], min_time: float, repeat: int = 5) -> float:
+    """Вызовов в секунду: лучший из repeat замеров, каждый не короче min_time / repeat"""
+    number = 1
+    batch_time = min_time / repeat
+    while True:
+        elapsed = _time_batch(func, number)
+        if elapsed >= batch_time:
+            break
+        number *= 10 if elapsed < batch_time / 10 else 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _time_batch(func, number))
+    return number / best
+
+
+def _time_batch(func: Callable[[], object], number: int) -> float:
+    # Как timeit: сборщик мусора не вмешивается в замер
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure_memory(func: Callable[[], object], calls: int = MEMORY_CALLS) -> float:
+    """Средний пик выделенной памяти за вызов, байт (временные объекты учитываются)"""
+    func()  # прогрев: ленивые кэши и интернированные строки не относятся к вызову
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(calls):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            total += tracemalloc.get_traced_memory()[1] - current
+        return total / calls
+    finally:
+        tracemalloc.stop()
+
+
+def run(cases: List[Case], min_time: float) -> Dict[str, Dict]:
+    results = {}
+    for case in cases:
+        results[case.name] = {
+            'ops_per_sec': measure_speed(case.func, min_time),
+            'peak_bytes_per_call': measure_memory(case.func)
+        }
+        print(_format_row(case, results[case.name]))
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], speed_tolerance: float,
+            memory_tolerance: float) -> List[str]:
+    """Регрессии относительно базы: список описаний (пустой - регрессий нет)"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name}: нет в базе")
+            continue
+        speed_change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        memory_change = result['peak_bytes_per_call'] / max(base['peak_bytes_per_call'], 1) - 1
+        print(f"  {name:<30} скорость {speed_change:+7.1%}  память {memory_change:+7.1%}")
+        if speed_change < -speed_tolerance:
+            regressions.append(f"{name}: скорость {speed_change:+.1%} (допустимо -{speed_tolerance:.0%})")
+        memory_limit = base['peak_bytes_per_call'] * (1 + memory_tolerance) + MEMORY_SLACK
+        if result['peak_bytes_per_call'] > memory_limit:
+            regressions.append(f"{name}: память {memory_change:+.1%} (допустимо +{memory_tolerance:.0%})")
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, results: Dict[str, Dict]) -> None:
+    baseline = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': {
+            name: {'ops_per_sec': round(result['ops_per_sec'], 1),
+                   'peak_bytes_per_call': round(result['peak_bytes_per_call'])}
+            for name, result in results.items()
+        }
+    }
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(baseline, baseline_file, ensure_ascii=False, indent=2)
+        baseline_file.write('\n')
+
+
+def _format_row(case: Case, result: Dict) -> str:
+    return (f"{case.name:<30} {result['ops_per_sec']:>12,.0f} выз/с  "
+            f"{result['peak_bytes_per_call'] / 1024:>9.1f} КБ/выз  {case.description}")
+
+
+def main():
+    """Запуск бенчмарков из командной строки"""
+    parser = argparse.ArgumentParser(description='Микробенчмарки отрисовки планов и парсинга ответов LLM')
+    parser.add_argument('--filter', default='', help='запускать только случаи, имя которых содержит строку')
+    parser.add_argument('--min-time', type=float, default=1.0, help='время замера скорости одного случая, с')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='файл базы для сравнения')
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты как новую базу')
+    parser.add_argument('--speed-tolerance', type=float, default=SPEED_TOLERANCE,
+                        help='допустимое замедление (доля)')
+    parser.add_argument('--memory-tolerance', type=float, default=MEMORY_TOLERANCE,
+                        help='допустимый рост памяти на вызов (доля)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Обрезанный JSON - ожидаемая ошибка парсинга; ее лог на каждый вызов исказит замер
+    logging.disable(logging.CRITICAL)
+
+    cases = [case for case in build_cases(args.seed) if args.filter in case.name]
+    if not cases:
+        parser.error(f"Нет случаев, содержащих '{args.filter}'")
+    results = run(cases, args.min_time)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n💾 База сохранена в {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nБаза {args.baseline} не найдена - сохраните ее флагом --save-baseline")
+        return
+    if baseline.get('python') != platform.python_version() or baseline.get('machine') != platform.machine():
+        print(f"\n⚠️ База снята на Python {baseline.get('python')} ({baseline.get('machine')}) - "
+              f"сравнение скорости приблизительное")
+
+    print("\nСравнение с базой:")
+    regressions = compare(results, baseline['results'], args.speed_tolerance, args.memory_tolerance)
+    if regressions:
+        print("\n❌ Регрессии:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\n✅ Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,14 @@ class Config:
     DB_NAME: str = os.getenv('DB_NAME', 'ai_diet_bot')
     DB_USER: str = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD: str = os.getenv('DB_PASSWORD', '')
+    # Применять миграции схемы при запуске бота
+    DB_AUTO_MIGRATE: bool = os.getenv('DB_AUTO_MIGRATE', 'true').lower() == 'true'
+    
+    # Секционирование meals/activities/workouts по месяцам
+    PARTITION_MONTHS_AHEAD: int = int(os.getenv('PARTITION_MONTHS_AHEAD', '2'))
+    # Хранить секции за N месяцев (0 - хранить все)
+    PARTITION_RETENTION_MONTHS: int = int(os.getenv('PARTITION_RETENTION_MONTHS', '0'))
+    PARTITION_ARCHIVE_SCHEMA: str = os.getenv('PARTITION_ARCHIVE_SCHEMA', 'archive')
     
     # Настройки вебхука для Amvera
     WEBHOOK_URL: str = os.getenv('WEBHOOK_URL', '')
@@ -35,10 +43,59 @@ class Config:
     DEEPSEEK_BASE_URL: str = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com/v1')
     DEEPSEEK_TEMPERATURE: float = float(os.getenv('DEEPSEEK_TEMPERATURE', '0.7'))
     DEEPSEEK_MAX_TOKENS: int = int(os.getenv('DEEPSEEK_MAX_TOKENS', '4000'))
+    # Поддерживает ли провайдер response_format с JSON-схемой (иначе - json_object)
+    DEEPSEEK_JSON_SCHEMA: bool = os.getenv('DEEPSEEK_JSON_SCHEMA', 'false').lower() == 'true'
+    
+    # Размыкатель цепи DeepSeek: после N ошибок подряд запросы не отправляются RESET_SECONDS секунд
+    LLM_CIRCUIT_FAILURES: int = int(os.getenv('LLM_CIRCUIT_FAILURES', '5'))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv('LLM_CIRCUIT_RESET_SECONDS', '60'))
+    
+    # Настройки приближенного кэша ответов LLM
+    LLM_CACHE_ENABLED: bool = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_SIZE: int = int(os.getenv('LLM_CACHE_SIZE', '256'))
+    LLM_CACHE_THRESHOLD: float = float(os.getenv('LLM_CACHE_THRESHOLD', '0.9'))
+    
+    # Настройки библиотеки шаблонов планов питания
+    PLAN_TEMPLATES_ENABLED: bool = os.getenv('PLAN_TEMPLATES_ENABLED', 'true').lower() == 'true'
+    PLAN_TEMPLATE_MAX_DISTANCE: float = float(os.getenv('PLAN_TEMPLATE_MAX_DISTANCE', '1.5'))
+    PLAN_TEMPLATE_LIBRARY_SIZE: int = int(os.getenv('PLAN_TEMPLATE_LIBRARY_SIZE', '500'))
+    
+    # Упреждающая генерация каркаса плана во время интервью об активности
+    PLAN_SPECULATION_ENABLED: bool = os.getenv('PLAN_SPECULATION_ENABLED', 'false').lower() == 'true'
+    PLAN_SKELETON_MAX_TOKENS: int = int(os.getenv('PLAN_SKELETON_MAX_TOKENS', '600'))
+    PLAN_SKELETON_WAIT_SECONDS: float = float(os.getenv('PLAN_SKELETON_WAIT_SECONDS', '10'))
+    PLAN_SPECULATION_DAILY_TOKENS: int = int(os.getenv('PLAN_SPECULATION_DAILY_TOKENS', '200000'))
     
     # Настройки бота
     ADMIN_USER_ID: int = int(os.getenv('ADMIN_USER_ID', '0'))
     SUPPORT_CHAT_ID: str = os.getenv('SUPPORT_CHAT_ID', '')
+    SAVED_PLANS_PAGE_SIZE: int = int(os.getenv('SAVED_PLANS_PAGE_SIZE', '5'))
+    KEYBOARD_CACHE_SIZE: int = int(os.getenv('KEYBOARD_CACHE_SIZE', '1024'))
+    
+    # Лимиты исходящих сообщений Telegram (сообщений в секунду)
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+    TELEGRAM_CHAT_RATE: float = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_CHAT_BURST: float = float(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+    TELEGRAM_MAX_RETRIES: int = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+    # Разметка планов питания: HTML или MarkdownV2
+    TELEGRAM_PARSE_MODE: str = os.getenv('TELEGRAM_PARSE_MODE', 'HTML')
+    
+    # Монитор задержки цикла событий: блокировки дольше порога атрибутируются обработчику
+    LOOP_MONITOR_ENABLED: bool = os.getenv('LOOP_MONITOR_ENABLED', 'false').lower() == 'true'
+    LOOP_MONITOR_INTERVAL_MS: float = float(os.getenv('LOOP_MONITOR_INTERVAL_MS', '100'))
+    LOOP_LAG_THRESHOLD_MS: float = float(os.getenv('LOOP_LAG_THRESHOLD_MS', '100'))
+    
+    # Сэмплирующее профилирование обработчиков (также команда /profile администратора)
+    PROFILE_ON_START: bool = os.getenv('PROFILE_ON_START', 'false').lower() == 'true'
+    PROFILE_SECONDS: float = float(os.getenv('PROFILE_SECONDS', '60'))
+    PROFILE_MAX_SECONDS: float = float(os.getenv('PROFILE_MAX_SECONDS', '600'))
+    PROFILE_INTERVAL_MS: float = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+    PROFILE_DIR: str = os.getenv('PROFILE_DIR', 'profiles')
+    
+    # HTTP-сервер вебхука, /health, /healthz и /metrics
+    PORT: int = int(os.getenv('PORT', '8080'))
+    # Токен доступа к /metrics (пусто - без авторизации)
+    METRICS_TOKEN: str = os.getenv('METRICS_TOKEN', '')
     
     # Настройки логирования
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
@@ -64,6 +121,8 @@ class Config:
             raise ValueError("BOT_TOKEN не установлен")
         if not self.DEEPSEEK_API_KEY:
             raise ValueError("DEEPSEEK_API_KEY не установлен")
+        if self.TELEGRAM_PARSE_MODE not in ('HTML', 'MarkdownV2'):
+            raise ValueError("TELEGRAM_PARSE_MODE должен быть HTML или MarkdownV2")
         
         # Предупреждения для разработки
         if not self.IS_PRODUCTION:
@@ -4,20 +4,43 @@
 """
 
 import logging
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from collections import OrderedDict
+from contextlib import contextmanager
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, date
 from config import config
+from metrics import metrics
+from plan_validation import validate_plan_totals
+from plan_storage import (
+    STORAGE_JSONB, STORAGE_NORMALIZED, DAY_COLUMNS, MEAL_COLUMNS, ITEM_COLUMNS,
+    collect_strings, split_plan, assemble_days, string_digest
+)
 
 logger = logging.getLogger(__name__)
 
 class Database:
     """Класс для работы с базой данных PostgreSQL"""
     
+    # Ограничение размера кэша словаря plan_strings в памяти
+    STRING_CACHE_LIMIT = 50000
+    # Ограничение размера кэша telegram_id -> athletes.id
+    ATHLETE_CACHE_LIMIT = 10000
+    
     def __init__(self):
         self.connection = None
         self.cursor = None
+        # Кэш id строк словаря plan_strings: текст -> id
+        self._string_ids: Dict[str, int] = {}
+        # Кэш athletes.id по telegram_id: дочерние таблицы ссылаются на athletes.id
+        self._athlete_ids: 'OrderedDict[int, int]' = OrderedDict()
+        # Соединение одно на процесс: "пул" занят, пока выполняется запрос или транзакция
+        self.busy = 0
+        metrics.register_gauge('db_connection_open', lambda: int(bool(self.connection) and not self.connection.closed))
+        metrics.register_gauge('db_connection_busy', lambda: self.busy)
+        metrics.register_gauge('db_athlete_cache_size', lambda: len(self._athlete_ids))
     
     def connect(self):
         """Установить соединение с базой данных"""
@@ -42,21 +65,84 @@ class Database:
     
     def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
         """Выполнить запрос и вернуть результаты"""
+        statement = query.lstrip()[:6].lower()
+        started = time.perf_counter()
+        self.busy += 1
         try:
             self.cursor.execute(query, params)
-            if query.strip().upper().startswith('SELECT'):
-                return self.cursor.fetchall()
-            self.connection.commit()
-            return []
+            # INSERT ... RETURNING тоже возвращает строки
+            result = self.cursor.fetchall() if self.cursor.description is not None else []
+            if statement != 'select':
+                self.connection.commit()
+            return result
         except Exception as e:
             self.connection.rollback()
+            metrics.inc('db_errors_total')
             logger.error(f"❌ Ошибка выполнения запроса: {e}")
             raise
+        finally:
+            self.busy -= 1
+            metrics.observe('db_query_seconds', time.perf_counter() - started, statement=statement)
+    
+    def ping(self) -> bool:
+        """Проверка соединения с базой данных"""
+        try:
+            self.execute_query("SELECT 1")
+            return True
+        except Exception:
+            return False
+    
+    @contextmanager
+    def transaction(self):
+        """Выполнить несколько запросов в одной транзакции"""
+        started = time.perf_counter()
+        self.busy += 1
+        try:
+            yield self.cursor
+            self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            # id строк словаря, добавленных в отмененной транзакции, недействительны
+            self._string_ids.clear()
+            metrics.inc('db_errors_total')
+            logger.error(f"❌ Ошибка выполнения транзакции: {e}")
+            raise
+        finally:
+            self.busy -= 1
+            metrics.observe('db_transaction_seconds', time.perf_counter() - started)
+    
+    def _remember_athlete(self, telegram_id: int, athlete_id: int) -> None:
+        self._athlete_ids[telegram_id] = athlete_id
+        self._athlete_ids.move_to_end(telegram_id)
+        if len(self._athlete_ids) > self.ATHLETE_CACHE_LIMIT:
+            self._athlete_ids.popitem(last=False)
+    
+    def resolve_athlete_id(self, user_id: int) -> Optional[int]:
+        """Получить athletes.id по telegram_id пользователя (с кэшированием)"""
+        athlete_id = self._athlete_ids.get(user_id)
+        if athlete_id is not None:
+            self._athlete_ids.move_to_end(user_id)
+            return athlete_id
+        
+        result = self.execute_query("SELECT id FROM athletes WHERE telegram_id = %s", (user_id,))
+        if not result:
+            return None
+        self._remember_athlete(user_id, result[0]['id'])
+        return result[0]['id']
+    
+    def _require_athlete_id(self, user_id: int) -> int:
+        """athletes.id для записи в дочерние таблицы; пользователь должен существовать"""
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            raise ValueError(f"Пользователь {user_id} не найден")
+        return athlete_id
     
     def get_user(self, user_id: int) -> Optional[Dict]:
         """Получить пользователя по ID"""
         query = "SELECT * FROM athletes WHERE telegram_id = %s"
         result = self.execute_query(query, (user_id,))
+        if result:
+            self._remember_athlete(user_id, result[0]['id'])
         return result[0] if result else None
     
     def create_user(self, user_data: Dict) -> int:
@@ -81,6 +167,8 @@ class Database:
             datetime.now()
         )
         result = self.execute_query(query, params)
+        if result:
+            self._remember_athlete(user_data['telegram_id'], result[0]['id'])
         return result[0]['id'] if result else None
     
     def update_user(self, user_id: int, update_data: Dict) -> bool:
@@ -96,72 +184,300 @@ class Database:
         return True
     
     def save_meal_plan(self, user_id: int, plan_data: Dict, days: int = 7) -> int:
-        """Сохранить план питания"""
+        """Сохранить план питания (user_id - telegram_id пользователя)"""
+        athlete_id = self._require_athlete_id(user_id)
+        
+        # Итоги от LLM не проверены - пересчитываем их из продуктов перед сохранением
+        issues = validate_plan_totals(plan_data)
+        if issues:
+            logger.warning(f"⚠️ Исправлено {len(issues)} итоговых значений плана питания")
+        
         query = """
         INSERT INTO meal_plans (
             athlete_id, plan_type, duration_days, total_calories, 
-            protein_grams, carbs_grams, fat_grams, plan_data, created_at
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            protein_grams, carbs_grams, fat_grams, plan_data, storage_format, created_at
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
         """
-        params = (
-            user_id, plan_data.get('plan_type', 'custom'), days,
-            plan_data.get('total_calories', 0), plan_data.get('protein_grams', 0),
-            plan_data.get('carbs_grams', 0), plan_data.get('fat_grams', 0),
-            plan_data, datetime.now()
-        )
-        result = self.execute_query(query, params)
-        return result[0]['id'] if result else None
+        with self.transaction() as cursor:
+            header, day_rows, meal_rows, item_rows = split_plan(plan_data, self._intern_strings(cursor, plan_data))
+            cursor.execute(query, (
+                athlete_id, plan_data.get('plan_type', 'custom'), days,
+                plan_data.get('total_calories', 0), plan_data.get('protein_grams', 0),
+                plan_data.get('carbs_grams', 0), plan_data.get('fat_grams', 0),
+                Json(header), STORAGE_NORMALIZED, datetime.now()
+            ))
+            plan_id = cursor.fetchone()['id']
+            self._insert_plan_rows(cursor, plan_id, day_rows, meal_rows, item_rows)
+        return plan_id
+    
+    def _intern_strings(self, cursor, plan_data: Dict) -> Dict[str, int]:
+        """Получить id всех текстов плана в словаре plan_strings, добавив новые"""
+        strings = collect_strings(plan_data)
+        missing = [value for value in strings if value not in self._string_ids]
+        if missing and len(self._string_ids) + len(missing) > self.STRING_CACHE_LIMIT:
+            # Кэш очищается до запроса: id уже известных строк плана тоже нужно перечитать
+            self._string_ids.clear()
+            missing = list(strings)
+        
+        if missing:
+            digests = [string_digest(value) for value in missing]
+            cursor.execute("""
+                INSERT INTO plan_strings (value_md5, value)
+                SELECT * FROM unnest(%s::char(32)[], %s::text[])
+                ON CONFLICT (value_md5) DO NOTHING
+            """, (digests, missing))
+            cursor.execute("SELECT id, value FROM plan_strings WHERE value_md5 = ANY(%s::char(32)[])", (digests,))
+            for row in cursor.fetchall():
+                self._string_ids[row['value']] = row['id']
+        
+        return {value: self._string_ids[value] for value in strings}
+    
+    def _insert_plan_rows(self, cursor, plan_id: int, day_rows: List[tuple],
+                          meal_rows: List[tuple], item_rows: List[tuple]) -> None:
+        """Записать дни, приемы пищи и продукты плана в дочерние таблицы"""
+        for table, columns, rows in (
+            ('meal_plan_days', DAY_COLUMNS, day_rows),
+            ('meal_plan_meals', MEAL_COLUMNS, meal_rows),
+            ('meal_plan_items', ITEM_COLUMNS, item_rows)
+        ):
+            if not rows:
+                continue
+            values = [(plan_id, *row[:-1], Json(row[-1]) if row[-1] else None) for row in rows]
+            execute_values(
+                cursor,
+                f"INSERT INTO {table} (plan_id, {', '.join(columns)}) VALUES %s",
+                values,
+                page_size=500
+            )
+    
+    def _load_plan_days(self, plan_ids: List[int], day_number: int = None) -> Dict[int, List[Dict]]:
+        """Прочитать дни планов из дочерних таблиц с раскодированием текстов"""
+        day_filter = " AND {alias}.day_number = %s" if day_number is not None else ""
+        params = (plan_ids, day_number) if day_number is not None else (plan_ids,)
+        
+        day_rows = self.execute_query(f"""
+            SELECT d.plan_id, d.day_number, d.day_date AS date,
+                   ts.value AS training_schedule, hy.value AS hydration, rc.value AS general_recommendations,
+                   d.total_calories, d.total_protein, d.total_carbs, d.total_fat, d.extra
+            FROM meal_plan_days d
+            LEFT JOIN plan_strings ts ON ts.id = d.training_schedule_id
+            LEFT JOIN plan_strings hy ON hy.id = d.hydration_id
+            LEFT JOIN plan_strings rc ON rc.id = d.recommendations_id
+            WHERE d.plan_id = ANY(%s){day_filter.format(alias='d')}
+            ORDER BY d.plan_id, d.day_number
+        """, params)
+        meal_rows = self.execute_query(f"""
+            SELECT m.plan_id, m.day_number, m.meal_index, m.meal_time AS time,
+                   mt.value AS meal_type, rc.value AS recommendations,
+                   m.total_calories, m.total_protein, m.total_carbs, m.total_fat, m.extra
+            FROM meal_plan_meals m
+            LEFT JOIN plan_strings mt ON mt.id = m.meal_type_id
+            LEFT JOIN plan_strings rc ON rc.id = m.recommendations_id
+            WHERE m.plan_id = ANY(%s){day_filter.format(alias='m')}
+            ORDER BY m.plan_id, m.day_number, m.meal_index
+        """, params)
+        item_rows = self.execute_query(f"""
+            SELECT i.plan_id, i.day_number, i.meal_index, i.item_index,
+                   nm.value AS name, pr.value AS portion,
+                   i.calories, i.protein, i.carbs, i.fat, i.extra
+            FROM meal_plan_items i
+            LEFT JOIN plan_strings nm ON nm.id = i.name_id
+            LEFT JOIN plan_strings pr ON pr.id = i.portion_id
+            WHERE i.plan_id = ANY(%s){day_filter.format(alias='i')}
+            ORDER BY i.plan_id, i.day_number, i.meal_index, i.item_index
+        """, params)
+        
+        return assemble_days(day_rows, meal_rows, item_rows)
+    
+    def _attach_plan_data(self, rows: List[Dict]) -> List[Dict]:
+        """Восстановить полный plan_data для строк meal_plans в нормализованном формате"""
+        normalized = [row for row in rows if row.get('storage_format') == STORAGE_NORMALIZED]
+        if normalized:
+            days = self._load_plan_days([row['id'] for row in normalized])
+            for row in normalized:
+                row['plan_data'] = {**(row['plan_data'] or {}), 'days': days.get(row['id'], [])}
+        return rows
     
     def get_user_plans(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Получить планы питания пользователя"""
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return []
+        
         query = """
-        SELECT mp.* FROM meal_plans mp
-        JOIN athletes a ON mp.athlete_id = a.id
-        WHERE a.telegram_id = %s
-        ORDER BY mp.created_at DESC
+        SELECT * FROM meal_plans
+        WHERE athlete_id = %s
+        ORDER BY created_at DESC
         LIMIT %s
         """
-        return self.execute_query(query, (user_id, limit))
+        return self._attach_plan_data(self.execute_query(query, (athlete_id, limit)))
+    
+    def get_user_plans_page(self, user_id: int, cursor: Optional[Tuple[datetime, int]] = None,
+                            limit: int = 5) -> Tuple[List[Dict], Optional[Tuple[datetime, int]]]:
+        """
+        Страница заголовков планов пользователя (без plan_data), от новых к старым.
+        
+        cursor - (created_at, id) последнего плана предыдущей страницы.
+        Возвращает планы и курсор следующей страницы (None, если страниц больше нет).
+        """
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return [], None
+        
+        query = """
+        SELECT id, plan_type, duration_days, total_calories, created_at
+        FROM meal_plans
+        WHERE athlete_id = %s
+        """
+        params: List[Any] = [athlete_id]
+        if cursor:
+            query += " AND (created_at, id) < (%s, %s)"
+            params.extend(cursor)
+        query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.append(limit + 1)
+        
+        rows = self.execute_query(query, tuple(params))
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, (rows[-1]['created_at'], rows[-1]['id'])
+        return rows, None
     
     def get_plan_by_id(self, plan_id: int) -> Optional[Dict]:
         """Получить план питания по ID"""
         query = "SELECT * FROM meal_plans WHERE id = %s"
-        result = self.execute_query(query, (plan_id,))
+        result = self._attach_plan_data(self.execute_query(query, (plan_id,)))
         return result[0] if result else None
     
+    def get_plan_data(self, plan_id: int) -> Optional[Dict]:
+        """Получить plan_data плана питания в исходном формате словаря"""
+        plan = self.get_plan_by_id(plan_id)
+        return plan['plan_data'] if plan else None
+    
+    def get_plan_day(self, plan_id: int, day_number: int) -> Optional[Dict]:
+        """Получить один день плана питания без чтения остальных дней"""
+        query = "SELECT storage_format, plan_data FROM meal_plans WHERE id = %s"
+        result = self.execute_query(query, (plan_id,))
+        if not result:
+            return None
+        
+        if result[0]['storage_format'] == STORAGE_NORMALIZED:
+            days = self._load_plan_days([plan_id], day_number).get(plan_id)
+            return days[0] if days else None
+        
+        # Как и в нормализованном формате и при отрисовке, номер дня - позиция в списке
+        days = result[0]['plan_data'].get('days') or []
+        return days[day_number - 1] if 1 <= day_number <= len(days) else None
+    
+    def migrate_plan_storage(self, batch_size: int = 100) -> int:
+        """Перевести планы из формата JSONB в нормализованный формат"""
+        migrated = 0
+        while True:
+            rows = self.execute_query("""
+                SELECT id, plan_data FROM meal_plans
+                WHERE storage_format = %s
+                ORDER BY id
+                LIMIT %s
+            """, (STORAGE_JSONB, batch_size))
+            if not rows:
+                break
+            
+            with self.transaction() as cursor:
+                for row in rows:
+                    plan_data = row['plan_data']
+                    header, day_rows, meal_rows, item_rows = split_plan(
+                        plan_data, self._intern_strings(cursor, plan_data)
+                    )
+                    self._insert_plan_rows(cursor, row['id'], day_rows, meal_rows, item_rows)
+                    cursor.execute(
+                        "UPDATE meal_plans SET plan_data = %s, storage_format = %s WHERE id = %s",
+                        (Json(header), STORAGE_NORMALIZED, row['id'])
+                    )
+            migrated += len(rows)
+            logger.info(f"✅ Перенесено планов питания в нормализованный формат: {migrated}")
+        
+        return migrated
+    
+    def get_plan_template_candidates(self, limit: int = 500) -> List[Dict]:
+        """Получить последние планы с профилем спортсмена и ответами интервью"""
+        query = """
+        SELECT mp.id, mp.plan_data, mp.storage_format,
+               a.gender, a.age, a.weight, a.height, a.sport_type, a.goal, a.competition_date,
+               interview.activity_data AS interview_answers
+        FROM meal_plans mp
+        JOIN athletes a ON mp.athlete_id = a.id
+        LEFT JOIN LATERAL (
+            SELECT act.activity_data FROM activities act
+            WHERE act.athlete_id = mp.athlete_id
+              AND act.activity_type = 'interview_completed'
+              AND act.created_at <= mp.created_at + INTERVAL '1 minute'
+            ORDER BY act.created_at DESC
+            LIMIT 1
+        ) interview ON TRUE
+        ORDER BY mp.created_at DESC
+        LIMIT %s
+        """
+        return self._attach_plan_data(self.execute_query(query, (limit,)))
+    
     def save_activity(self, user_id: int, activity_type: str, data: Dict) -> int:
         """Сохранить активность пользователя"""
+        athlete_id = self._require_athlete_id(user_id)
         query = """
         INSERT INTO activities (
             athlete_id, activity_type, activity_data, created_at
         ) VALUES (%s, %s, %s, %s)
         RETURNING id
         """
-        params = (user_id, activity_type, data, datetime.now())
+        params = (athlete_id, activity_type, Json(data), datetime.now())
         result = self.execute_query(query, params)
         return result[0]['id'] if result else None
     
     def get_user_activities(self, user_id: int, activity_type: str = None, limit: int = 50) -> List[Dict]:
         """Получить активности пользователя"""
-        query = """
-        SELECT a.* FROM activities a
-        JOIN athletes ath ON a.athlete_id = ath.id
-        WHERE ath.telegram_id = %s
-        """
-        params = [user_id]
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return []
+        
+        query = "SELECT * FROM activities WHERE athlete_id = %s"
+        params = [athlete_id]
         
         if activity_type:
-            query += " AND a.activity_type = %s"
+            query += " AND activity_type = %s"
             params.append(activity_type)
         
-        query += " ORDER BY a.created_at DESC LIMIT %s"
+        query += " ORDER BY created_at DESC LIMIT %s"
         params.append(limit)
         
         return self.execute_query(query, tuple(params))
     
+    def get_user_activities_page(self, user_id: int, activity_type: str = None,
+                                 cursor: Optional[Tuple[datetime, int]] = None,
+                                 limit: int = 20) -> Tuple[List[Dict], Optional[Tuple[datetime, int]]]:
+        """Страница заголовков активностей пользователя (без activity_data), от новых к старым"""
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return [], None
+        
+        query = "SELECT id, activity_type, created_at FROM activities WHERE athlete_id = %s"
+        params: List[Any] = [athlete_id]
+        if activity_type:
+            query += " AND activity_type = %s"
+            params.append(activity_type)
+        if cursor:
+            query += " AND (created_at, id) < (%s, %s)"
+            params.extend(cursor)
+        query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.append(limit + 1)
+        
+        rows = self.execute_query(query, tuple(params))
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, (rows[-1]['created_at'], rows[-1]['id'])
+        return rows, None
+    
     def log_meal(self, user_id: int, meal_data: Dict) -> int:
         """Записать прием пищи"""
+        athlete_id = self._require_athlete_id(user_id)
         query = """
         INSERT INTO meals (
             athlete_id, meal_type, food_items, calories, 
@@ -169,23 +485,104 @@ class Database:
         ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
         """
+        meal_time = meal_data.get('meal_time', datetime.now())
+        nutrients = (
+            meal_data.get('calories') or 0, meal_data.get('protein_grams') or 0,
+            meal_data.get('carbs_grams') or 0, meal_data.get('fat_grams') or 0
+        )
         params = (
-            user_id, meal_data.get('meal_type'), meal_data.get('food_items'),
-            meal_data.get('calories', 0), meal_data.get('protein_grams', 0),
-            meal_data.get('carbs_grams', 0), meal_data.get('fat_grams', 0),
-            meal_data.get('meal_time', datetime.now()), datetime.now()
+            athlete_id, meal_data.get('meal_type'), Json(meal_data.get('food_items')),
+            *nutrients, meal_time, datetime.now()
         )
-        result = self.execute_query(query, params)
-        return result[0]['id'] if result else None
+        
+        # Дневная сводка обновляется в той же транзакции, что и запись приема пищи
+        rollup_query = """
+        INSERT INTO daily_nutrition (
+            athlete_id, day, calories, protein_grams, carbs_grams, fat_grams, meal_count, updated_at
+        ) VALUES (%s, %s::date, %s, %s, %s, %s, 1, %s)
+        ON CONFLICT (athlete_id, day) DO UPDATE SET
+            calories = daily_nutrition.calories + EXCLUDED.calories,
+            protein_grams = daily_nutrition.protein_grams + EXCLUDED.protein_grams,
+            carbs_grams = daily_nutrition.carbs_grams + EXCLUDED.carbs_grams,
+            fat_grams = daily_nutrition.fat_grams + EXCLUDED.fat_grams,
+            meal_count = daily_nutrition.meal_count + 1,
+            updated_at = EXCLUDED.updated_at
+        """
+        with self.transaction() as cursor:
+            cursor.execute(query, params)
+            meal_id = cursor.fetchone()['id']
+            cursor.execute(rollup_query, (athlete_id, meal_time, *nutrients, datetime.now()))
+        return meal_id
     
     def get_today_meals(self, user_id: int) -> List[Dict]:
         """Получить приемы пищи за сегодня"""
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return []
+        
         query = """
         SELECT * FROM meals 
-        WHERE athlete_id = %s AND DATE(meal_time) = CURRENT_DATE
+        WHERE athlete_id = %s
+          AND meal_time >= CURRENT_DATE AND meal_time < CURRENT_DATE + INTERVAL '1 day'
         ORDER BY meal_time
         """
-        return self.execute_query(query, (user_id,))
+        return self.execute_query(query, (athlete_id,))
+    
+    def get_today_vs_target(self, user_id: int) -> Optional[Dict]:
+        """Сравнить питание за сегодня с дневной целью последнего плана"""
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return None
+        
+        query = """
+        SELECT CURRENT_DATE AS day,
+               COALESCE(dn.calories, 0) AS calories, COALESCE(dn.protein_grams, 0) AS protein_grams,
+               COALESCE(dn.carbs_grams, 0) AS carbs_grams, COALESCE(dn.fat_grams, 0) AS fat_grams,
+               COALESCE(dn.meal_count, 0) AS meal_count,
+               mp.total_calories AS target_calories, mp.protein_grams AS target_protein_grams,
+               mp.carbs_grams AS target_carbs_grams, mp.fat_grams AS target_fat_grams
+        FROM (SELECT 1) AS one
+        LEFT JOIN daily_nutrition dn ON dn.athlete_id = %s AND dn.day = CURRENT_DATE
+        LEFT JOIN LATERAL (
+            SELECT total_calories, protein_grams, carbs_grams, fat_grams
+            FROM meal_plans
+            WHERE athlete_id = %s
+            ORDER BY created_at DESC
+            LIMIT 1
+        ) mp ON TRUE
+        """
+        row = self.execute_query(query, (athlete_id, athlete_id))[0]
+        
+        consumed = {key: row[key] for key in ('calories', 'protein_grams', 'carbs_grams', 'fat_grams')}
+        target = {key: row[f'target_{key}'] for key in consumed}
+        remaining = {
+            key: (target[key] - consumed[key]) if target[key] is not None else None
+            for key in consumed
+        }
+        return {
+            'day': row['day'],
+            'meal_count': row['meal_count'],
+            'consumed': consumed,
+            'target': target,
+            'remaining': remaining
+        }
+    
+    def get_nutrition_trend(self, user_id: int, days: int = 7) -> List[Dict]:
+        """Дневные итоги питания за последние days дней (дни без записей - нулевые)"""
+        athlete_id = self.resolve_athlete_id(user_id)
+        if athlete_id is None:
+            return []
+        
+        query = """
+        SELECT d.day::date AS day,
+               COALESCE(dn.calories, 0) AS calories, COALESCE(dn.protein_grams, 0) AS protein_grams,
+               COALESCE(dn.carbs_grams, 0) AS carbs_grams, COALESCE(dn.fat_grams, 0) AS fat_grams,
+               COALESCE(dn.meal_count, 0) AS meal_count
+        FROM generate_series(CURRENT_DATE - (%s - 1), CURRENT_DATE, INTERVAL '1 day') AS d(day)
+        LEFT JOIN daily_nutrition dn ON dn.athlete_id = %s AND dn.day = d.day::date
+        ORDER BY d.day
+        """
+        return self.execute_query(query, (days, athlete_id))
     
     def validate_competition_date(self, competition_date: date) -> bool:
         """Проверить валидность даты соревнований"""
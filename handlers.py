@@ -3,37 +3,83 @@
 Реализует всю логику согласно Sequence Diagram
 """
 
+import asyncio
 import logging
 import json
+from collections import OrderedDict
 from datetime import datetime, date
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from typing import Dict, List, Optional, Tuple
 
 from config import config
 from database import db
 from llm_integration import llm
+from metrics import metrics
+from plan_templates import plan_library
+from telegram_sender import sender
+from utils import (
+    main_menu_keyboard, start_interview_keyboard, continue_interview_keyboard,
+    view_plan_keyboard, saved_plans_keyboard, decode_callback, decode_page_cursor
+)
+from plan_renderer import render_plan_day, render_plan_stats, split_message
+from onboarding import apply_input, first_prompt
+from profiler import profiler, profiled
 
 logger = logging.getLogger(__name__)
 
 # Состояния ConversationHandler
 MAIN_MENU, COLLECTING_PARAMS, TRAINING_INTERVIEW, ACTIVITY_INTERVIEW, VIEWING_PLAN, VIEWING_SAVED_PLANS = range(6)
+STATE_NAMES = {
+    MAIN_MENU: 'main_menu',
+    COLLECTING_PARAMS: 'collecting_params',
+    TRAINING_INTERVIEW: 'training_interview',
+    ACTIVITY_INTERVIEW: 'activity_interview',
+    VIEWING_PLAN: 'viewing_plan',
+    VIEWING_SAVED_PLANS: 'viewing_saved_plans',
+    ConversationHandler.WAITING: 'waiting'
+}
 
 # Глобальные переменные для хранения данных интервью
 user_interview_data = {}
 
+# Фоновые задачи интервью: user_id -> {тип интервью или 'skeleton' (каркас плана): задача}
+INTERVIEW_TYPES = ('training', 'activity')
+PREFETCH_LIMIT = 10000
+interview_prefetch: 'OrderedDict[int, Dict[str, asyncio.Task]]' = OrderedDict()
+
+# Число отмен (/cancel) по пользователям: обработчик, ожидавший LLM, сверяет его
+# со значением на момент запуска и не продолжает отмененный диалог
+cancel_generations: Dict[int, int] = {}
+
+metrics.register_gauge('interview_sessions', lambda: len(user_interview_data))
+metrics.register_gauge('interview_prefetch_users', lambda: len(interview_prefetch))
+metrics.register_gauge('keyboard_cache_hit_rate', lambda: _hit_rate(view_plan_keyboard.cache_info()))
+
+
+def _hit_rate(info) -> float:
+    lookups = info.hits + info.misses
+    return info.hits / lookups if lookups else 0.0
+
+def _cancelled_since(user_id: int, generation: int) -> bool:
+    """Пользователь отправил /cancel, пока обработчик ждал"""
+    return cancel_generations.get(user_id, 0) != generation
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработчик команды /start"""
     user = update.effective_user
     logger.info(f"👤 Пользователь {user.id} начал работу с ботом")
     
+    # /start прерывает просмотр плана (allow_reentry) - окно плана больше не нужно
+    context.user_data.pop('plan_window', None)
+    
     # Проверяем, есть ли пользователь в базе
     existing_user = db.get_user(user.id)
     
     if existing_user:
         # Пользователь уже существует - показываем главное меню
         welcome_text = f"С возвращением, {user.first_name}! 🏋️‍♂️\n\nГотовы продолжить работу над вашим питанием?"
-        await update.message.reply_text(welcome_text, reply_markup=main_menu_keyboard())
+        await sender.reply_text(update.message, welcome_text, reply_markup=main_menu_keyboard())
         return MAIN_MENU
     else:
         # Новый пользователь - начинаем сбор параметров
@@ -43,105 +89,25 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             "идеального плана питания для спортивных достижений! 🥇\n\n"
             "Для начала, давай познакомимся поближе. Ответь на несколько вопросов о себе:"
         )
-        await update.message.reply_text(welcome_text)
+        await sender.reply_text(update.message, welcome_text)
         
         # Запрашиваем первый параметр
-        await update.message.reply_text("🚀 Какой у тебя вид спорта? (например: бег, плавание, футбол)")
+        context.user_data['user_data'] = {}
+        await sender.reply_text(update.message, first_prompt())
         return COLLECTING_PARAMS
 
+@profiled
 async def collect_parameters(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Сбор основных параметров пользователя"""
-    user = update.effective_user
     user_data = context.user_data.setdefault('user_data', {})
     
-    # Определяем, какой параметр собираем
-    current_step = user_data.get('current_step', 'sport_type')
-    
-    if current_step == 'sport_type':
-        user_data['sport_type'] = update.message.text
-        user_data['current_step'] = 'gender'
-        await update.message.reply_text("👫 Укажи свой пол (мужской/женский):")
-        
-    elif current_step == 'gender':
-        gender = update.message.text.lower()
-        if gender in ['мужской', 'муж', 'm']:
-            user_data['gender'] = 'male'
-        elif gender in ['женский', 'жен', 'f']:
-            user_data['gender'] = 'female'
-        else:
-            await update.message.reply_text("Пожалуйста, укажи 'мужской' или 'женский':")
-            return COLLECTING_PARAMS
-        
-        user_data['current_step'] = 'age'
-        await update.message.reply_text("🎂 Сколько тебе лет?")
-        
-    elif current_step == 'age':
-        try:
-            age = int(update.message.text)
-            if 10 <= age <= 100:
-                user_data['age'] = age
-                user_data['current_step'] = 'weight'
-                await update.message.reply_text("⚖️ Какой у тебя текущий вес (в кг)?")
-            else:
-                await update.message.reply_text("Пожалуйста, укажи возраст от 10 до 100 лет:")
-        except ValueError:
-            await update.message.reply_text("Пожалуйста, укажи возраст числом:")
-            
-    elif current_step == 'weight':
-        try:
-            weight = float(update.message.text.replace(',', '.'))
-            if 30 <= weight <= 200:
-                user_data['weight'] = weight
-                user_data['current_step'] = 'height'
-                await update.message.reply_text("📏 Какой у тебя рост (в см)?")
-            else:
-                await update.message.reply_text("Пожалуйста, укажи вес от 30 до 200 кг:")
-        except ValueError:
-            await update.message.reply_text("Пожалуйста, укажи вес числом (например: 75.5):")
-            
-    elif current_step == 'height':
-        try:
-            height = float(update.message.text)
-            if 100 <= height <= 250:
-                user_data['height'] = height
-                user_data['current_step'] = 'goal'
-                await update.message.reply_text(
-                    "🎯 Какая у тебя цель?\n"
-                    "• Набор мышечной массы 💪\n"
-                    "• Снижение веса 🏃‍♂️\n"
-                    "• Поддержание формы ⚖️\n"
-                    "• Подготовка к соревнованиям 🏆"
-                )
-            else:
-                await update.message.reply_text("Пожалуйста, укажи рост от 100 до 250 см:")
-        except ValueError:
-            await update.message.reply_text("Пожалуйста, укажи рост числом:")
-            
-    elif current_step == 'goal':
-        user_data['goal'] = update.message.text
-        user_data['current_step'] = 'competition_date'
-        await update.message.reply_text(
-            "📅 Есть ли у тебя важные соревнования? Если да, укажи дату (в формате ДД.ММ.ГГГГ), "
-            "или напиши 'нет' если соревнований нет:"
-        )
-        
-    elif current_step == 'competition_date':
-        text = update.message.text.lower()
-        if text == 'нет':
-            user_data['competition_date'] = None
-            # Завершаем сбор параметров
-            return await finish_parameter_collection(update, context, user_data)
-        else:
-            try:
-                comp_date = datetime.strptime(text, '%d.%m.%Y').date()
-                if db.validate_competition_date(comp_date):
-                    user_data['competition_date'] = comp_date
-                    return await finish_parameter_collection(update, context, user_data)
-                else:
-                    await update.message.reply_text("Дата соревнований должна быть в будущем. Укажи корректную дату:")
-            except ValueError:
-                await update.message.reply_text("Пожалуйста, укажи дату в формате ДД.ММ.ГГГГ или 'нет':")
+    # Одно сообщение может заполнить несколько шагов подряд
+    step, error = apply_input(user_data, update.message.text)
+    if step is None:
+        user_data.pop('current_step', None)
+        return await finish_parameter_collection(update, context, user_data)
     
+    await sender.reply_text(update.message, error or step.prompt)
     return COLLECTING_PARAMS
 
 async def finish_parameter_collection(update: Update, context: ContextTypes.DEFAULT_TYPE, user_data: Dict) -> int:
@@ -158,10 +124,13 @@ async def finish_parameter_collection(update: Update, context: ContextTypes.DEFA
         user_id = db.create_user(user_data)
         logger.info(f"✅ Пользователь {user.id} сохранен в базу с ID {user_id}")
         
+        # Вопросы обоих интервью готовятся, пока пользователь читает меню
+        prefetch_interview_questions(user.id, user_data)
+        
         # Очищаем временные данные
         context.user_data.pop('user_data', None)
         
-        await update.message.reply_text(
+        await sender.reply_text(update.message,
             "🎉 Отлично! Основная информация сохранена.\n\n"
             "Теперь давай создадим твой персональный план питания!",
             reply_markup=main_menu_keyboard()
@@ -171,11 +140,12 @@ async def finish_parameter_collection(update: Update, context: ContextTypes.DEFA
         
     except Exception as e:
         logger.error(f"❌ Ошибка сохранения пользователя: {e}")
-        await update.message.reply_text(
+        await sender.reply_text(update.message,
             "😕 Произошла ошибка при сохранении данных. Попробуй начать заново с /start"
         )
         return ConversationHandler.END
 
+@profiled
 async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработчик главного меню"""
     query = update.callback_query
@@ -186,22 +156,23 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     
     if choice == 'generate_plan':
         # Начинаем процесс генерации плана
-        await query.edit_message_text(
+        await sender.edit_message_text(query,
             "🔍 Для создания идеального плана питания мне нужно узнать немного больше о твоих тренировках и образе жизни.",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Начать интервью 🏋️‍♂️", callback_data="start_interview")]
-            ])
+            reply_markup=start_interview_keyboard()
         )
         
     elif choice == 'start_interview':
         # Запускаем интервью о тренировках
         user_data = db.get_user(user.id)
         if not user_data:
-            await query.edit_message_text("Сначала нужно заполнить основную информацию. Напиши /start")
+            await sender.edit_message_text(query, "Сначала нужно заполнить основную информацию. Напиши /start")
             return ConversationHandler.END
         
-        # Генерируем вопросы для интервью
-        questions = await llm.generate_interview_questions(user_data, 'training')
+        # Вопросы обычно уже сгенерированы в фоне; вопросы об активности догенерируются во время интервью
+        generation = cancel_generations.get(user.id, 0)
+        questions = await get_interview_questions(user.id, user_data, 'training')
+        if _cancelled_since(user.id, generation):
+            return ConversationHandler.END
         if questions:
             user_interview_data[user.id] = {
                 'training': {'questions': questions, 'current_question': 0, 'answers': {}},
@@ -211,49 +182,138 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             await ask_next_question(query, user.id, 'training')
             return TRAINING_INTERVIEW
         else:
-            await query.edit_message_text("😕 Не удалось сгенерировать вопросы. Попробуй позже.")
+            await sender.edit_message_text(query, "😕 Не удалось сгенерировать вопросы. Попробуй позже.")
             return MAIN_MENU
+    
+    elif choice == 'continue_activity_interview':
+        # Переходим к интервью об активности
+        if user.id not in user_interview_data:
+            await sender.edit_message_text(query, "Интервью прервано. Начни заново с /start")
+            return ConversationHandler.END
+        
+        activity = user_interview_data[user.id]['activity']
+        if not activity['questions']:
+            generation = cancel_generations.get(user.id, 0)
+            activity['questions'] = await get_interview_questions(user.id, db.get_user(user.id), 'activity')
+            if _cancelled_since(user.id, generation):
+                return ConversationHandler.END
+        if not activity['questions']:
+            return await generate_meal_plan(update, context, user.id)
+        
+        await ask_next_question(query, user.id, 'activity')
+        return ACTIVITY_INTERVIEW
             
     elif choice == 'view_saved_plans':
-        # Показываем сохраненные планы
-        plans = db.get_user_plans(user.id)
-        if plans:
-            keyboard = []
-            for plan in plans[:5]:  # Показываем последние 5 планов
-                plan_date = plan['created_at'].strftime('%d.%m.%Y')
-                keyboard.append([
-                    InlineKeyboardButton(
-                        f"План от {plan_date} ({plan['plan_type']})", 
-                        callback_data=f"view_plan_{plan['id']}"
-                    )
-                ])
-            
-            keyboard.append([InlineKeyboardButton("← Назад", callback_data="back_to_menu")])
-            
-            await query.edit_message_text(
-                "📋 Твои сохраненные планы питания:",
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+        # Показываем первую страницу сохраненных планов
+        if await show_saved_plans_page(query, user.id):
             return VIEWING_SAVED_PLANS
-        else:
-            await query.edit_message_text(
-                "У тебя пока нет сохраненных планов питания. Создай первый план!",
-                reply_markup=main_menu_keyboard()
-            )
-            return MAIN_MENU
+        await sender.edit_message_text(query,
+            "У тебя пока нет сохраненных планов питания. Создай первый план!",
+            reply_markup=main_menu_keyboard()
+        )
+        return MAIN_MENU
             
     elif choice == 'cancel':
         return await cancel(update, context)
     
     return MAIN_MENU
 
+def prefetch_interview_questions(user_id: int, user_data: Dict) -> Dict[str, asyncio.Task]:
+    """Запустить фоновую генерацию вопросов обоих интервью (если еще не запущена)"""
+    tasks = interview_prefetch.get(user_id)
+    if tasks is not None:
+        interview_prefetch.move_to_end(user_id)
+        return tasks
+    
+    tasks = interview_prefetch[user_id] = {
+        interview_type: asyncio.create_task(llm.generate_interview_questions(user_data, interview_type))
+        for interview_type in INTERVIEW_TYPES
+    }
+    if len(interview_prefetch) > PREFETCH_LIMIT:
+        _, stale = interview_prefetch.popitem(last=False)
+        for task in stale.values():
+            task.cancel()
+    return tasks
+
+def drop_interview_prefetch(user_id: int) -> None:
+    """Забыть заранее сгенерированные вопросы (интервью завершено или отменено)"""
+    for task in (interview_prefetch.pop(user_id, None) or {}).values():
+        task.cancel()
+
+def start_plan_skeleton(user_id: int) -> None:
+    """Упреждающая генерация каркаса плана после интервью о тренировках"""
+    if not config.PLAN_SPECULATION_ENABLED or user_id not in user_interview_data:
+        return
+    user_data = db.get_user(user_id)
+    if not user_data:
+        return
+    tasks = prefetch_interview_questions(user_id, user_data)
+    if 'skeleton' not in tasks:
+        training = user_interview_data[user_id]['training']
+        tasks['skeleton'] = asyncio.create_task(llm.generate_plan_skeleton(user_data, training))
+
+async def take_plan_skeleton(user_id: int) -> Optional[Dict]:
+    """Готовый каркас плана; незавершенный каркас ждем не дольше PLAN_SKELETON_WAIT_SECONDS"""
+    task = (interview_prefetch.get(user_id) or {}).pop('skeleton', None)
+    if task is None:
+        return None
+    try:
+        return await asyncio.wait_for(task, timeout=config.PLAN_SKELETON_WAIT_SECONDS)
+    except asyncio.CancelledError:
+        # Каркас отменен через /cancel; отмена самого обработчика пробрасывается
+        if asyncio.current_task().cancelling():
+            raise
+    except asyncio.TimeoutError:
+        logger.info(f"⌛ Каркас плана для {user_id} не готов - генерируем план без него")
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации каркаса плана: {e}")
+    return None
+
+async def get_interview_questions(user_id: int, user_data: Dict, interview_type: str) -> List[str]:
+    """Вопросы интервью из фоновой генерации (при необходимости она запускается сейчас)"""
+    if not user_data:
+        return []
+    task = prefetch_interview_questions(user_id, user_data)[interview_type]
+    try:
+        # shield: отмена обработчика не должна прерывать генерацию для следующего запроса
+        questions = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if task.cancelled():
+            interview_prefetch.pop(user_id, None)
+            return []
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации вопросов интервью: {e}")
+        interview_prefetch.pop(user_id, None)
+        return []
+    
+    if not questions:
+        # Генерация отменена (/cancel) - в следующий раз запускаем заново
+        interview_prefetch.pop(user_id, None)
+    return questions or []
+
+def _question_text(user_id: int, interview_type: str) -> str:
+    """Текст текущего вопроса интервью"""
+    interview = user_interview_data[user_id][interview_type]
+    number = interview['current_question']
+    title = "🏋️ Тренировки" if interview_type == 'training' else "🚶 Активность"
+    return f"{title} • вопрос {number + 1} из {len(interview['questions'])}\n\n{interview['questions'][number]}"
+
+async def ask_next_question(query, user_id: int, interview_type: str) -> None:
+    """Показать текущий вопрос интервью вместо сообщения с кнопкой"""
+    await sender.edit_message_text(query, _question_text(user_id, interview_type))
+
+async def ask_next_question_from_message(update: Update, user_id: int, interview_type: str) -> None:
+    """Задать текущий вопрос интервью ответным сообщением"""
+    await sender.reply_text(update.message, _question_text(user_id, interview_type))
+
 async def handle_training_interview(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработчик интервью о тренировках"""
     user = update.effective_user
     answer = update.message.text
     
     if user.id not in user_interview_data:
-        await update.message.reply_text("Интервью прервано. Начни заново с /start")
+        await sender.reply_text(update.message, "Интервью прервано. Начни заново с /start")
         return ConversationHandler.END
     
     # Сохраняем ответ
@@ -268,12 +328,12 @@ async def handle_training_interview(update: Update, context: ContextTypes.DEFAUL
         await ask_next_question_from_message(update, user.id, 'training')
         return TRAINING_INTERVIEW
     else:
-        # Завершаем тренировочное интервью и начинаем интервью об активности
-        await update.message.reply_text(
+        # Завершаем тренировочное интервью и начинаем интервью об активности;
+        # каркас плана тем временем готовится по уже известным ответам
+        start_plan_skeleton(user.id)
+        await sender.reply_text(update.message,
             "✅ Отлично! Теперь давай поговорим о твоем образе жизни и повседневной активности.",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Продолжить интервью 🚶‍♂️", callback_data="continue_activity_interview")]
-            ])
+            reply_markup=continue_interview_keyboard()
         )
         return MAIN_MENU
 
@@ -283,7 +343,7 @@ async def handle_activity_interview(update: Update, context: ContextTypes.DEFAUL
     answer = update.message.text
     
     if user.id not in user_interview_data:
-        await update.message.reply_text("Интервью прервано. Начни заново с /start")
+        await sender.reply_text(update.message, "Интервью прервано. Начни заново с /start")
         return ConversationHandler.END
     
     # Сохраняем ответ
@@ -301,39 +361,54 @@ async def handle_activity_interview(update: Update, context: ContextTypes.DEFAUL
         # Завершаем оба интервью и генерируем план
         return await generate_meal_plan(update, context, user.id)
 
+@profiled
 async def generate_meal_plan(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int) -> int:
     """Генерация плана питания после завершения интервью"""
     try:
         user_data = db.get_user(user_id)
         interview_data = user_interview_data.get(user_id, {})
+        generation = cancel_generations.get(user_id, 0)
         
-        # Генерируем план питания
-        meal_plan = await llm.generate_meal_plan(user_data, interview_data)
+        # Сначала ищем похожий план в библиотеке шаблонов, LLM - только если его нет
+        meal_plan = plan_library.build_plan(user_data, interview_data)
+        from_template = meal_plan is not None
+        if not from_template:
+            skeleton = await take_plan_skeleton(user_id)
+            meal_plan = await llm.generate_meal_plan(user_data, interview_data, skeleton)
+            if _cancelled_since(user_id, generation):
+                # /cancel во время генерации: вызов LLM отменен, диалог уже завершен
+                return ConversationHandler.END
         
         if meal_plan:
             # Сохраняем план в базу
             plan_id = db.save_meal_plan(user_id, meal_plan)
+            if not from_template:
+                plan_library.add(user_data, interview_data, meal_plan, plan_id)
             
             # Сохраняем интервью как активность
             db.save_activity(user_id, 'interview_completed', interview_data)
             
             # Очищаем временные данные
             user_interview_data.pop(user_id, None)
+            drop_interview_prefetch(user_id)
+            
+            # План только что получен - дни показываем без повторного чтения из базы
+            window = _open_plan_window(context, plan_id, meal_plan)
             
             # Показываем успех и первый день плана
             if isinstance(update, Update) and update.message:
-                await update.message.reply_text(
+                await sender.reply_text(update.message,
                     "🎉 Твой персональный план питания готов!\n\n"
                     "Теперь ты можешь просматривать его по дням и сохранять для будущего использования.",
-                    reply_markup=view_plan_keyboard(plan_id, 1)
+                    reply_markup=view_plan_keyboard(plan_id, 1, window['total_days'])
                 )
             else:
                 # Если это callback query
                 query = update.callback_query
-                await query.edit_message_text(
+                await sender.edit_message_text(query,
                     "🎉 Твой персональный план питания готов!\n\n"
                     "Теперь ты можешь просматривать его по дням и сохранять для будущего использования.",
-                    reply_markup=view_plan_keyboard(plan_id, 1)
+                    reply_markup=view_plan_keyboard(plan_id, 1, window['total_days'])
                 )
             
             return VIEWING_PLAN
@@ -341,56 +416,259 @@ async def generate_meal_plan(update: Update, context: ContextTypes.DEFAULT_TYPE,
         else:
             error_msg = "😕 Не удалось сгенерировать план питания. Попробуй позже."
             if isinstance(update, Update) and update.message:
-                await update.message.reply_text(error_msg, reply_markup=main_menu_keyboard())
+                await sender.reply_text(update.message, error_msg, reply_markup=main_menu_keyboard())
             else:
                 query = update.callback_query
-                await query.edit_message_text(error_msg, reply_markup=main_menu_keyboard())
+                await sender.edit_message_text(query, error_msg, reply_markup=main_menu_keyboard())
             return MAIN_MENU
             
     except Exception as e:
         logger.error(f"❌ Ошибка генерации плана питания: {e}")
         error_msg = "😕 Произошла ошибка при генерации плана. Попробуй позже."
         if isinstance(update, Update) and update.message:
-            await update.message.reply_text(error_msg, reply_markup=main_menu_keyboard())
+            await sender.reply_text(update.message, error_msg, reply_markup=main_menu_keyboard())
         else:
             query = update.callback_query
-            await query.edit_message_text(error_msg, reply_markup=main_menu_keyboard())
+            await sender.edit_message_text(query, error_msg, reply_markup=main_menu_keyboard())
+        return MAIN_MENU
+
+async def show_saved_plans_page(query, user_id: int, cursor: Optional[Tuple[datetime, int]] = None) -> bool:
+    """Показать страницу сохраненных планов; False, если планов нет"""
+    plans, next_cursor = db.get_user_plans_page(user_id, cursor, limit=config.SAVED_PLANS_PAGE_SIZE)
+    if not plans:
+        return False
+    
+    await sender.edit_message_text(query,
+        "📋 Твои сохраненные планы питания:",
+        reply_markup=saved_plans_keyboard(plans, next_cursor, is_first_page=cursor is None)
+    )
+    return True
+
+async def view_saved_plans_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Переход между страницами сохраненных планов"""
+    query = update.callback_query
+    await query.answer()
+    
+    decoded = decode_callback(query.data)
+    cursor = decode_page_cursor(decoded[1]) if decoded else None
+    if not await show_saved_plans_page(query, query.from_user.id, cursor):
+        # Планы могли быть удалены - возвращаемся на первую страницу
+        if cursor is None or not await show_saved_plans_page(query, query.from_user.id):
+            await sender.edit_message_text(query,
+                "У тебя пока нет сохраненных планов питания. Создай первый план!",
+                reply_markup=main_menu_keyboard()
+            )
+            return MAIN_MENU
+    return VIEWING_SAVED_PLANS
+
+def _open_plan_window(context: ContextTypes.DEFAULT_TYPE, plan_id: int, plan_data: Dict) -> Dict:
+    """Окно просматриваемого плана: план и уже отрисованные дни"""
+    window = {
+        'plan_id': plan_id,
+        'plan_data': plan_data,
+        'total_days': len(plan_data.get('days') or []) or 1,
+        'days': {},
+        'stats': None
+    }
+    context.user_data['plan_window'] = window
+    return window
+
+def _get_plan_window(context: ContextTypes.DEFAULT_TYPE, user_id: int, plan_id: int) -> Optional[Dict]:
+    """Окно плана из памяти; при его отсутствии - загрузка плана пользователя из базы"""
+    if plan_id is None:
+        return None
+    window = context.user_data.get('plan_window')
+    if window and window['plan_id'] == plan_id:
+        return window
+    
+    plan = db.get_plan_by_id(plan_id)
+    if not plan or plan['athlete_id'] != db.resolve_athlete_id(user_id):
+        return None
+    return _open_plan_window(context, plan_id, plan['plan_data'])
+
+def _render_plan_day(window: Dict, day_number: int) -> List[str]:
+    """Сообщения дня плана (отрисовываются один раз на окно)"""
+    chunks = window['days'].get(day_number)
+    if chunks is None:
+        chunks = window['days'][day_number] = render_plan_day(window['plan_data'], day_number)
+    return chunks
+
+async def _show_chunks(query, chunks: List[str], reply_markup) -> None:
+    """Показать сообщения в текущем; продолжение длинного текста - новыми сообщениями"""
+    parse_mode = config.TELEGRAM_PARSE_MODE
+    if len(chunks) == 1:
+        await sender.edit_message_text(query, chunks[0], reply_markup=reply_markup, parse_mode=parse_mode)
+        return
+    
+    await sender.edit_message_text(query, chunks[0], parse_mode=parse_mode)
+    for chunk in chunks[1:-1]:
+        await sender.reply_text(query.message, chunk, parse_mode=parse_mode)
+    await sender.reply_text(query.message, chunks[-1], reply_markup=reply_markup, parse_mode=parse_mode)
+
+def _callback_plan_id(data: str) -> Optional[int]:
+    """ID плана из callback_data кнопки плана"""
+    decoded = decode_callback(data)
+    return decoded[1][0] if decoded and decoded[1] else None
+
+async def view_plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Открыть сохраненный план на первом дне"""
+    query = update.callback_query
+    await query.answer()
+    
+    plan_id = _callback_plan_id(query.data)
+    window = _get_plan_window(context, query.from_user.id, plan_id)
+    if not window:
+        await sender.edit_message_text(query, "❌ План не найден", reply_markup=main_menu_keyboard())
         return MAIN_MENU
+    
+    await _show_chunks(query, _render_plan_day(window, 1), view_plan_keyboard(plan_id, 1, window['total_days']))
+    return VIEWING_PLAN
 
+@profiled
 async def view_plan_day(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Просмотр конкретного дня плана питания"""
     query = update.callback_query
     await query.answer()
     
-    # Извлекаем ID плана и номер дня из callback_data
-    callback_data = query.data
-    if callback_data.startswith('day_'):
-        parts = callback_data.split('_')
-        if len(parts) >= 3:
-            plan_id = int(parts[1])
-            day_number = int(parts[2])
-            
-            # Здесь будет логика отображения конкретного дня плана
-            # Для простоты просто показываем номер дня
-            await query.edit_message_text(
-                f"📋 День {day_number} твоего плана питания\n\n"
-                "Здесь будет детальная информация о питании на этот день...",
-                reply_markup=view_plan_keyboard(plan_id, day_number)
-            )
+    decoded = decode_callback(query.data)
+    if not decoded or len(decoded[1]) != 2:
+        return VIEWING_PLAN
+    plan_id, day_number = decoded[1]
+    
+    window = _get_plan_window(context, query.from_user.id, plan_id)
+    if not window:
+        await sender.edit_message_text(query, "❌ План не найден", reply_markup=main_menu_keyboard())
+        return MAIN_MENU
     
+    day_number = min(max(day_number, 1), window['total_days'])
+    await _show_chunks(query, _render_plan_day(window, day_number), view_plan_keyboard(plan_id, day_number, window['total_days']))
     return VIEWING_PLAN
 
+async def ignore_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Кнопка без действия (номер текущего дня)"""
+    await update.callback_query.answer()
+
+async def busy_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Кнопка, нажатая, пока выполняется предыдущее действие пользователя"""
+    await update.callback_query.answer("⏳ Подожди, предыдущее действие еще выполняется")
+
+async def busy_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Сообщение, пришедшее, пока выполняется предыдущее действие пользователя"""
+    await sender.reply_text(update.message, "⏳ Еще обрабатываю предыдущий запрос. Чтобы прервать его - /cancel")
+
+async def save_plan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Кнопка сохранения: план записывается в базу сразу после генерации"""
+    query = update.callback_query
+    await query.answer("💾 План сохранен в разделе «Мои планы»")
+    return VIEWING_PLAN
+
+async def view_plan_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Общая статистика просматриваемого плана"""
+    query = update.callback_query
+    await query.answer()
+    
+    plan_id = _callback_plan_id(query.data)
+    window = _get_plan_window(context, query.from_user.id, plan_id)
+    if not window:
+        await sender.edit_message_text(query, "❌ План не найден", reply_markup=main_menu_keyboard())
+        return MAIN_MENU
+    
+    if window['stats'] is None:
+        window['stats'] = render_plan_stats(window['plan_data'])
+    await _show_chunks(query, window['stats'], view_plan_keyboard(plan_id, 1, window['total_days']))
+    return VIEWING_PLAN
+
+async def back_to_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Возврат в главное меню"""
+    query = update.callback_query
+    await query.answer()
+    
+    # Пользователь уходит из просмотра плана - окно плана больше не нужно
+    context.user_data.pop('plan_window', None)
+    
+    await sender.edit_message_text(query, "Главное меню:", reply_markup=main_menu_keyboard())
+    return MAIN_MENU
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработчик команды /cancel"""
     user = update.effective_user
     logger.info(f"❌ Пользователь {user.id} отменил операцию")
     
-    # Очищаем временные данные
+    # Очищаем временные данные; обработчик, ожидающий LLM, увидит отмену
+    cancel_generations[user.id] = cancel_generations.get(user.id, 0) + 1
     context.user_data.clear()
     user_interview_data.pop(user.id, None)
+    drop_interview_prefetch(user.id)
+    llm.cancel_user_requests(user.id)
     
-    await update.message.reply_text(
+    await sender.reply_text(update.effective_message,
         "Операция отменена. Если захочешь начать заново - напиши /start",
         reply_markup=main_menu_keyboard()
     )
-    return ConversationHandler
\ No newline at end of file
+    return ConversationHandler.END
+
+async def track_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Подсчет входящих обновлений по типу"""
+    if update.callback_query:
+        update_type = 'callback_query'
+    elif update.message:
+        update_type = 'message'
+    else:
+        update_type = 'other'
+    metrics.inc('telegram_updates_total', type=update_type)
+
+def _is_admin(update: Update, command: str) -> bool:
+    """Служебные команды доступны только ADMIN_USER_ID"""
+    user = update.effective_user
+    if config.ADMIN_USER_ID and user.id == config.ADMIN_USER_ID:
+        return True
+    logger.warning(f"⛔ Пользователь {user.id} запросил /{command} без прав администратора")
+    return False
+
+async def _reply_report(message, report: str) -> None:
+    for chunk in split_message(line + '\n' for line in report.split('\n')):
+        await sender.reply_text(message, chunk)
+
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /perf: сводка метрик производительности (только для администратора)"""
+    if not _is_admin(update, 'perf'):
+        return
+    await _reply_report(update.effective_message, metrics.report())
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /profile [секунды]: окно профилирования обработчиков (только для администратора)"""
+    if not _is_admin(update, 'profile'):
+        return
+    message = update.effective_message
+    if profiler.running:
+        await sender.reply_text(message, "🔬 Профилирование уже запущено")
+        return
+    
+    try:
+        seconds = float(context.args[0]) if context.args else config.PROFILE_SECONDS
+    except ValueError:
+        seconds = config.PROFILE_SECONDS
+    seconds = min(max(seconds, 1), config.PROFILE_MAX_SECONDS)
+    await sender.reply_text(message, f"🔬 Профилирование запущено на {seconds:.0f} с")
+    context.application.create_task(_profile_window(message, seconds))
+
+async def _profile_window(message, seconds: float) -> None:
+    """Окно профилирования; отчет отправляется администратору"""
+    try:
+        path, report = await profiler.run_window(seconds)
+    except Exception as e:
+        logger.error(f"❌ Ошибка профилирования: {e}")
+        await sender.reply_text(message, f"😕 Ошибка профилирования: {e}")
+        return
+    await _reply_report(message, f"🔬 Свернутые стеки: {path}\n{report}")
+
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Логирование необработанных ошибок"""
+    metrics.inc('handler_errors_total')
+    logger.error(f"❌ Необработанная ошибка: {context.error}", exc_info=context.error)
+    
+    if isinstance(update, Update) and update.effective_message:
+        try:
+            await sender.reply_text(update.effective_message, "😕 Произошла ошибка. Попробуй позже или напиши /start")
+        except Exception as e:
+            logger.error(f"❌ Не удалось отправить сообщение об ошибке: {e}")
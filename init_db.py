@@ -1,123 +1,28 @@
 #!/usr/bin/env python3
 """
 Скрипт инициализации базы данных для AI диетолога 3.0
-Создает необходимые таблицы и индексы
+Создает необходимые таблицы и индексы через миграции схемы
 """
 
 import logging
 import sys
 from database import db
 from config import config
+from migrations import run_migrations, lint_indexes
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def create_tables():
-    """Создание всех необходимых таблиц"""
-    
-    tables = [
-        """
-        CREATE TABLE IF NOT EXISTS athletes (
-            id SERIAL PRIMARY KEY,
-            telegram_id BIGINT UNIQUE NOT NULL,
-            username VARCHAR(100),
-            first_name VARCHAR(100),
-            last_name VARCHAR(100),
-            gender VARCHAR(10),
-            age INTEGER,
-            weight DECIMAL(5,2),
-            height DECIMAL(5,2),
-            sport_type VARCHAR(100),
-            training_frequency VARCHAR(50),
-            training_duration VARCHAR(50),
-            training_intensity VARCHAR(50),
-            goal TEXT,
-            competition_date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        
-        """
-        CREATE TABLE IF NOT EXISTS meal_plans (
-            id SERIAL PRIMARY KEY,
-            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
-            plan_type VARCHAR(50) DEFAULT 'custom',
-            duration_days INTEGER DEFAULT 7,
-            total_calories DECIMAL(8,2),
-            protein_grams DECIMAL(8,2),
-            carbs_grams DECIMAL(8,2),
-            fat_grams DECIMAL(8,2),
-            plan_data JSONB NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        
-        """
-        CREATE TABLE IF NOT EXISTS meals (
-            id SERIAL PRIMARY KEY,
-            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
-            meal_type VARCHAR(50) NOT NULL,
-            food_items JSONB NOT NULL,
-            calories DECIMAL(8,2),
-            protein_grams DECIMAL(8,2),
-            carbs_grams DECIMAL(8,2),
-            fat_grams DECIMAL(8,2),
-            meal_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        
-        """
-        CREATE TABLE IF NOT EXISTS activities (
-            id SERIAL PRIMARY KEY,
-            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
-            activity_type VARCHAR(50) NOT NULL,
-            activity_data JSONB NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        
-        """
-        CREATE TABLE IF NOT EXISTS workouts (
-            id SERIAL PRIMARY KEY,
-            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
-            workout_type VARCHAR(100) NOT NULL,
-            duration_minutes INTEGER,
-            intensity VARCHAR(50),
-            calories_burned DECIMAL(8,2),
-            workout_data JSONB NOT NULL,
-            workout_date DATE DEFAULT CURRENT_DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-    ]
-    
-    indexes = [
-        "CREATE INDEX IF NOT EXISTS idx_athletes_telegram_id ON athletes(telegram_id)",
-        "CREATE INDEX IF NOT EXISTS idx_meal_plans_athlete_id ON meal_plans(athlete_id)",
-        "CREATE INDEX IF NOT EXISTS idx_meal_plans_created_at ON meal_plans(created_at)",
-        "CREATE INDEX IF NOT EXISTS idx_meals_athlete_id ON meals(athlete_id)",
-        "CREATE INDEX IF NOT EXISTS idx_meals_meal_time ON meals(meal_time)",
-        "CREATE INDEX IF NOT EXISTS idx_activities_athlete_id ON activities(athlete_id)",
-        "CREATE INDEX IF NOT EXISTS idx_activities_created_at ON activities(created_at)",
-        "CREATE INDEX IF NOT EXISTS idx_workouts_athlete_id ON workouts(athlete_id)",
-        "CREATE INDEX IF NOT EXISTS idx_workouts_workout_date ON workouts(workout_date)"
-    ]
-    
+    """Создание всех необходимых таблиц (применение миграций схемы)"""
     try:
-        # Создаем таблицы
-        for table_sql in tables:
-            db.execute_query(table_sql)
-            logger.info("✅ Таблица создана/проверена")
+        version = run_migrations(db)
+        logger.info(f"🎉 Все таблицы и индексы успешно созданы! Версия схемы: {version}")
         
-        # Создаем индексы
-        for index_sql in indexes:
-            db.execute_query(index_sql)
-            logger.info("✅ Индекс создан/проверен")
-            
-        logger.info("🎉 Все таблицы и индексы успешно созданы!")
+        # Предупреждаем о лишних индексах
+        for finding in lint_indexes(db):
+            if finding['kind'] == 'duplicate':
+                logger.warning(f"⚠️  Индекс {finding['index_name']} дублирует {finding['covered_by']}")
         return True
         
     except Exception as e:
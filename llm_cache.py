@@ -0,0 +1,152 @@
+"""
+Приближенный кэш ответов LLM
+Промпты нормализуются (без имени, с округленными числами), для них строится
+MinHash-подпись (bottom-k), и близкие промпты получают сохраненный ответ
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Строки промпта с именем пользователя ("Спортсмен: Иван", "- Имя: Иван")
+_IDENTITY_LINE_RE = re.compile(r'^\s*-?\s*(имя|спортсмен)\s*:.*$', re.IGNORECASE | re.MULTILINE)
+_DATE_RE = re.compile(r'(\d{4})-(\d{2})-\d{2}')
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Шаг округления чисел (вес, рост, возраст, частота тренировок)
+NUMBER_BUCKET = 5
+SHINGLE_SIZE = 3
+SIGNATURE_SIZE = 64
+
+
+def _bucket_number(match: re.Match) -> str:
+    value = float(match.group().replace(',', '.'))
+    if value < 10:
+        return str(int(round(value)))
+    return str(int(round(value / NUMBER_BUCKET) * NUMBER_BUCKET))
+
+
+def normalize_prompt(text: str) -> str:
+    """Нормализация промпта: без имени, даты до месяца, числа по корзинам"""
+    text = _IDENTITY_LINE_RE.sub('', text.lower())
+    text = _DATE_RE.sub(r'\1-\2', text)
+    text = _NUMBER_RE.sub(_bucket_number, text)
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def minhash_signature(text: str, size: int = SIGNATURE_SIZE) -> FrozenSet[int]:
+    """Bottom-k MinHash: size наименьших хэшей шинглов из слов"""
+    words = text.split()
+    if len(words) < SHINGLE_SIZE:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return frozenset(heapq.nsmallest(size, (_hash(shingle) for shingle in shingles)))
+
+
+def estimate_similarity(a: FrozenSet[int], b: FrozenSet[int], size: int = SIGNATURE_SIZE) -> float:
+    """Оценка сходства Жаккара по двум bottom-k подписям"""
+    if not a or not b:
+        return 0.0
+    union_bottom = heapq.nsmallest(size, a | b)
+    shared = sum(1 for value in union_bottom if value in a and value in b)
+    return shared / len(union_bottom)
+
+
+class SemanticCache:
+    """Ограниченный LRU-кэш ответов LLM с поиском по сходству промптов"""
+
+    def __init__(self, max_size: int = None, threshold: float = None):
+        self.max_size = max_size or config.LLM_CACHE_SIZE
+        self.threshold = config.LLM_CACHE_THRESHOLD if threshold is None else threshold
+        # Ключ - хэш нормализованного промпта; значение - (пространство, подпись, ответ)
+        self.entries: 'OrderedDict[str, Tuple[str, FrozenSet[int], Dict]]' = OrderedDict()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _keys(self, messages: List[Dict], max_tokens: Optional[int],
+              scope: Optional[str] = None) -> Tuple[str, str, str]:
+        """Пространство (системный промпт, лимит и область), ключ и нормализованный текст"""
+        system = [m.get('content', '') for m in messages if m.get('role') == 'system']
+        user = [m.get('content', '') for m in messages if m.get('role') != 'system']
+        namespace = hashlib.sha1(json.dumps([system, max_tokens, scope], ensure_ascii=False).encode('utf-8')).hexdigest()
+        normalized = normalize_prompt('\n'.join(user))
+        key = hashlib.sha1(f"{namespace}:{normalized}".encode('utf-8')).hexdigest()
+        return namespace, key, normalized
+
+    def get(self, messages: List[Dict], max_tokens: Optional[int] = None,
+            scope: Optional[str] = None) -> Optional[Dict]:
+        """
+        Найти сохраненный ответ для того же или близкого промпта.
+
+        scope отделяет запросы, промпты которых различаются лишь несколькими словами
+        (например, тема интервью): близкие промпты ищутся только в той же области.
+        """
+        namespace, key, normalized = self._keys(messages, max_tokens, scope)
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.exact_hits += 1
+            return self.entries[key][2]
+
+        signature = minhash_signature(normalized)
+        best_key, best_score = None, 0.0
+        for entry_key, (entry_namespace, entry_signature, _) in self.entries.items():
+            if entry_namespace != namespace:
+                continue
+            score = estimate_similarity(signature, entry_signature)
+            if score > best_score:
+                best_key, best_score = entry_key, score
+
+        if best_key is not None and best_score >= self.threshold:
+            self.entries.move_to_end(best_key)
+            self.hits += 1
+            logger.info(f"♻️ Ответ LLM из кэша (сходство {best_score:.2f})")
+            return self.entries[best_key][2]
+
+        self.misses += 1
+        return None
+
+    def put(self, messages: List[Dict], max_tokens: Optional[int], response: Dict,
+            scope: Optional[str] = None) -> None:
+        """Сохранить ответ LLM с вытеснением давно не использованных записей"""
+        namespace, key, normalized = self._keys(messages, max_tokens, scope)
+        self.entries[key] = (namespace, minhash_signature(normalized), response)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        self.entries.clear()
+
+    def stats(self) -> Dict:
+        """Счетчики кэша для мониторинга"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'exact_hits': self.exact_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
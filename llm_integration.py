@@ -6,12 +6,179 @@
 import logging
 import json
 import asyncio
+import functools
+import hashlib
+import time
 import aiohttp
-from typing import Dict, List, Optional, Any
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
 from config import config
+from llm_cache import SemanticCache
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Компактная схема плана питания: дни, приемы пищи и продукты - позиционные строки.
+# Итоги приемов пищи, дней и плана не запрашиваются - они пересчитываются из продуктов
+COMPACT_PLAN_FORMAT = (
+    '{"d":[[тренировка,гидратация,[[тип,"HH:MM",рекомендации,'
+    '[[название,порция,ккал,белки,углеводы,жиры]]]]]],"r":общие_рекомендации,"s":[продукт]}; '
+    'тип: breakfast|lunch|dinner|snack; "d" - ровно 7 дней'
+)
+
+_STRING = {"type": "string"}
+_NUMBER = {"type": "number"}
+COMPACT_PLAN_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "d": {
+            "type": "array",
+            "minItems": 7,
+            "maxItems": 7,
+            "items": {
+                "type": "array",
+                "prefixItems": [_STRING, _STRING, {
+                    "type": "array",
+                    "items": {
+                        "type": "array",
+                        "prefixItems": [_STRING, _STRING, _STRING, {
+                            "type": "array",
+                            "items": {
+                                "type": "array",
+                                "prefixItems": [_STRING, _STRING, _NUMBER, _NUMBER, _NUMBER, _NUMBER]
+                            }
+                        }]
+                    }
+                }]
+            }
+        },
+        "r": _STRING,
+        "s": {"type": "array", "items": _STRING}
+    },
+    "required": ["d", "r", "s"]
+}
+
+# Системные промпты неизменны между вызовами - провайдер кэширует их как общий префикс
+MEAL_PLAN_SYSTEM_PROMPT = (
+    "Ты эксперт по спортивному питанию. Составь 7-дневный план питания спортсмена: "
+    "завтрак, обед, ужин и 2 перекуса в день; точные порции в г/мл; калории и БЖУ каждого продукта; "
+    "тайминг питания вокруг тренировок и соревнований; замены для аллергиков в рекомендациях; "
+    "пищевые предпочтения из интервью; рекомендации по гидратации. "
+    "Верни только JSON без пояснений в формате: " + COMPACT_PLAN_FORMAT
+)
+
+# Каркас плана: суточные калории и БЖУ, тренировки и гидратация по дням.
+# Генерируется заранее по интервью о тренировках, пока идет интервью об активности
+PLAN_SKELETON_FORMAT = (
+    '{"k":ккал_в_день,"p":белки_г,"c":углеводы_г,"f":жиры_г,'
+    '"t":[тренировка_дня],"h":[гидратация_дня]}; "t" и "h" - ровно 7 строк'
+)
+
+PLAN_SKELETON_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "k": _NUMBER,
+        "p": _NUMBER,
+        "c": _NUMBER,
+        "f": _NUMBER,
+        "t": {"type": "array", "minItems": 7, "maxItems": 7, "items": _STRING},
+        "h": {"type": "array", "minItems": 7, "maxItems": 7, "items": _STRING}
+    },
+    "required": ["k", "p", "c", "f", "t", "h"]
+}
+
+PLAN_SKELETON_SYSTEM_PROMPT = (
+    "Ты опытный спортивный диетолог. По профилю спортсмена и интервью о тренировках рассчитай "
+    "суточную калорийность и БЖУ и распиши на 7 дней тренировки и рекомендации по гидратации. "
+    "Верни только JSON без пояснений в формате: " + PLAN_SKELETON_FORMAT
+)
+
+INTERVIEW_SYSTEM_PROMPT = (
+    "Ты опытный спортивный диетолог. Сгенерируй 5-7 конкретных вопросов спортсмену по теме. "
+    "Тренировки: частота, продолжительность, интенсивность, тип, время суток, восстановление. "
+    "Активность: повседневная активность, работа, хобби, сон, стресс, пищевые привычки, аллергии, предпочтения в еде. "
+    "Верни только вопросы, пронумерованные через точку, без дополнительного текста."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов: ~4 символа латиницы или ~2.5 кириллицы на токен"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return int(ascii_chars / 4 + (len(text) - ascii_chars) / 2.5) + 1
+
+def single_flight(call_type: str):
+    """
+    Одинаковые одновременные вызовы одного пользователя выполняются один раз.
+    
+    Ключ - (telegram_id, тип вызова, хэш входных данных промпта); повторные вызовы
+    ждут общую задачу, а LLMIntegration.cancel_user_requests отменяет ее. Совпадают
+    вызовы обработчика и фоновых задач (упреждающие вопросы интервью, каркас плана);
+    повторные нажатия и сообщения пользователя до сюда не доходят - пока выполняется
+    его обработчик, диалог находится в состоянии WAITING.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, user_data: Dict, *args, **kwargs):
+            payload = json.dumps([user_data, args, kwargs], sort_keys=True, default=str, ensure_ascii=False)
+            key = (user_data.get('telegram_id'), call_type, hashlib.sha1(payload.encode('utf-8')).hexdigest())
+            return await self._single_flight(key, lambda: method(self, user_data, *args, **kwargs))
+        return wrapper
+    return decorator
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для внешнего API.
+    
+    closed - запросы идут; после failure_threshold ошибок подряд - open: запросы
+    не отправляются reset_seconds секунд; затем half_open - пропускается один
+    пробный запрос, по его результату цепь замыкается или снова размыкается.
+    """
+    
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None):
+        self.failure_threshold = failure_threshold or config.LLM_CIRCUIT_FAILURES
+        self.reset_seconds = config.LLM_CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+    
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+    
+    def release(self) -> None:
+        """Запрос отменен без результата"""
+        self.probe_in_flight = False
+    
+    def record(self, success: bool) -> None:
+        """Учесть результат запроса"""
+        self.probe_in_flight = False
+        if success:
+            if self.failures >= self.failure_threshold:
+                logger.info("✅ Цепь DeepSeek замкнута: API снова отвечает")
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.failures == self.failure_threshold:
+                logger.warning(f"⚡ Цепь DeepSeek разомкнута после {self.failures} ошибок подряд")
+            self.opened_at = time.monotonic()
+
 class LLMIntegration:
     """Класс для работы с DeepSeek LLM API"""
     
@@ -23,13 +190,50 @@ class LLMIntegration:
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+        # Приближенный кэш ответов для почти одинаковых промптов
+        self.cache = SemanticCache() if config.LLM_CACHE_ENABLED else None
+        # Суммарный расход токенов по данным API
+        self.usage_totals = {'prompt_tokens': 0, 'prompt_cache_hit_tokens': 0, 'completion_tokens': 0}
+        # Выполняющиеся вызовы: (telegram_id, тип, хэш) -> общая задача
+        self.inflight: Dict[Tuple, asyncio.Task] = {}
+        self.coalesced_calls = 0
+        # Токены, зарезервированные за сутки под упреждающие запросы (каркас плана)
+        self.speculative_day = datetime.now().date()
+        self.speculative_tokens = 0
+        self.breaker = CircuitBreaker()
+        metrics.register_gauge('llm_circuit_open', lambda: int(self.breaker.state != CircuitBreaker.CLOSED))
+        metrics.register_gauge('llm_inflight', lambda: len(self.inflight))
+        metrics.register_gauge('llm_coalesced_calls', lambda: self.coalesced_calls)
+        metrics.register_gauge('llm_tokens', lambda: dict(self.usage_totals), label='kind')
+        if self.cache:
+            metrics.register_gauge('llm_cache_hit_rate', lambda: self.cache.stats()['hit_rate'])
+            metrics.register_gauge('llm_cache_size', lambda: len(self.cache.entries))
     
-    async def generate_chat_completion(self, messages: List[Dict], max_tokens: int = None) -> Optional[Dict]:
-        """Генерация ответа через chat completion API"""
+    async def generate_chat_completion(self, messages: List[Dict], max_tokens: int = None,
+                                       use_cache: bool = True, json_schema: Optional[Dict] = None,
+                                       cache_scope: Optional[str] = None) -> Optional[Dict]:
+        """
+        Генерация ответа через chat completion API
+        
+        При заданной json_schema ответ запрашивается в режиме JSON: со схемой, если
+        провайдер ее поддерживает (DEEPSEEK_JSON_SCHEMA), иначе в режиме json_object.
+        cache_scope - область приближенного кэша: ответы из другой области не подставляются.
+        """
         if not self.api_key:
             logger.error("❌ DEEPSEEK_API_KEY не установлен")
             return None
         
+        cache = self.cache if use_cache else None
+        if cache:
+            cached = cache.get(messages, max_tokens, cache_scope)
+            if cached is not None:
+                return cached
+        
+        if not self.breaker.allow():
+            metrics.inc('llm_circuit_rejected_total')
+            logger.warning("⚡ Цепь DeepSeek разомкнута: запрос не отправлен")
+            return None
+        
         url = f"{self.base_url}/chat/completions"
         payload = {
             "model": self.model,
@@ -38,31 +242,104 @@ class LLMIntegration:
             "max_tokens": max_tokens or config.DEEPSEEK_MAX_TOKENS,
             "stream": False
         }
+        if json_schema is not None:
+            if config.DEEPSEEK_JSON_SCHEMA:
+                payload["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": "response", "schema": json_schema}
+                }
+            else:
+                payload["response_format"] = {"type": "json_object"}
         
+        started = time.perf_counter()
+        status = 'error'
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.post(url, headers=self.headers, json=payload) as response:
+                    status = str(response.status)
                     if response.status == 200:
                         data = await response.json()
+                        self._record_usage(data.get('usage') or {})
+                        if cache and data.get('choices'):
+                            cache.put(messages, max_tokens, data, cache_scope)
                         return data
                     else:
                         error_text = await response.text()
                         logger.error(f"❌ Ошибка API DeepSeek: {response.status} - {error_text}")
                         return None
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
         except Exception as e:
             logger.error(f"❌ Ошибка подключения к DeepSeek API: {e}")
             return None
+        finally:
+            if status == 'cancelled':
+                self.breaker.release()
+            else:
+                # Ошибки клиента (4xx, кроме 429) - не отказ сервиса
+                self.breaker.record(status.isdigit() and int(status) < 500 and status != '429')
+            metrics.observe('llm_request_seconds', time.perf_counter() - started, status=status)
+    
+    def _record_usage(self, usage: Dict) -> None:
+        """Учет фактического расхода токенов по данным API"""
+        for key in self.usage_totals:
+            self.usage_totals[key] += usage.get(key) or 0
+        if usage:
+            logger.info(
+                f"📏 Токены DeepSeek: промпт {usage.get('prompt_tokens', 0)} "
+                f"(из кэша {usage.get('prompt_cache_hit_tokens', 0)}), ответ {usage.get('completion_tokens', 0)}"
+            )
+    
+    async def _single_flight(self, key: Tuple, factory) -> Any:
+        """Присоединиться к выполняющемуся вызову с тем же ключом или запустить новый"""
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = asyncio.create_task(factory())
+            task.add_done_callback(functools.partial(self._finish_flight, key, time.perf_counter()))
+        else:
+            self.coalesced_calls += 1
+            logger.info(f"🔁 Повторный запрос {key[1]} пользователя {key[0]} присоединен к выполняющемуся")
+        
+        try:
+            # shield: отмена одного из ожидающих не прерывает вызов для остальных
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                # Вызов отменен через cancel_user_requests - результат больше не нужен
+                return None
+            raise
+    
+    def _finish_flight(self, key: Tuple, started: float, task: asyncio.Task) -> None:
+        """Снять завершенный вызов из выполняющихся и учесть время генерации"""
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled():
+            metrics.observe('llm_generation_seconds', time.perf_counter() - started, call=key[1])
+    
+    def cancel_user_requests(self, user_id: int) -> int:
+        """Отменить выполняющиеся вызовы пользователя (например, после /cancel)"""
+        cancelled = 0
+        for key, task in list(self.inflight.items()):
+            if key[0] == user_id and not task.done():
+                task.cancel()
+                cancelled += 1
+        if cancelled:
+            logger.info(f"🛑 Отменено запросов к LLM пользователя {user_id}: {cancelled}")
+        return cancelled
     
+    @single_flight('interview_questions')
     async def generate_interview_questions(self, user_data: Dict, interview_type: str) -> List[str]:
         """Генерация вопросов для интервью"""
         prompt = self._build_interview_prompt(user_data, interview_type)
         
         messages = [
-            {"role": "system", "content": "Ты опытный спортивный диетолог. Генерируй конкретные, четкие вопросы для сбора информации о питании и тренировках спортсменов."},
+            {"role": "system", "content": INTERVIEW_SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
         
-        response = await self.generate_chat_completion(messages, max_tokens=1000)
+        # Промпты тем интервью при длинном профиле почти совпадают - тема отделяет их в кэше
+        response = await self.generate_chat_completion(messages, max_tokens=1000, cache_scope=interview_type)
         if response and 'choices' in response:
             content = response['choices'][0]['message']['content']
             return self._parse_questions(content)
@@ -70,122 +347,139 @@ class LLMIntegration:
         # Fallback вопросы
         return self._get_fallback_questions(interview_type)
     
-    async def generate_meal_plan(self, user_data: Dict, interview_answers: Dict) -> Optional[Dict]:
-        """Генерация персонализированного плана питания"""
-        prompt = self._build_meal_plan_prompt(user_data, interview_answers)
+    def _reserve_speculative_tokens(self, tokens: int) -> bool:
+        """Зарезервировать токены упреждающего запроса в пределах суточного бюджета"""
+        today = datetime.now().date()
+        if today != self.speculative_day:
+            self.speculative_day, self.speculative_tokens = today, 0
+        if self.speculative_tokens + tokens > config.PLAN_SPECULATION_DAILY_TOKENS:
+            logger.info("💸 Суточный бюджет упреждающей генерации исчерпан")
+            return False
+        self.speculative_tokens += tokens
+        return True
+    
+    @single_flight('plan_skeleton')
+    async def generate_plan_skeleton(self, user_data: Dict, training_answers: Dict) -> Optional[Dict]:
+        """Упреждающая генерация каркаса плана по профилю и интервью о тренировках"""
+        prompt = f"{self._build_profile_line(user_data)}\nТренировки:\n{self._format_interview(training_answers)}"
+        max_tokens = config.PLAN_SKELETON_MAX_TOKENS
+        budget = estimate_tokens(PLAN_SKELETON_SYSTEM_PROMPT) + estimate_tokens(prompt) + max_tokens
+        if not self._reserve_speculative_tokens(budget):
+            return None
+        
+        messages = [
+            {"role": "system", "content": PLAN_SKELETON_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        response = await self.generate_chat_completion(messages, max_tokens=max_tokens,
+                                                       json_schema=PLAN_SKELETON_JSON_SCHEMA)
+        if not response or 'choices' not in response:
+            return None
+        
+        try:
+            data = json.loads(response['choices'][0]['message']['content'])
+            skeleton = {
+                'calories': float(data['k']),
+                'protein': float(data['p']),
+                'carbs': float(data['c']),
+                'fat': float(data['f']),
+                'training': [str(value) for value in data['t']][:7],
+                'hydration': [str(value) for value in data['h']][:7]
+            }
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Некорректный каркас плана: {e}")
+            return None
+        
+        if skeleton['calories'] <= 0:
+            return None
+        return skeleton
+    
+    @single_flight('meal_plan')
+    async def generate_meal_plan(self, user_data: Dict, interview_answers: Dict,
+                                 skeleton: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Генерация персонализированного плана питания
+        
+        С готовым каркасом (generate_plan_skeleton) модель подбирает только приемы пищи
+        под заданные калории и БЖУ, а тренировки и гидратация берутся из каркаса.
+        """
+        prompt = self._build_meal_plan_prompt(user_data, interview_answers, skeleton)
         
         messages = [
-            {"role": "system", "content": "Ты эксперт по спортивному питанию. Создавай детальные, персонализированные планы питания для спортсменов с учетом их целей, вида спорта и индивидуальных особенностей."},
+            {"role": "system", "content": MEAL_PLAN_SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
+        logger.info(f"📏 Промпт плана питания: ~{estimate_tokens(MEAL_PLAN_SYSTEM_PROMPT) + estimate_tokens(prompt)} токенов")
         
-        response = await self.generate_chat_completion(messages)
+        # Приближенный кэш не используется: промпты, различающиеся только аллергиями
+        # или исключенными продуктами, почти совпадают, и пользователь получил бы чужой план
+        response = await self.generate_chat_completion(messages, use_cache=False,
+                                                       json_schema=COMPACT_PLAN_JSON_SCHEMA)
         if response and 'choices' in response:
             content = response['choices'][0]['message']['content']
-            return self._parse_meal_plan(content, user_data)
+            plan_data = self._parse_meal_plan(content, user_data)
+            if plan_data and skeleton:
+                self._apply_skeleton(plan_data, skeleton)
+            return plan_data
         
         return None
     
+    def _build_profile_line(self, user_data: Dict) -> str:
+        """Компактное описание профиля спортсмена в одну строку"""
+        return (
+            f"Пол: {user_data.get('gender') or 'не указан'}; "
+            f"Возраст: {user_data.get('age') or 'не указан'}; "
+            f"Вес: {user_data.get('weight') or 'не указан'} кг; "
+            f"Рост: {user_data.get('height') or 'не указан'} см; "
+            f"Спорт: {user_data.get('sport_type') or 'не указан'}; "
+            f"Цель: {user_data.get('goal') or 'не указана'}; "
+            f"Соревнования: {user_data.get('competition_date') or 'нет'}"
+        )
+    
     def _build_interview_prompt(self, user_data: Dict, interview_type: str) -> str:
         """Построение промпта для интервью"""
-        base_info = f"""
-        Спортсмен: {user_data.get('first_name', 'Пользователь')}
-        Пол: {user_data.get('gender', 'не указан')}
-        Возраст: {user_data.get('age', 'не указан')}
-        Вес: {user_data.get('weight', 'не указан')} кг
-        Рост: {user_data.get('height', 'не указан')} см
-        Вид спорта: {user_data.get('sport_type', 'не указан')}
-        Цель: {user_data.get('goal', 'не указана')}
-        """
+        topic = 'Тема: тренировки' if interview_type == 'training' else 'Тема: активность'
+        return f"{self._build_profile_line(user_data)}\n{topic}"
+    
+    def _format_interview(self, section: Dict) -> str:
+        """Пары "вопрос - ответ" из данных интервью"""
+        if not isinstance(section, dict):
+            return ''
+        questions = section.get('questions') or []
+        answers = section.get('answers', section if not questions else {})
         
-        if interview_type == 'training':
-            return f"""
-            {base_info}
-            Сгенерируй 5-7 конкретных вопросов о тренировочном процессе этого спортсмена.
-            Вопросы должны касаться: частоты тренировок, продолжительности, интенсивности, 
-            типа тренировок, времени суток для тренировок, восстановления.
-            Верни только вопросы, пронумерованные через точку, без дополнительного текста.
-            """
-        else:  # activity
-            return f"""
-            {base_info}
-            Сгенерируй 5-7 конкретных вопросов о повседневной активности и образе жизни.
-            Вопросы должны касаться: уровня daily activity, работы, хобби, сна, стресса, 
-            пищевых привычек, аллергий и предпочтений в еде.
-            Верни только вопросы, пронумерованные через точку, без дополнительного текста.
-            """
-    
-    def _build_meal_plan_prompt(self, user_data: Dict, interview_answers: Dict) -> str:
+        lines = []
+        for key, answer in answers.items():
+            index = int(key[1:]) - 1 if key[:1] == 'q' and key[1:].isdigit() else -1
+            question = questions[index] if 0 <= index < len(questions) else key
+            lines.append(f"{question} - {answer}")
+        return '\n'.join(lines)
+    
+    def _build_meal_plan_prompt(self, user_data: Dict, interview_answers: Dict,
+                                skeleton: Optional[Dict] = None) -> str:
         """Построение промпта для генерации плана питания"""
-        return f"""
-        Создай детальный 7-дневный план питания для спортсмена:
-        
-        Основная информация:
-        - Имя: {user_data.get('first_name', 'Спортсмен')}
-        - Пол: {user_data.get('gender')}
-        - Возраст: {user_data.get('age')} лет
-        - Вес: {user_data.get('weight')} кг
-        - Рост: {user_data.get('height')} см
-        - Вид спорта: {user_data.get('sport_type')}
-        - Цель: {user_data.get('goal')}
-        - Дата соревнований: {user_data.get('competition_date')}
-        
-        Тренировочные данные:
-        {json.dumps(interview_answers.get('training', {}), ensure_ascii=False, indent=2)}
-        
-        Данные об активности:
-        {json.dumps(interview_answers.get('activity', {}), ensure_ascii=False, indent=2)}
-        
-        Требования к плану:
-        1. 7 дней питания с завтраком, обедом, ужином и 2 перекусами
-        2. Указать точные порции в граммах/мл
-        3. Рассчитать БЖУ и калории для каждого приема пищи
-        4. Учесть время тренировок и соревнований
-        5. Предложить варианты замены для аллергиков
-        6. Учесть пищевые предпочтения из интервью
-        7. Добавить рекомендации по гидратации
-        8. Указать timing питания вокруг тренировок
-        
-        Верни ответ в формате JSON с структурой:
-        {{
-            "plan_type": "7_day_meal_plan",
-            "total_calories": number,
-            "protein_grams": number,
-            "carbs_grams": number,
-            "fat_grams": number,
-            "days": [
-                {{
-                    "day_number": 1,
-                    "date": "YYYY-MM-DD",
-                    "meals": [
-                        {{
-                            "meal_type": "breakfast|lunch|dinner|snack",
-                            "time": "HH:MM",
-                            "food_items": [
-                                {{
-                                    "name": "Название продукта",
-                                    "portion": "100г",
-                                    "calories": number,
-                                    "protein": number,
-                                    "carbs": number,
-                                    "fat": number
-                                }}
-                            ],
-                            "total_calories": number,
-                            "total_protein": number,
-                            "total_carbs": number,
-                            "total_fat": number,
-                            "recommendations": "Текст рекомендаций"
-                        }}
-                    ],
-                    "training_schedule": "Описание тренировки",
-                    "hydration": "Рекомендации по воде"
-                }}
-            ],
-            "general_recommendations": "Общие рекомендации",
-            "shopping_list": ["список продуктов"]
-        }}
-        """
+        # Требования и схема - в постоянном системном промпте, здесь только данные спортсмена
+        prompt = (
+            f"{self._build_profile_line(user_data)}\n"
+            f"Тренировки:\n{self._format_interview(interview_answers.get('training', {}))}\n"
+            f"Активность:\n{self._format_interview(interview_answers.get('activity', {}))}"
+        )
+        if skeleton:
+            prompt += (
+                f"\nКаркас (соблюдай): {skeleton['calories']:.0f} ккал/день, Б {skeleton['protein']:.0f} г, "
+                f"У {skeleton['carbs']:.0f} г, Ж {skeleton['fat']:.0f} г. "
+                f"Тренировки по дням: {'; '.join(skeleton['training'])}. "
+                "Тренировка и гидратация дней уже заданы - верни для них пустые строки."
+            )
+        return prompt
+    
+    def _apply_skeleton(self, plan_data: Dict, skeleton: Dict) -> None:
+        """Тренировки и гидратация дней из каркаса плана"""
+        for index, day in enumerate(plan_data.get('days') or []):
+            if index < len(skeleton['training']) and not day.get('training_schedule'):
+                day['training_schedule'] = skeleton['training'][index]
+            if index < len(skeleton['hydration']) and not day.get('hydration'):
+                day['hydration'] = skeleton['hydration'][index]
     
     def _parse_questions(self, content: str) -> List[str]:
         """Парсинг сгенерированных вопросов"""
@@ -202,26 +496,83 @@ class LLMIntegration:
         
         return questions or self._get_fallback_questions('general')
     
+    def _expand_compact_plan(self, data: Dict) -> Dict:
+        """Преобразование компактного плана (позиционные строки) в формат plan_data"""
+        
+        def _row(value, width: int) -> list:
+            row = list(value) if isinstance(value, list) else []
+            return row + [None] * (width - len(row))
+        
+        def _rows(value) -> list:
+            # Ответ, нарушающий схему ("d": 5, число вместо списка приемов пищи), - пустой список
+            return value if isinstance(value, list) else []
+        
+        days = []
+        for day_index, day_row in enumerate(_rows(data.get('d')), 1):
+            training, hydration, meal_rows = _row(day_row, 3)
+            meals = []
+            for meal_row in _rows(meal_rows):
+                meal_type, time, recommendations, item_rows = _row(meal_row, 4)
+                food_items = []
+                for item_row in _rows(item_rows):
+                    name, portion, calories, protein, carbs, fat = _row(item_row, 6)
+                    food_items.append({
+                        'name': name or '',
+                        'portion': portion or '',
+                        'calories': calories or 0,
+                        'protein': protein or 0,
+                        'carbs': carbs or 0,
+                        'fat': fat or 0
+                    })
+                meals.append({
+                    'meal_type': meal_type or 'snack',
+                    'time': time or '',
+                    'food_items': food_items,
+                    'recommendations': recommendations or ''
+                })
+            days.append({
+                'day_number': day_index,
+                'meals': meals,
+                'training_schedule': training or '',
+                'hydration': hydration or ''
+            })
+        
+        return {
+            'days': days,
+            'general_recommendations': data.get('r') or '',
+            'shopping_list': data.get('s') or []
+        }
+    
     def _parse_meal_plan(self, content: str, user_data: Dict) -> Optional[Dict]:
         """Парсинг сгенерированного плана питания"""
         try:
-            # Пытаемся найти JSON в ответе
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
+            # В режиме JSON ответ - сам объект; иначе пытаемся найти JSON в тексте
+            try:
+                plan_data = json.loads(content)
+            except json.JSONDecodeError:
+                json_start = content.find('{')
+                json_end = content.rfind('}') + 1
+                if json_start == -1 or json_end == 0:
+                    return None
+                plan_data = json.loads(content[json_start:json_end])
             
-            if json_start != -1 and json_end != 0:
-                json_str = content[json_start:json_end]
-                plan_data = json.loads(json_str)
-                
-                # Добавляем базовую информацию
-                plan_data['generated_for'] = {
-                    'user_id': user_data.get('telegram_id'),
-                    'generated_at': str(datetime.now())
-                }
-                
-                return plan_data
+            if not isinstance(plan_data, dict):
+                return None
+            if 'd' in plan_data:
+                plan_data = self._expand_compact_plan(plan_data)
+            
+            # Добавляем базовую информацию (тип плана не запрашивается у LLM)
+            plan_data.setdefault('plan_type', '7_day_meal_plan')
+            plan_data['generated_for'] = {
+                'user_id': user_data.get('telegram_id'),
+                'generated_at': str(datetime.now())
+            }
+            
+            return plan_data
         except json.JSONDecodeError as e:
             logger.error(f"❌ Ошибка парсинга JSON плана питания: {e}")
+        except (TypeError, ValueError, AttributeError) as e:
+            logger.error(f"❌ План питания не соответствует схеме: {e}")
         
         return None
     
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Нагрузочное тестирование бота
+Сценарии диалогов (/start, параметры, интервью, нажатия кнопок) подаются
+в Application из main.setup_application с растущей частотой появления
+пользователей. Bot API и DeepSeek заменены заглушками, база - локальный
+PostgreSQL из настроек. Для каждой ступени нагрузки выводятся задержки
+ответа и компонент, который стал узким местом.
+
+Пример:
+    python load_test.py --rates 0.5,1,2,4 --stage-seconds 60 --llm-latency 3
+    python load_test.py --trace traces.jsonl --output curve.csv
+
+Формат --trace (JSONL): одна строка - один диалог, список шагов:
+    {"send": "/start"}                        - сообщение пользователя
+    {"click": "Создать план"}                 - кнопка последней клавиатуры (по части текста)
+    {"answer": "3 раза", "until": "Продолжить"} - отвечать, пока не появится кнопка
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.request import BaseRequest
+
+from config import config
+from database import db
+from llm_integration import llm, INTERVIEW_SYSTEM_PROMPT, PLAN_SKELETON_SYSTEM_PROMPT
+from metrics import metrics
+from telegram_sender import sender, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# telegram_id синтетических пользователей начинаются отсюда и не пересекаются с реальными
+LOAD_TEST_USER_BASE = 9_000_000_000_000
+
+# Сколько раз отвечать на вопросы интервью, прежде чем признать диалог сорванным
+MAX_INTERVIEW_ANSWERS = 15
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Load test', 'username': 'load_test_bot'}
+
+SPORTS = ('бег', 'плавание', 'футбол', 'велоспорт', 'тяжелая атлетика', 'баскетбол')
+GOALS = ('Набор мышечной массы', 'Снижение веса', 'Поддержание формы', 'Подготовка к соревнованиям')
+TRAINING_ANSWERS = ('4 раза в неделю по 1.5 часа', 'Утром, средняя интенсивность', 'Силовые и интервалы')
+ACTIVITY_ANSWERS = ('Офисная работа, сплю 7 часов', 'Аллергии нет, не ем свинину', 'Хожу пешком 5 км в день')
+
+MEAL_TYPES = ('breakfast', 'snack', 'lunch', 'snack', 'dinner')
+MEAL_TIMES = ('08:00', '11:00', '13:30', '16:30', '19:30')
+FOODS = (
+    ('Овсянка на молоке', '250 г', 320, 12, 52, 7),
+    ('Куриная грудка', '150 г', 248, 46, 0, 5),
+    ('Гречка отварная', '200 г', 220, 8, 42, 2),
+    ('Творог 5%', '200 г', 242, 34, 6, 10),
+    ('Банан', '120 г', 107, 1, 27, 0),
+    ('Лосось на пару', '140 г', 290, 28, 0, 19),
+    ('Рис бурый', '180 г', 200, 5, 42, 2),
+    ('Салат из овощей с оливковым маслом', '200 г', 150, 3, 10, 11),
+    ('Греческий йогурт', '150 г', 110, 15, 6, 3),
+    ('Миндаль', '30 г', 174, 6, 6, 15)
+)
+
+
+def compact_plan_fixture(rng: random.Random, days: int = 7, meals: int = 5, items: int = 6) -> Dict:
+    """План в компактном формате ответа LLM (COMPACT_PLAN_FORMAT)"""
+    return {
+        'd': [
+            [
+                rng.choice(('Отдых', 'Силовая 60 мин', 'Интервалы 45 мин', 'Длительная 90 мин')),
+                f"{rng.choice((2.5, 3, 3.5))} л воды, электролиты после тренировки",
+                [
+                    [MEAL_TYPES[meal % len(MEAL_TYPES)], MEAL_TIMES[meal % len(MEAL_TIMES)],
+                     'Запивать водой, не спешить',
+                     [list(rng.choice(FOODS)) for _ in range(items)]]
+                    for meal in range(meals)
+                ]
+            ]
+            for _ in range(days)
+        ],
+        'r': 'Питание каждые 3-4 часа, углеводы за 2 часа до тренировки, белок после нее.',
+        's': sorted({food[0] for food in FOODS})
+    }
+
+
+def skeleton_fixture(rng: random.Random) -> Dict:
+    """Каркас плана в формате PLAN_SKELETON_FORMAT"""
+    return {
+        'k': rng.randint(2000, 3500), 'p': rng.randint(110, 190), 'c': rng.randint(220, 420),
+        'f': rng.randint(55, 110),
+        't': [rng.choice(('Отдых', 'Силовая', 'Интервалы', 'Длительная')) for _ in range(7)],
+        'h': ['3 л воды' for _ in range(7)]
+    }
+
+
+def questions_fixture(rng: random.Random) -> str:
+    """Нумерованные вопросы интервью"""
+    count = rng.randint(5, 7)
+    return '\n'.join(f"{i}. Вопрос {i}: как часто и в какое время ты тренируешься?" for i in range(1, count + 1))
+
+
+def synthetic_session(rng: random.Random) -> List[Dict]:
+    """Полный диалог нового пользователя: параметры, оба интервью, просмотр плана"""
+    return [
+        {'send': '/start'},
+        {'send': rng.choice(SPORTS)},
+        {'send': f"{rng.choice('мж')} {rng.randint(18, 45)} {rng.randint(50, 95)} {rng.randint(155, 195)}"},
+        {'send': rng.choice(GOALS)},
+        {'send': 'нет'},
+        {'click': 'Создать план'},
+        {'click': 'Начать интервью'},
+        {'answer': rng.choice(TRAINING_ANSWERS), 'until': 'Продолжить интервью'},
+        {'click': 'Продолжить интервью'},
+        {'answer': rng.choice(ACTIVITY_ANSWERS), 'until': 'Общая статистика'},
+        {'click': 'Следующий'},
+        {'click': 'Следующий'},
+        {'click': 'Общая статистика'},
+        {'click': 'Назад в меню'}
+    ]
+
+
+def load_traces(path: str) -> List[List[Dict]]:
+    """Записанные диалоги из JSONL-файла"""
+    traces = []
+    with open(path, encoding='utf-8') as trace_file:
+        for line in trace_file:
+            if line.strip():
+                trace = json.loads(line)
+                traces.append(trace['steps'] if isinstance(trace, dict) else trace)
+    return traces
+
+
+class FakeTelegram(BaseRequest):
+    """Bot API в памяти: запоминает клавиатуры и будит ожидающих ответа"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.message_ids = itertools.count(1)
+        # chat_id -> {'keyboard': ряды кнопок, 'keyboard_message_id': ..., 'waiter': Future}
+        self.chats: Dict[int, Dict] = {}
+        self.calls = 0
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def chat(self, chat_id: int) -> Dict:
+        return self.chats.setdefault(chat_id, {'keyboard': [], 'keyboard_message_id': None, 'waiter': None})
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        endpoint = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+        return 200, json.dumps({'ok': True, 'result': self._respond(endpoint, params)}).encode('utf-8')
+
+    def _respond(self, endpoint: str, params: Dict):
+        if endpoint == 'getMe':
+            return BOT_USER
+        if endpoint not in ('sendMessage', 'editMessageText'):
+            return True
+
+        chat_id = int(params['chat_id'])
+        message_id = int(params.get('message_id') or next(self.message_ids))
+        chat = self.chat(chat_id)
+        if isinstance(params.get('reply_markup'), dict):
+            chat['keyboard'] = params['reply_markup'].get('inline_keyboard') or []
+            chat['keyboard_message_id'] = message_id
+        waiter = chat['waiter']
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', '')
+        }
+
+
+class MockDeepSeek:
+    """Заглушка chat completions с задержкой и ограниченной параллельностью провайдера"""
+
+    def __init__(self, rng: random.Random, latency: float, concurrency: int):
+        self.rng = rng
+        self.latency = latency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        # Запросы, ждущие свободного места у провайдера
+        self.waiting = 0
+        self.runner: Optional[web.AppRunner] = None
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        system_prompt = payload['messages'][0]['content']
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+        finally:
+            self.semaphore.release()
+
+        if system_prompt == INTERVIEW_SYSTEM_PROMPT:
+            content = questions_fixture(self.rng)
+        elif system_prompt == PLAN_SKELETON_SYSTEM_PROMPT:
+            content = json.dumps(skeleton_fixture(self.rng), ensure_ascii=False)
+        else:
+            content = json.dumps(compact_plan_fixture(self.rng), ensure_ascii=False)
+        return web.json_response({
+            'choices': [{'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': 800, 'prompt_cache_hit_tokens': 600, 'completion_tokens': len(content) // 3}
+        })
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post('/chat/completions', self.chat_completions)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+
+
+class Stage:
+    """Результаты одной ступени нагрузки"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.latencies: List[float] = []
+        self.step_latencies: Dict[str, List[float]] = {}
+        self.sessions = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.loop_lag: List[float] = []
+        self.queue_depth: List[int] = []
+        self.llm_waiting: List[int] = []
+
+
+def _percentile(values: List[float], quantile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+
+def _timer_total(*names: str) -> float:
+    """Суммарное время по длительностям с указанными именами (все метки)"""
+    return sum(timer.total for (name, _), timer in metrics.timers.items() if name in names)
+
+
+class LoadTest:
+    """Запуск сценариев с заданной частотой появления пользователей"""
+
+    def __init__(self, application, telegram: FakeTelegram, deepseek: MockDeepSeek, traces: List[List[Dict]],
+                 rng: random.Random, think_time: float, step_timeout: float):
+        self.application = application
+        self.telegram = telegram
+        self.deepseek = deepseek
+        self.traces = traces
+        self.rng = rng
+        self.think_time = think_time
+        self.step_timeout = step_timeout
+        self.user_ids = itertools.count(LOAD_TEST_USER_BASE)
+        self.update_ids = itertools.count(1)
+        self.stage: Optional[Stage] = None
+
+    def _user(self, user_id: int) -> Dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': 'Нагрузка', 'username': f"load{user_id}"}
+
+    def _message_update(self, user_id: int, text: str) -> Update:
+        message = {
+            'message_id': next(self.telegram.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return Update.de_json({'update_id': next(self.update_ids), 'message': message}, self.application.bot)
+
+    def _callback_update(self, user_id: int, data: str) -> Update:
+        chat = self.telegram.chat(user_id)
+        query = {
+            'id': str(next(self.update_ids)),
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': chat['keyboard_message_id'] or next(self.telegram.message_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': ''
+            }
+        }
+        return Update.de_json({'update_id': next(self.update_ids), 'callback_query': query}, self.application.bot)
+
+    def _find_button(self, user_id: int, text: str) -> Optional[str]:
+        for row in self.telegram.chat(user_id)['keyboard']:
+            for button in row:
+                if text in button.get('text', '') and button.get('callback_data'):
+                    return button['callback_data']
+        return None
+
+    async def _exchange(self, user_id: int, update: Update, label: str) -> bool:
+        """Отправить обновление и дождаться первого ответа бота в этом чате"""
+        stage = self.stage
+        chat = self.telegram.chat(user_id)
+        waiter = chat['waiter'] = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self.application.update_queue.put(update)
+        try:
+            answered = await asyncio.wait_for(waiter, self.step_timeout)
+        except asyncio.TimeoutError:
+            stage.timeouts += 1
+            return False
+        finally:
+            chat['waiter'] = None
+        stage.latencies.append(answered - started)
+        stage.step_latencies.setdefault(label, []).append(answered - started)
+        return True
+
+    async def run_session(self, steps: List[Dict]) -> None:
+        stage = self.stage
+        user_id = next(self.user_ids)
+        stage.sessions += 1
+        for step in steps:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+            if 'send' in step:
+                ok = await self._exchange(user_id, self._message_update(user_id, step['send']),
+                                          f"send:{step['send'] if step['send'].startswith('/') else 'text'}")
+            elif 'click' in step:
+                data = self._find_button(user_id, step['click'])
+                ok = data is not None and await self._exchange(
+                    user_id, self._callback_update(user_id, data), f"click:{step['click']}")
+            elif 'answer' in step:
+                ok = False
+                for _ in range(MAX_INTERVIEW_ANSWERS):
+                    if self._find_button(user_id, step['until']):
+                        ok = True
+                        break
+                    if not await self._exchange(user_id, self._message_update(user_id, step['answer']),
+                                                f"answer:{step['until']}"):
+                        break
+                    await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+            else:
+                ok = False
+            if not ok:
+                stage.failed += 1
+                return
+        stage.completed += 1
+
+    async def _sample(self, stage: Stage, interval: float = 0.05) -> None:
+        """Задержка цикла событий, очередь обновлений и очередь провайдера LLM"""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            stage.loop_lag.append(max(0.0, time.perf_counter() - started - interval))
+            stage.queue_depth.append(self.application.update_queue.qsize())
+            stage.llm_waiting.append(self.deepseek.waiting)
+
+    async def run_stage(self, rate: float, duration: float, drain: float) -> Dict:
+        """Ступень нагрузки: новые диалоги по Пуассону с частотой rate в секунду"""
+        stage = self.stage = Stage(rate)
+        db_before = _timer_total('db_query_seconds', 'db_transaction_seconds')
+        llm_before = _timer_total('llm_request_seconds')
+        handler_before = _timer_total('handler_seconds')
+        send_wait_before = _timer_total('telegram_send_wait_seconds')
+        sampler = asyncio.create_task(self._sample(stage))
+        started = time.perf_counter()
+
+        sessions = []
+        while time.perf_counter() - started < duration:
+            trace = self.rng.choice(self.traces) if self.traces else synthetic_session(self.rng)
+            sessions.append(asyncio.create_task(self.run_session(trace)))
+            await asyncio.sleep(self.rng.expovariate(rate))
+        if sessions:
+            _, pending = await asyncio.wait(sessions, timeout=drain)
+            for task in pending:
+                task.cancel()
+            stage.failed += len(pending)
+
+        sampler.cancel()
+        wall = time.perf_counter() - started
+        result = {
+            'rate': rate,
+            'sessions': stage.sessions,
+            'completed': stage.completed,
+            'failed': stage.failed,
+            'timeouts': stage.timeouts,
+            'throughput': len(stage.latencies) / wall,
+            'p50': _percentile(stage.latencies, 0.5),
+            'p95': _percentile(stage.latencies, 0.95),
+            'p99': _percentile(stage.latencies, 0.99),
+            'loop_lag_p95': _percentile(stage.loop_lag, 0.95),
+            'queue_depth_mean': sum(stage.queue_depth) / len(stage.queue_depth) if stage.queue_depth else 0.0,
+            'llm_waiting_max': max(stage.llm_waiting, default=0),
+            # Время в БД, LLM, обработчиках и ожидании лимитов на секунду ступени
+            # (параллельные вызовы LLM суммируются, поэтому доля LLM может быть больше 100%)
+            'db_share': (_timer_total('db_query_seconds', 'db_transaction_seconds') - db_before) / wall,
+            'llm_share': (_timer_total('llm_request_seconds') - llm_before) / wall,
+            'handler_share': (_timer_total('handler_seconds') - handler_before) / wall,
+            'send_wait_share': (_timer_total('telegram_send_wait_seconds') - send_wait_before) / wall
+        }
+        result['bottleneck'] = self._bottleneck(result)
+        result['steps'] = {label: _percentile(values, 0.95) for label, values in stage.step_latencies.items()}
+        return result
+
+    def _bottleneck(self, result: Dict) -> str:
+        """Эвристика: какой компонент насыщен на этой ступени"""
+        if result['db_share'] >= 0.5:
+            return 'БД (синхронные запросы блокируют цикл событий)'
+        if result['queue_depth_mean'] >= 1:
+            # Обработчики диалога неблокирующие - очередь растет, только пока цикл занят синхронной работой
+            busy = {
+                'ожидание LLM': result['llm_share'],
+                'БД': result['db_share'],
+                'лимиты отправки Telegram': result['send_wait_share'],
+                'CPU обработчиков': max(0.0, result['handler_share'] - result['llm_share']
+                                        - result['db_share'] - result['send_wait_share'])
+            }
+            return f"очередь обновлений (обработчик занят: {max(busy, key=busy.get)})"
+        if result['llm_waiting_max'] > 0:
+            return f"очередь LLM (параллельность провайдера {self.deepseek.concurrency})"
+        if result['loop_lag_p95'] >= 0.1:
+            return 'цикл событий (CPU)'
+        return '-'
+
+
+def _print_result(result: Dict) -> None:
+    print(
+        f"{result['rate']:>6.2f}/с  диалогов {result['sessions']:>4} (ок {result['completed']}, сбой {result['failed']})  "
+        f"ответов/с {result['throughput']:>6.2f}  p50/p95/p99 {result['p50']:.2f}/{result['p95']:.2f}/{result['p99']:.2f} с  "
+        f"лаг цикла p95 {result['loop_lag_p95'] * 1000:.0f} мс  очередь {result['queue_depth_mean']:.1f}  "
+        f"БД {result['db_share']:.0%}  LLM {result['llm_share']:.0%}  отправка {result['send_wait_share']:.0%}  "
+        f"-> {result['bottleneck']}"
+    )
+
+
+def cleanup_load_test_users() -> None:
+    """Удалить синтетических пользователей и их данные (каскадно)"""
+    db.execute_query("DELETE FROM athletes WHERE telegram_id >= %s", (LOAD_TEST_USER_BASE,))
+
+
+async def run(args) -> List[Dict]:
+    from main import setup_application
+
+    rng = random.Random(args.seed)
+    deepseek = MockDeepSeek(rng, args.llm_latency, args.llm_concurrency)
+    llm.base_url = await deepseek.start()
+    llm.api_key = 'load-test'
+    llm.headers['Authorization'] = 'Bearer load-test'
+    if args.no_llm_cache:
+        llm.cache = None
+    if args.no_telegram_limits:
+        sender.global_bucket = TokenBucket(1e6, 1e6)
+        sender.chat_rate = sender.chat_burst = 1e6
+        sender.chat_buckets.clear()
+
+    telegram = FakeTelegram(args.telegram_latency)
+    application = setup_application(request=telegram)
+    traces = load_traces(args.trace) if args.trace else []
+    test = LoadTest(application, telegram, deepseek, traces, rng, args.think_time, args.step_timeout)
+
+    results = []
+    try:
+        async with application:
+            await application.start()
+            try:
+                for rate in args.rates:
+                    logger.info(f"📈 Ступень нагрузки: {rate} новых диалогов в секунду")
+                    result = await test.run_stage(rate, args.stage_seconds, args.drain_seconds)
+                    _print_result(result)
+                    results.append(result)
+            finally:
+                await application.stop()
+    finally:
+        await deepseek.stop()
+
+    if results:
+        print("\np95 по шагам на последней ступени (с):")
+        for label, p95 in sorted(results[-1]['steps'].items(), key=lambda item: -item[1]):
+            print(f"  {label:<40} {p95:.2f}")
+    return results
+
+
+def main():
+    """Запуск нагрузочного теста из командной строки"""
+    parser = argparse.ArgumentParser(description='Нагрузочное тестирование бота на сценариях диалогов')
+    parser.add_argument('--rates', default='0.5,1,2,4',
+                        type=lambda value: [float(rate) for rate in value.split(',')],
+                        help='частоты появления новых диалогов в секунду, по ступеням')
+    parser.add_argument('--stage-seconds', type=float, default=60, help='длительность ступени')
+    parser.add_argument('--drain-seconds', type=float, default=120,
+                        help='сколько ждать завершения начатых диалогов после ступени')
+    parser.add_argument('--trace', help='JSONL-файл с записанными диалогами (по умолчанию - синтетические)')
+    parser.add_argument('--think-time', type=float, default=1.0, help='средняя пауза пользователя между шагами, с')
+    parser.add_argument('--step-timeout', type=float, default=120, help='максимальное ожидание ответа бота, с')
+    parser.add_argument('--llm-latency', type=float, default=2.0, help='средняя задержка ответа DeepSeek, с')
+    parser.add_argument('--llm-concurrency', type=int, default=8, help='параллельных запросов у провайдера')
+    parser.add_argument('--telegram-latency', type=float, default=0.05, help='задержка вызова Bot API, с')
+    parser.add_argument('--no-llm-cache', action='store_true', help='отключить кэш ответов LLM')
+    parser.add_argument('--no-telegram-limits', action='store_true', help='отключить лимиты исходящих сообщений')
+    parser.add_argument('--keep-data', action='store_true', help='не удалять синтетических пользователей')
+    parser.add_argument('--output', help='CSV-файл с кривой насыщения')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    config.BOT_TOKEN = config.BOT_TOKEN or '1:load-test'
+
+    try:
+        from main import initialize_database
+        initialize_database()
+        if not args.keep_data:
+            cleanup_load_test_users()
+        results = asyncio.run(run(args))
+        if not args.keep_data:
+            cleanup_load_test_users()
+    except Exception as e:
+        logger.error(f"❌ Ошибка нагрузочного теста: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    if args.output:
+        fields = [key for key in results[0] if key != 'steps'] if results else []
+        with open(args.output, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.DictWriter(output, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+        logger.info(f"💾 Кривая насыщения сохранена в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
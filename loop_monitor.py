@@ -0,0 +1,127 @@
+"""
+Монитор задержки цикла событий
+Корутина-пульс измеряет, насколько позже запланированного она просыпается;
+сторожевой поток, заметив остановку пульса дольше порога, снимает стек
+потока цикла событий - там находится блокирующий вызов (например, синхронный
+запрос psycopg2) - и относит остановку к обработчику и месту вызова
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional, Tuple
+
+from config import config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Кадры из файлов проекта; остальное (asyncio, telegram, psycopg2) пропускается при атрибуции
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+_HANDLER_MODULES = ('handlers', 'onboarding')
+
+
+def _frame_name(frame) -> str:
+    """module.function кадра (для методов - module.Class.function, где известен класс)"""
+    module = frame.f_globals.get('__name__', '?')
+    code = frame.f_code
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def attribute_stack(frame) -> Tuple[str, str]:
+    """
+    Обработчик и место вызова по стеку заблокированного потока.
+
+    Обработчик - самый внешний кадр из модулей обработчиков (handlers.start),
+    место вызова - то, что вызвал самый внутренний из них, со строкой вызова
+    (database.Database.get_user из handlers.py:47).
+    """
+    frames = []
+    while frame is not None:
+        if os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _PROJECT_DIR:
+            frames.append(frame)
+        frame = frame.f_back
+    if not frames:
+        return '-', '-'
+
+    handler_indexes = [i for i, f in enumerate(frames) if f.f_globals.get('__name__') in _HANDLER_MODULES]
+    if not handler_indexes:
+        return '-', f"{_frame_name(frames[0])}:{frames[0].f_lineno}"
+
+    caller = frames[handler_indexes[0]]
+    handler = _frame_name(frames[handler_indexes[-1]])
+    location = f"{os.path.basename(caller.f_code.co_filename)}:{caller.f_lineno}"
+    if handler_indexes[0] == 0:
+        # Блокирует сам код обработчика
+        return handler, f"{_frame_name(caller)} ({location})"
+    return handler, f"{_frame_name(frames[handler_indexes[0] - 1])} ({location})"
+
+
+class LoopMonitor:
+    """Измерение задержки цикла событий и атрибуция блокировок"""
+
+    def __init__(self, interval: float = None, threshold: float = None):
+        # Секунды; по умолчанию - из настроек в миллисекундах
+        self.interval = config.LOOP_MONITOR_INTERVAL_MS / 1000 if interval is None else interval
+        self.threshold = config.LOOP_LAG_THRESHOLD_MS / 1000 if threshold is None else threshold
+        self.last_beat = time.monotonic()
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        # Место блокировки, найденное сторожевым потоком: (обработчик, место вызова)
+        self._blocked_at: Optional[Tuple[str, str]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def run(self) -> None:
+        """Пульс цикла событий; запускает сторожевой поток"""
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        metrics.register_gauge('event_loop_max_lag_seconds', lambda: self.max_lag)
+        metrics.register_gauge('event_loop_stalls', lambda: self.stalls)
+        logger.info(f"🩺 Монитор цикла событий запущен (порог {self.threshold * 1000:.0f} мс)")
+        try:
+            while True:
+                self.last_beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+                self._beat(time.monotonic() - self.last_beat - self.interval)
+        finally:
+            self._stop.set()
+
+    def _beat(self, lag: float) -> None:
+        lag = max(0.0, lag)
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        metrics.observe('event_loop_lag_seconds', lag)
+        if lag < self.threshold:
+            return
+
+        handler, site = self._blocked_at or ('-', '-')
+        self._blocked_at = None
+        self.stalls += 1
+        metrics.inc('event_loop_stalls_total', handler=handler, site=site)
+        metrics.observe('event_loop_stall_seconds', lag, handler=handler)
+        logger.warning(f"🐢 Цикл событий заблокирован на {lag * 1000:.0f} мс: {site} в {handler}")
+
+    def _watch(self) -> None:
+        """Сторожевой поток: снимок стека цикла событий, пока пульс остановлен"""
+        while not self._stop.wait(self.threshold / 2):
+            stalled_for = time.monotonic() - self.last_beat - self.interval
+            if stalled_for < self.threshold or self._blocked_at is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._blocked_at = attribute_stack(frame)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# Глобальный экземпляр монитора
+loop_monitor = LoopMonitor()
@@ -5,18 +5,34 @@ Telegram Bot для AI диетолога 3.0
 Оптимизирован для развертывания на Amvera
 """
 
+import asyncio
 import logging
-import os
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ConversationHandler
+from collections import Counter
+from typing import Optional
+from telegram import Update
+from telegram.ext import (
+    Application, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters, ConversationHandler
+)
+from telegram.request import BaseRequest
 from handlers import (
     start, handle_main_menu, collect_parameters, 
     handle_training_interview, handle_activity_interview,
-    view_plan_day, cancel, back_to_menu, error_handler,
+    view_plan, view_plan_day, view_plan_stats, save_plan, view_saved_plans_page, ignore_callback,
+    busy_callback, busy_message,
+    cancel, back_to_menu, perf_command, profile_command, track_update, error_handler,
     MAIN_MENU, COLLECTING_PARAMS, TRAINING_INTERVIEW, 
-    ACTIVITY_INTERVIEW, VIEWING_PLAN, VIEWING_SAVED_PLANS
+    ACTIVITY_INTERVIEW, VIEWING_PLAN, VIEWING_SAVED_PLANS, STATE_NAMES
 )
 from config import config
 from database import db
+from metrics import metrics
+from plan_templates import plan_library
+from utils import callback_pattern
+from migrations import run_migrations
+from partitions import run_partition_maintenance
+from loop_monitor import loop_monitor
+from profiler import profiler
+from web_server import serve
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,11 +41,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def setup_application():
-    """Настройка и конфигурация приложения Telegram"""
+async def post_init(application: Application) -> None:
+    """Фоновые задачи, запускаемые после инициализации приложения"""
+    # Создание новых секций таблиц и архивирование старых
+    application.create_task(run_partition_maintenance(db))
+    # Задержка цикла событий и блокирующие вызовы в обработчиках
+    if config.LOOP_MONITOR_ENABLED:
+        application.create_task(loop_monitor.run())
+    # Окно профилирования обработчиков после запуска
+    if config.PROFILE_ON_START:
+        application.create_task(profiler.run_window())
+
+def _conversations_by_state(conv_handler: ConversationHandler) -> Counter:
+    """Число активных диалогов в каждом состоянии"""
+    # Публичного доступа к диалогам в python-telegram-bot нет
+    states = getattr(conv_handler, '_conversations', {}).values()
+    return Counter(STATE_NAMES.get(state, 'pending') for state in states)
+
+def _instrument_handlers(conv_handler: ConversationHandler) -> None:
+    """Замер длительности обработчиков с разбивкой по состояниям диалога"""
+    groups = [('entry', conv_handler.entry_points), ('fallback', conv_handler.fallbacks)]
+    groups.extend((STATE_NAMES[state], handlers) for state, handlers in conv_handler.states.items())
+    for state, handlers in groups:
+        for handler in handlers:
+            handler.callback = metrics.timed(
+                'handler_seconds', state=state, handler=handler.callback.__name__
+            )(handler.callback)
+
+def setup_application(request: Optional[BaseRequest] = None):
+    """
+    Настройка и конфигурация приложения Telegram
+    
+    request - транспорт Bot API вместо HTTP (нагрузочное тестирование без Telegram)
+    """
     
     # Создаем приложение Telegram
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    builder = Application.builder().token(config.BOT_TOKEN).post_init(post_init)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = builder.build()
     
     # Создаем ConversationHandler для управления состояниями
     conv_handler = ConversationHandler(
@@ -49,32 +99,65 @@ def setup_application():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_activity_interview)
             ],
             VIEWING_PLAN: [
-                CallbackQueryHandler(view_plan_day, pattern='^day_'),
+                CallbackQueryHandler(view_plan_day, pattern=callback_pattern('day')),
+                CallbackQueryHandler(save_plan, pattern=callback_pattern('save_plan')),
+                CallbackQueryHandler(view_plan_stats, pattern=callback_pattern('stats')),
+                CallbackQueryHandler(ignore_callback, pattern=callback_pattern('noop')),
                 CallbackQueryHandler(back_to_menu, pattern='^back_to_menu$')
             ],
             VIEWING_SAVED_PLANS: [
+                CallbackQueryHandler(view_plan, pattern=callback_pattern('view_plan')),
+                CallbackQueryHandler(view_saved_plans_page, pattern=callback_pattern('plans_page')),
                 CallbackQueryHandler(back_to_menu, pattern='^back_to_menu$')
+            ],
+            # Обновления пользователя, пока его предыдущий обработчик еще выполняется:
+            # переходы по дням идут параллельно (правки сообщения объединяются), остальное отклоняется
+            ConversationHandler.WAITING: [
+                # /cancel прерывает выполняющуюся генерацию вопросов или плана
+                CommandHandler('cancel', cancel),
+                CallbackQueryHandler(view_plan_day, pattern=callback_pattern('day')),
+                CallbackQueryHandler(view_plan_stats, pattern=callback_pattern('stats')),
+                CallbackQueryHandler(busy_callback),
+                # Только новые сообщения: у правок и постов каналов нет update.message
+                MessageHandler(filters.UpdateType.MESSAGE, busy_message)
             ]
         },
         fallbacks=[CommandHandler('cancel', cancel)],
-        allow_reentry=True
+        allow_reentry=True,
+        # Обработчики выполняются отдельными задачами: ожидание LLM или лимита отправки
+        # одного пользователя не задерживает обновления остальных
+        block=False
     )
     
+    _instrument_handlers(conv_handler)
+    
     # Добавляем обработчики
+    application.add_handler(TypeHandler(Update, track_update), group=-1)
     application.add_handler(conv_handler)
+    application.add_handler(CommandHandler('perf', perf_command))
+    application.add_handler(CommandHandler('profile', profile_command))
     application.add_error_handler(error_handler)
     
+    # Активные диалоги по состояниям и очередь необработанных обновлений
+    metrics.register_gauge('conversations', lambda: _conversations_by_state(conv_handler), label='state')
+    metrics.register_gauge('update_queue_depth', application.update_queue.qsize)
+    
     return application
 
-async def initialize_database():
+def initialize_database():
     """Инициализация базы данных при запуске"""
     try:
         # Проверяем соединение с базой данных
         db.connect()
         logger.info("✅ База данных успешно подключена")
         
-        # Можно добавить здесь автоматическое создание таблиц при необходимости
-        # db.execute_query("CREATE TABLE IF NOT EXISTS ...")
+        # Применяем недостающие миграции схемы
+        if config.DB_AUTO_MIGRATE:
+            run_migrations(db)
+        
+        # Заполняем библиотеку шаблонов планов питания
+        if config.PLAN_TEMPLATES_ENABLED:
+            plan_library.load_from_db(db)
         
     except Exception as e:
         logger.error(f"❌ Ошибка подключения к базе данных: {e}")
@@ -103,26 +186,13 @@ def main():
         
         # Запуск бота в зависимости от режима
         if config.IS_PRODUCTION:
-            # Режим webhook для Amvera
+            # Режим webhook для Amvera; порт Amvera передает через переменную PORT
             logger.info("🚀 Запуск в режиме webhook на Amvera")
-            
-            # Amvera автоматически предоставляет порт через переменную PORT
-            port = int(os.getenv('PORT', 8080))
-            
-            application.run_webhook(
-                listen="0.0.0.0",
-                port=port,
-                url_path=config.BOT_TOKEN,
-                webhook_url=config.WEBHOOK_URL,
-                drop_pending_updates=True
-            )
+            asyncio.run(serve(application, config.PORT, webhook_url=config.WEBHOOK_URL))
         else:
             # Режим polling для локальной разработки
             logger.info("🔧 Запуск в режиме polling для разработки")
-            application.run_polling(
-                drop_pending_updates=True,
-                allowed_updates=['message', 'callback_query']
-            )
+            asyncio.run(serve(application, config.PORT))
             
     except Exception as e:
         logger.error(f"❌ Ошибка запуска бота: {e}")
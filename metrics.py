@@ -0,0 +1,207 @@
+"""
+Внутренний реестр метрик производительности
+Модули публикуют счетчики, длительности операций и вычисляемые показатели;
+сводка доступна администратору командой /perf и в формате Prometheus на /metrics
+"""
+
+import functools
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Границы гистограмм длительностей (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Сколько последних значений хранить для процентилей
+RESERVOIR_SIZE = 1024
+
+# Префикс имен метрик в формате Prometheus
+PROMETHEUS_PREFIX = 'diet_bot_'
+
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Dict[str, object]) -> LabelsKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items())) if labels else ()
+
+
+class Timer:
+    """Длительности одной операции: количество, сумма, гистограмма и последние значения"""
+
+    __slots__ = ('count', 'total', 'max', 'buckets', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.recent: Deque[float] = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+        self.recent.append(seconds)
+
+    def percentiles(self, *quantiles: float) -> List[float]:
+        """Процентили по последним RESERVOIR_SIZE значениям"""
+        values = sorted(self.recent)
+        if not values:
+            return [0.0] * len(quantiles)
+        return [values[min(len(values) - 1, int(q * len(values)))] for q in quantiles]
+
+
+class MetricsRegistry:
+    """Счетчики, длительности и вычисляемые при запросе показатели"""
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, LabelsKey], float] = {}
+        self.timers: Dict[Tuple[str, LabelsKey], Timer] = {}
+        # Показатели вычисляются только при чтении сводки: name -> (функция, имя метки)
+        self.gauges: Dict[str, Tuple[Callable[[], object], Optional[str]]] = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Увеличить счетчик"""
+        key = (name, _labels_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Записать длительность операции"""
+        key = (name, _labels_key(labels))
+        timer = self.timers.get(key)
+        if timer is None:
+            timer = self.timers[key] = Timer()
+        timer.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Замер длительности блока (в том числе с await внутри)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """Декоратор корутины: длительность каждого вызова"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorator
+
+    def register_gauge(self, name: str, callback: Callable[[], object], label: Optional[str] = None) -> None:
+        """
+        Зарегистрировать вычисляемый показатель.
+
+        callback возвращает число, либо словарь {значение метки label: число}
+        для показателя с разбивкой (например, диалоги по состояниям).
+        """
+        self.gauges[name] = (callback, label)
+
+    def collect_gauges(self) -> Dict[Tuple[str, LabelsKey], float]:
+        """Текущие значения вычисляемых показателей"""
+        values = {}
+        for name, (callback, label) in self.gauges.items():
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if isinstance(value, dict):
+                for label_value, number in value.items():
+                    values[(name, ((label or 'key', str(label_value)),))] = float(number)
+            elif value is not None:
+                values[(name, ())] = float(value)
+        return values
+
+    def report(self) -> str:
+        """Текстовая сводка для /perf"""
+        lines = [f"⏱ Аптайм: {int(time.time() - self.started_at)} с"]
+
+        gauges = self.collect_gauges()
+        if gauges:
+            lines.append("\n📈 Показатели:")
+            lines.extend(f"• {_series(key)}: {_number(value)}" for key, value in sorted(gauges.items()))
+
+        if self.counters:
+            lines.append("\n🔢 Счетчики:")
+            lines.extend(f"• {_series(key)}: {_number(value)}" for key, value in sorted(self.counters.items()))
+
+        if self.timers:
+            lines.append("\n⏳ Длительности (p50 / p95 / p99 / max, мс):")
+            for key, timer in sorted(self.timers.items()):
+                p50, p95, p99 = timer.percentiles(0.5, 0.95, 0.99)
+                lines.append(
+                    f"• {_series(key)} ×{timer.count}: "
+                    f"{p50 * 1000:.0f} / {p95 * 1000:.0f} / {p99 * 1000:.0f} / {timer.max * 1000:.0f}"
+                )
+        return '\n'.join(lines)
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines: List[str] = []
+
+        def family(series: Dict, kind: str) -> None:
+            declared = set()
+            for (name, labels), value in sorted(series.items()):
+                metric = PROMETHEUS_PREFIX + name
+                if metric not in declared:
+                    declared.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                lines.append(f"{metric}{_prometheus_labels(labels)} {_number(value)}")
+
+        family(self.counters, 'counter')
+        family(self.collect_gauges(), 'gauge')
+
+        declared = set()
+        for (name, labels), timer in sorted(self.timers.items()):
+            metric = PROMETHEUS_PREFIX + name
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, timer.buckets):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_prometheus_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{_prometheus_labels(labels + (('le', '+Inf'),))} {timer.count}")
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {timer.total:.6f}")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {timer.count}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _prometheus_labels(labels: LabelsKey) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape_label_value(value)}"' for label, value in labels) + '}'
+
+
+def _series(key: Tuple[str, LabelsKey]) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    return f"{name}{{{', '.join(f'{label}={value}' for label, value in labels)}}}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.3f}"
+
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Версионные миграции схемы базы данных для AI диетолога 3.0
+Применяет недостающие миграции по таблице schema_version и проверяет индексы
+"""
+
+import argparse
+import logging
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock: миграции не выполняются параллельно из нескольких реплик
+MIGRATION_LOCK_ID = 802003
+
+# Ожидание блокировки таблицы при изменении схемы, чтобы не останавливать рабочие запросы
+LOCK_TIMEOUT = '5s'
+
+
+@dataclass
+class Migration:
+    """Миграция схемы"""
+    
+    version: int
+    description: str
+    statements: List[str] = field(default_factory=list)
+    # Выполнять вне транзакции (CREATE/DROP INDEX CONCURRENTLY)
+    concurrent: bool = False
+    # Перенос данных после выполнения statements
+    callback: Optional[Callable] = None
+    # Долго блокирует таблицы: не применяется при запуске бота, только явно (migrations.py --manual)
+    manual: bool = False
+
+
+def add_column(table: str, column: str, definition: str) -> List[str]:
+    """
+    Онлайн-безопасное добавление колонки.
+    
+    ADD COLUMN без DEFAULT или с константным DEFAULT не переписывает таблицу (PostgreSQL 11+),
+    а lock_timeout не дает запросу бесконечно ждать блокировку, останавливая остальные запросы.
+    """
+    return [
+        f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'",
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}"
+    ]
+
+
+def create_index_concurrently(name: str, table: str, columns: str) -> str:
+    """Создание индекса без блокировки записи в таблицу"""
+    return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"
+
+
+def drop_index_concurrently(name: str) -> str:
+    """Удаление индекса без блокировки записи в таблицу"""
+    return f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+
+
+BASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS athletes (
+        id SERIAL PRIMARY KEY,
+        telegram_id BIGINT UNIQUE NOT NULL,
+        username VARCHAR(100),
+        first_name VARCHAR(100),
+        last_name VARCHAR(100),
+        gender VARCHAR(10),
+        age INTEGER,
+        weight DECIMAL(5,2),
+        height DECIMAL(5,2),
+        sport_type VARCHAR(100),
+        training_frequency VARCHAR(50),
+        training_duration VARCHAR(50),
+        training_intensity VARCHAR(50),
+        goal TEXT,
+        competition_date DATE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS meal_plans (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+        plan_type VARCHAR(50) DEFAULT 'custom',
+        duration_days INTEGER DEFAULT 7,
+        total_calories DECIMAL(8,2),
+        protein_grams DECIMAL(8,2),
+        carbs_grams DECIMAL(8,2),
+        fat_grams DECIMAL(8,2),
+        plan_data JSONB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS meals (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+        meal_type VARCHAR(50) NOT NULL,
+        food_items JSONB NOT NULL,
+        calories DECIMAL(8,2),
+        protein_grams DECIMAL(8,2),
+        carbs_grams DECIMAL(8,2),
+        fat_grams DECIMAL(8,2),
+        meal_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS activities (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+        activity_type VARCHAR(50) NOT NULL,
+        activity_data JSONB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS workouts (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+        workout_type VARCHAR(100) NOT NULL,
+        duration_minutes INTEGER,
+        intensity VARCHAR(50),
+        calories_burned DECIMAL(8,2),
+        workout_data JSONB NOT NULL,
+        workout_date DATE DEFAULT CURRENT_DATE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+BASE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_athletes_telegram_id ON athletes(telegram_id)",
+    "CREATE INDEX IF NOT EXISTS idx_meal_plans_athlete_id ON meal_plans(athlete_id)",
+    "CREATE INDEX IF NOT EXISTS idx_meal_plans_created_at ON meal_plans(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_meals_athlete_id ON meals(athlete_id)",
+    "CREATE INDEX IF NOT EXISTS idx_meals_meal_time ON meals(meal_time)",
+    "CREATE INDEX IF NOT EXISTS idx_activities_athlete_id ON activities(athlete_id)",
+    "CREATE INDEX IF NOT EXISTS idx_activities_created_at ON activities(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_workouts_athlete_id ON workouts(athlete_id)",
+    "CREATE INDEX IF NOT EXISTS idx_workouts_workout_date ON workouts(workout_date)"
+]
+
+PLAN_STORAGE_TABLES = [
+    # Формат хранения плана: 1 - весь план в plan_data, 2 - дни в дочерних таблицах
+    *add_column('meal_plans', 'storage_format', 'SMALLINT NOT NULL DEFAULT 1'),
+
+    # Словарь повторяющихся текстов планов (названия продуктов, порции, рекомендации)
+    """
+    CREATE TABLE IF NOT EXISTS plan_strings (
+        id SERIAL PRIMARY KEY,
+        value_md5 CHAR(32) UNIQUE NOT NULL,
+        value TEXT NOT NULL
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS meal_plan_days (
+        plan_id INTEGER REFERENCES meal_plans(id) ON DELETE CASCADE,
+        day_number SMALLINT NOT NULL,
+        day_date TEXT,
+        training_schedule_id INTEGER REFERENCES plan_strings(id),
+        hydration_id INTEGER REFERENCES plan_strings(id),
+        recommendations_id INTEGER REFERENCES plan_strings(id),
+        total_calories REAL,
+        total_protein REAL,
+        total_carbs REAL,
+        total_fat REAL,
+        extra JSONB,
+        PRIMARY KEY (plan_id, day_number)
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS meal_plan_meals (
+        plan_id INTEGER NOT NULL,
+        day_number SMALLINT NOT NULL,
+        meal_index SMALLINT NOT NULL,
+        meal_time TEXT,
+        meal_type_id INTEGER REFERENCES plan_strings(id),
+        recommendations_id INTEGER REFERENCES plan_strings(id),
+        total_calories REAL,
+        total_protein REAL,
+        total_carbs REAL,
+        total_fat REAL,
+        extra JSONB,
+        PRIMARY KEY (plan_id, day_number, meal_index),
+        FOREIGN KEY (plan_id, day_number) REFERENCES meal_plan_days(plan_id, day_number) ON DELETE CASCADE
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS meal_plan_items (
+        plan_id INTEGER NOT NULL,
+        day_number SMALLINT NOT NULL,
+        meal_index SMALLINT NOT NULL,
+        item_index SMALLINT NOT NULL,
+        name_id INTEGER REFERENCES plan_strings(id),
+        portion_id INTEGER REFERENCES plan_strings(id),
+        calories REAL,
+        protein REAL,
+        carbs REAL,
+        fat REAL,
+        extra JSONB,
+        PRIMARY KEY (plan_id, day_number, meal_index, item_index),
+        FOREIGN KEY (plan_id, day_number, meal_index)
+            REFERENCES meal_plan_meals(plan_id, day_number, meal_index) ON DELETE CASCADE
+    )
+    """
+]
+
+
+def _migrate_plan_storage(database) -> None:
+    database.migrate_plan_storage()
+
+
+def _partition_tables(database) -> None:
+    from partitions import PARTITIONED_TABLES, convert_to_partitioned
+    for table in PARTITIONED_TABLES:
+        convert_to_partitioned(database, table)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'Базовые таблицы и индексы', BASE_TABLES + BASE_INDEXES),
+    Migration(2, 'Нормализованное хранение планов питания', PLAN_STORAGE_TABLES),
+    Migration(3, 'Перенос планов питания в нормализованный формат', callback=_migrate_plan_storage),
+    # telegram_id уже проиндексирован ограничением UNIQUE
+    Migration(4, 'Удаление дублирующего индекса athletes.telegram_id', [
+        drop_index_concurrently('idx_athletes_telegram_id')
+    ], concurrent=True),
+    # Составные индексы для горячих запросов; одиночные индексы по athlete_id становятся их префиксом
+    Migration(5, 'Составные индексы для планов и активностей', [
+        create_index_concurrently('idx_meal_plans_athlete_created', 'meal_plans', 'athlete_id, created_at DESC'),
+        create_index_concurrently('idx_activities_athlete_type_created', 'activities',
+                                  'athlete_id, activity_type, created_at DESC'),
+        drop_index_concurrently('idx_meal_plans_athlete_id'),
+        drop_index_concurrently('idx_activities_athlete_id')
+    ], concurrent=True),
+    # Переписывает таблицы целиком под ACCESS EXCLUSIVE: запись в meals, activities и workouts
+    # останавливается на время копирования - применять вручную в период низкой нагрузки
+    Migration(6, 'Помесячное секционирование meals, activities и workouts', callback=_partition_tables,
+              manual=True),
+    Migration(7, 'Дневные сводки питания', [
+        """
+        CREATE TABLE IF NOT EXISTS daily_nutrition (
+            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            calories DECIMAL(10,2) NOT NULL DEFAULT 0,
+            protein_grams DECIMAL(10,2) NOT NULL DEFAULT 0,
+            carbs_grams DECIMAL(10,2) NOT NULL DEFAULT 0,
+            fat_grams DECIMAL(10,2) NOT NULL DEFAULT 0,
+            meal_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (athlete_id, day)
+        )
+        """,
+        # Заполнение сводок по уже записанным приемам пищи
+        """
+        INSERT INTO daily_nutrition (athlete_id, day, calories, protein_grams, carbs_grams, fat_grams, meal_count)
+        SELECT athlete_id, meal_time::date,
+               COALESCE(SUM(calories), 0), COALESCE(SUM(protein_grams), 0),
+               COALESCE(SUM(carbs_grams), 0), COALESCE(SUM(fat_grams), 0), COUNT(*)
+        FROM meals
+        WHERE athlete_id IS NOT NULL
+        GROUP BY athlete_id, meal_time::date
+        ON CONFLICT (athlete_id, day) DO NOTHING
+        """
+    ]),
+    # Постраничный вывод планов по ключу (created_at, id) без сортировки
+    Migration(8, 'Индекс для постраничного вывода планов', [
+        create_index_concurrently('idx_meal_plans_athlete_created_id', 'meal_plans',
+                                  'athlete_id, created_at DESC, id DESC'),
+        drop_index_concurrently('idx_meal_plans_athlete_created')
+    ], concurrent=True),
+    # Дата и время из ответа LLM - свободный текст; VARCHAR -> TEXT не переписывает таблицу
+    Migration(9, 'Текстовые дата дня и время приема пищи в планах', [
+        f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'",
+        "ALTER TABLE meal_plan_days ALTER COLUMN day_date TYPE TEXT",
+        "ALTER TABLE meal_plan_meals ALTER COLUMN meal_time TYPE TEXT"
+    ]),
+]
+
+
+def _ensure_version_table(database) -> None:
+    database.execute_query("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_applied_versions(database) -> Set[int]:
+    """Версии примененных миграций (ручные миграции могут быть пропущены)"""
+    _ensure_version_table(database)
+    return {row['version'] for row in database.execute_query("SELECT version FROM schema_version")}
+
+
+def get_schema_version(database) -> int:
+    """Текущая версия схемы (0 - миграции не применялись)"""
+    _ensure_version_table(database)
+    result = database.execute_query("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+    return result[0]['version']
+
+
+def _drop_invalid_indexes(database) -> None:
+    """Удалить индексы, оставшиеся невалидными после прерванного CREATE INDEX CONCURRENTLY"""
+    rows = database.execute_query("""
+        SELECT c.relname AS index_name
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+    """)
+    for row in rows:
+        logger.warning(f"⚠️ Удаление невалидного индекса {row['index_name']}")
+        database.cursor.execute(drop_index_concurrently(row['index_name']))
+
+
+def _apply(database, migration: Migration) -> None:
+    """Применить одну миграцию и записать ее версию"""
+    if migration.concurrent:
+        # CONCURRENTLY нельзя выполнять внутри транзакции
+        database.connection.commit()
+        database.connection.autocommit = True
+        try:
+            _drop_invalid_indexes(database)
+            for statement in migration.statements:
+                database.cursor.execute(statement)
+        finally:
+            database.connection.autocommit = False
+    elif migration.statements:
+        with database.transaction() as cursor:
+            for statement in migration.statements:
+                cursor.execute(statement)
+    
+    if migration.callback:
+        migration.callback(database)
+    
+    database.execute_query(
+        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+        (migration.version, migration.description)
+    )
+
+
+def run_migrations(database, target: int = None, include_manual: bool = False) -> int:
+    """
+    Применить недостающие миграции до версии target (по умолчанию - до последней).
+    
+    Ручные миграции (manual) без include_manual пропускаются с предупреждением;
+    следующие за ними миграции применяются.
+    """
+    _ensure_version_table(database)
+    database.execute_query("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    try:
+        applied = get_applied_versions(database)
+        pending = [m for m in sorted(MIGRATIONS, key=lambda m: m.version)
+                   if m.version not in applied and (target is None or m.version <= target)]
+        
+        for migration in pending:
+            if migration.manual and not include_manual:
+                logger.warning(f"⚠️ Миграция {migration.version} ({migration.description}) блокирует таблицы "
+                               f"и применяется вручную: python migrations.py --manual")
+                continue
+            logger.info(f"🔧 Миграция {migration.version}: {migration.description}")
+            _apply(database, migration)
+            applied.add(migration.version)
+        
+        version = get_schema_version(database)
+        if any(migration.version in applied for migration in pending):
+            logger.info(f"✅ Схема базы данных обновлена до версии {version}")
+        return version
+    finally:
+        database.execute_query("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        database.connection.commit()
+
+
+def lint_indexes(database) -> List[Dict]:
+    """Найти дублирующие (совпадающие или покрытые префиксом другого) и неиспользуемые индексы"""
+    duplicates = database.execute_query("""
+        SELECT ca.relname AS table_name, ci.relname AS index_name, cb.relname AS covered_by
+        FROM pg_index a
+        JOIN pg_index b ON b.indrelid = a.indrelid AND b.indexrelid <> a.indexrelid
+        JOIN pg_class ca ON ca.oid = a.indrelid
+        JOIN pg_class ci ON ci.oid = a.indexrelid
+        JOIN pg_class cb ON cb.oid = b.indexrelid
+        JOIN pg_namespace n ON n.oid = ca.relnamespace
+        WHERE n.nspname = current_schema()
+          AND NOT a.indisunique AND NOT a.indisprimary
+          AND a.indexprs IS NULL AND b.indexprs IS NULL
+          AND a.indpred IS NULL AND b.indpred IS NULL
+          AND (
+              b.indkey::text LIKE a.indkey::text || ' %'
+              OR (b.indkey::text = a.indkey::text AND (b.indisunique OR b.indexrelid < a.indexrelid))
+          )
+        ORDER BY ca.relname, ci.relname
+    """)
+    unused = database.execute_query("""
+        SELECT s.relname AS table_name, s.indexrelname AS index_name,
+               pg_relation_size(s.indexrelid) AS size_bytes
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+          AND s.schemaname = current_schema()
+        ORDER BY size_bytes DESC
+    """)
+    
+    findings = [{'kind': 'duplicate', **row} for row in duplicates]
+    findings += [{'kind': 'unused', **row} for row in unused]
+    return findings
+
+
+def main():
+    """Запуск миграций и проверки индексов из командной строки"""
+    from database import db
+    
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Миграции схемы базы данных')
+    parser.add_argument('--target', type=int, help='версия схемы, до которой применять миграции')
+    parser.add_argument('--lint', action='store_true', help='только проверить индексы')
+    parser.add_argument('--manual', action='store_true',
+                        help='применить и ручные миграции, блокирующие таблицы (в период низкой нагрузки)')
+    args = parser.parse_args()
+    
+    try:
+        db.connect()
+        if args.lint:
+            for finding in lint_indexes(db):
+                if finding['kind'] == 'duplicate':
+                    logger.warning(f"⚠️ {finding['table_name']}.{finding['index_name']} дублирует {finding['covered_by']}")
+                else:
+                    logger.warning(f"⚠️ {finding['table_name']}.{finding['index_name']} не используется "
+                                   f"({finding['size_bytes']} байт)")
+        else:
+            run_migrations(db, args.target, include_manual=args.manual)
+    except Exception as e:
+        logger.error(f"❌ Ошибка миграции: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Сбор основных параметров пользователя
+Шаги описаны таблицей (поле, вопрос, проверка, следующий шаг); пол, возраст,
+вес и рост можно прислать одним сообщением: "м 25 75 180"
+"""
+
+import re
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database import db
+from utils import validate_date, validate_gender, validate_number
+
+# Значение не прошло проверку (None - допустимое значение, например "нет соревнований")
+INVALID = object()
+
+_TOKEN_SEPARATOR_RE = re.compile(r'[\s;/]+')
+
+
+@dataclass(frozen=True)
+class Step:
+    """Шаг сбора параметров"""
+    field: str
+    prompt: str
+    error: str
+    parse: Callable[[str], Any]
+    next: Optional[str]
+    # Значение без пробелов: несколько таких шагов подряд заполняются одним сообщением
+    token: bool = False
+
+
+def _text(value: str) -> Any:
+    value = value.strip()
+    return value if value else INVALID
+
+
+def _gender(value: str) -> Any:
+    return validate_gender(value) or INVALID
+
+
+def _number(value: str, min_val: float, max_val: float, integer: bool = False) -> Any:
+    number = validate_number(value, min_val, max_val)
+    if number is None or (integer and number != int(number)):
+        return INVALID
+    return int(number) if integer else number
+
+
+def _competition_date(value: str) -> Any:
+    if value.strip().lower() == 'нет':
+        return None
+    competition_date = validate_date(value.strip())
+    if competition_date is None or not db.validate_competition_date(competition_date):
+        return INVALID
+    return competition_date
+
+
+FIRST_STEP = 'sport_type'
+
+STEPS: Dict[str, Step] = {step.field: step for step in (
+    Step('sport_type', "🚀 Какой у тебя вид спорта? (например: бег, плавание, футбол)",
+         "Пожалуйста, напиши свой вид спорта:", _text, 'gender'),
+    Step('gender',
+         "👫 Укажи свой пол (мужской/женский).\n\n"
+         "Можно сразу пол, возраст, вес (кг) и рост (см) одним сообщением, например: м 25 75 180",
+         "Пожалуйста, укажи 'мужской' или 'женский':", _gender, 'age', token=True),
+    Step('age', "🎂 Сколько тебе лет?",
+         "Пожалуйста, укажи возраст целым числом от 10 до 100 лет:",
+         partial(_number, min_val=10, max_val=100, integer=True), 'weight', token=True),
+    Step('weight', "⚖️ Какой у тебя текущий вес (в кг)?",
+         "Пожалуйста, укажи вес числом от 30 до 200 кг (например: 75.5):",
+         partial(_number, min_val=30, max_val=200), 'height', token=True),
+    Step('height', "📏 Какой у тебя рост (в см)?",
+         "Пожалуйста, укажи рост числом от 100 до 250 см:",
+         partial(_number, min_val=100, max_val=250), 'goal', token=True),
+    Step('goal',
+         "🎯 Какая у тебя цель?\n"
+         "• Набор мышечной массы 💪\n"
+         "• Снижение веса 🏃‍♂️\n"
+         "• Поддержание формы ⚖️\n"
+         "• Подготовка к соревнованиям 🏆",
+         "Пожалуйста, опиши свою цель:", _text, 'competition_date'),
+    Step('competition_date',
+         "📅 Есть ли у тебя важные соревнования? Если да, укажи дату (в формате ДД.ММ.ГГГГ), "
+         "или напиши 'нет' если соревнований нет:",
+         "Пожалуйста, укажи будущую дату в формате ДД.ММ.ГГГГ или 'нет':", _competition_date, None)
+)}
+
+
+def first_prompt() -> str:
+    """Вопрос первого шага"""
+    return STEPS[FIRST_STEP].prompt
+
+
+def apply_input(state: Dict, text: str) -> Tuple[Optional[Step], Optional[str]]:
+    """
+    Применить сообщение пользователя к текущему шагу.
+
+    Значения записываются в state, state['current_step'] переходит к следующему
+    незаполненному шагу. Возвращает следующий шаг (None - сбор завершен) и текст
+    ошибки, если значение не прошло проверку.
+    """
+    step = STEPS[state.get('current_step', FIRST_STEP)]
+    if step.token:
+        tokens: List[str] = [token.strip(',') for token in _TOKEN_SEPARATOR_RE.split(text.strip())]
+        tokens = [token for token in tokens if token]
+    else:
+        tokens = [text]
+
+    error = None
+    while step is not None and tokens:
+        value = step.parse(tokens.pop(0))
+        if value is INVALID:
+            error = step.error
+            break
+        state[step.field] = value
+        step = STEPS[step.next] if step.next else None
+        # Свободный текст (цель, вид спорта) всегда отдельным сообщением
+        if step is not None and not step.token:
+            break
+
+    state['current_step'] = step.field if step else None
+    return step, error
@@ -0,0 +1,247 @@
+"""
+Помесячное секционирование таблиц meals, activities и workouts
+Создание секций наперед и отсоединение старых секций в архивную схему
+"""
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from typing import Dict, List
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Секционируемые таблицы: колонка секционирования и определение колонок
+PARTITIONED_TABLES: Dict[str, Dict] = {
+    'meals': {
+        'key': 'meal_time',
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('meals_id_seq'),
+            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+            meal_type VARCHAR(50) NOT NULL,
+            food_items JSONB NOT NULL,
+            calories DECIMAL(8,2),
+            protein_grams DECIMAL(8,2),
+            carbs_grams DECIMAL(8,2),
+            fat_grams DECIMAL(8,2),
+            meal_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, meal_time)
+        """,
+        'copy': """
+            id, athlete_id, meal_type, food_items, calories, protein_grams, carbs_grams, fat_grams,
+            COALESCE(meal_time, created_at, CURRENT_TIMESTAMP), created_at
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_meals_athlete_meal_time ON meals (athlete_id, meal_time)"
+        ]
+    },
+    'activities': {
+        'key': 'created_at',
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('activities_id_seq'),
+            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+            activity_type VARCHAR(50) NOT NULL,
+            activity_data JSONB NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        """,
+        'copy': """
+            id, athlete_id, activity_type, activity_data, COALESCE(created_at, CURRENT_TIMESTAMP)
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_activities_athlete_type_created "
+            "ON activities (athlete_id, activity_type, created_at DESC)"
+        ]
+    },
+    'workouts': {
+        'key': 'workout_date',
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('workouts_id_seq'),
+            athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+            workout_type VARCHAR(100) NOT NULL,
+            duration_minutes INTEGER,
+            intensity VARCHAR(50),
+            calories_burned DECIMAL(8,2),
+            workout_data JSONB NOT NULL,
+            workout_date DATE NOT NULL DEFAULT CURRENT_DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, workout_date)
+        """,
+        'copy': """
+            id, athlete_id, workout_type, duration_minutes, intensity, calories_burned, workout_data,
+            COALESCE(workout_date, created_at::date, CURRENT_DATE), created_at
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_workouts_athlete_workout_date ON workouts (athlete_id, workout_date)"
+        ]
+    }
+}
+
+_PARTITION_RE = re.compile(r'^(?P<table>\w+)_(?P<year>\d{4})_(?P<month>\d{2})$')
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Имя секции таблицы за месяц: meals_2025_01"""
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def _create_partition_sql(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    )
+
+
+def list_partitions(database, table: str) -> List[str]:
+    """Помесячные секции таблицы (без секции по умолчанию)"""
+    rows = database.execute_query("""
+        SELECT child.relname AS name
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        ORDER BY child.relname
+    """, (table,))
+    return [row['name'] for row in rows if _PARTITION_RE.match(row['name'])]
+
+
+def is_partitioned(database, table: str) -> bool:
+    """Таблица уже секционирована (миграция 6 применена)"""
+    result = database.execute_query("SELECT relkind FROM pg_class WHERE relname = %s", (table,))
+    return bool(result) and result[0]['relkind'] == 'p'
+
+
+def _create_partition(database, table: str, month: date) -> None:
+    """
+    Создать секцию за месяц в отдельной транзакции.
+
+    PostgreSQL не создает секцию, если в секции по умолчанию уже есть строки из ее
+    диапазона (например, workout_date в будущем). Такие строки переносятся: секция
+    по умолчанию отсоединяется, создается новая секция, строки вставляются заново
+    через родительскую таблицу, и секция по умолчанию присоединяется обратно.
+    """
+    key = PARTITIONED_TABLES[table]['key']
+    default = f"{table}_default"
+    bounds = (month, _add_months(month, 1))
+
+    with database.transaction() as cursor:
+        cursor.execute(f"SELECT COUNT(*) AS count FROM {default} WHERE {key} >= %s AND {key} < %s", bounds)
+        conflicting = cursor.fetchone()['count']
+        if not conflicting:
+            cursor.execute(_create_partition_sql(table, month))
+            return
+
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+        cursor.execute(_create_partition_sql(table, month))
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {default} WHERE {key} >= %s AND {key} < %s", bounds)
+        cursor.execute(f"DELETE FROM {default} WHERE {key} >= %s AND {key} < %s", bounds)
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+    logger.warning(f"⚠️ {conflicting} строк из {default} перенесено в секцию {partition_name(table, month)}")
+
+
+def ensure_partitions(database, months_ahead: int = None, start: date = None) -> int:
+    """
+    Создать недостающие секции с месяца start (по умолчанию - текущего) на months_ahead месяцев вперед.
+
+    Каждая секция создается в своей транзакции: ошибка одной секции не отменяет остальные.
+    Возвращает число созданных секций.
+    """
+    months_ahead = config.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    first = (start or date.today()).replace(day=1)
+    last = _add_months(date.today().replace(day=1), months_ahead)
+
+    created = 0
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(database, table):
+            continue
+        existing = set(list_partitions(database, table))
+        month = first
+        while month <= last:
+            if partition_name(table, month) not in existing:
+                try:
+                    _create_partition(database, table, month)
+                    created += 1
+                except Exception as e:
+                    logger.error(f"❌ Не удалось создать секцию {partition_name(table, month)}: {e}")
+            month = _add_months(month, 1)
+    return created
+
+
+def apply_retention(database, retention_months: int = None) -> List[str]:
+    """Отсоединить секции старше retention_months месяцев и перенести их в архивную схему"""
+    retention_months = config.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    if retention_months <= 0:
+        return []
+
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    schema = config.PARTITION_ARCHIVE_SCHEMA
+    archived = []
+
+    for table in PARTITIONED_TABLES:
+        for name in list_partitions(database, table):
+            match = _PARTITION_RE.match(name)
+            if date(int(match['year']), int(match['month']), 1) >= cutoff:
+                continue
+            with database.transaction() as cursor:
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {schema}")
+            archived.append(name)
+            logger.info(f"🗄 Секция {name} отсоединена и перенесена в схему {schema}")
+
+    return archived
+
+
+def convert_to_partitioned(database, table: str) -> bool:
+    """Перевести обычную таблицу в секционированную по месяцам с переносом данных"""
+    spec = PARTITIONED_TABLES[table]
+    key = spec['key']
+
+    if is_partitioned(database, table):
+        return False
+
+    legacy = f"{table}_legacy"
+    bounds = database.execute_query(f"SELECT MIN({key}) AS first FROM {table}")
+    first = bounds[0]['first'] if bounds and bounds[0]['first'] else date.today()
+    if isinstance(first, datetime):
+        first = first.date()
+
+    with database.transaction() as cursor:
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cursor.execute(f"CREATE TABLE {table} ({spec['columns']}) PARTITION BY RANGE ({key})")
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+        # Последовательность id переходит к новой таблице, иначе она удалится вместе со старой
+        cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+        month = first.replace(day=1)
+        last = _add_months(date.today().replace(day=1), config.PARTITION_MONTHS_AHEAD)
+        while month <= last:
+            cursor.execute(_create_partition_sql(table, month))
+            month = _add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {table} SELECT {spec['copy']} FROM {legacy}")
+        cursor.execute(f"DROP TABLE {legacy}")
+        for index_sql in spec['indexes']:
+            cursor.execute(index_sql)
+
+    logger.info(f"✅ Таблица {table} секционирована по {key}")
+    return True
+
+
+async def run_partition_maintenance(database, interval_hours: float = 24) -> None:
+    """Периодическое создание новых секций и архивирование старых"""
+    while True:
+        try:
+            ensure_partitions(database)
+            apply_retention(database)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обслуживания секций: {e}")
+        await asyncio.sleep(interval_hours * 3600)
@@ -0,0 +1,301 @@
+"""
+Отрисовка планов питания для Telegram
+Текст собирается в список фрагментов за один проход, каждое значение
+экранируется один раз под выбранную разметку (HTML или MarkdownV2),
+а результат делится на сообщения по границам приемов пищи
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+from config import config
+from plan_validation import to_number
+from profiler import profiled
+
+# Лимит Telegram - 4096 единиц UTF-16 (эмодзи вне BMP занимают две), в них же
+# считается длина сообщений при делении
+TELEGRAM_MESSAGE_LIMIT = 4096
+MESSAGE_CHUNK_SIZE = 4000
+
+SHOPPING_LIST_LIMIT = 10
+
+# Обратная косая черта первой, чтобы не экранировать добавленные символы повторно
+_MARKDOWN_V2_SPECIAL = '\\_*[]()~`>#+-=|{}.!'
+
+
+def escape_html(text) -> str:
+    """Экранирование текста для parse_mode=HTML"""
+    # str.replace с проверкой вхождения быстрее str.translate и re.sub на кириллице
+    text = str(text)
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def escape_markdown_v2(text) -> str:
+    """Экранирование текста для parse_mode=MarkdownV2"""
+    text = str(text)
+    for char in _MARKDOWN_V2_SPECIAL:
+        if char in text:
+            text = text.replace(char, '\\' + char)
+    return text
+
+
+class Markup:
+    """Экранирование и выделение текста для parse_mode Telegram"""
+
+    __slots__ = ('parse_mode', 'escape', '_bold_open', '_bold_close')
+
+    def __init__(self, parse_mode: str):
+        if parse_mode == 'HTML':
+            self.escape, self._bold_open, self._bold_close = escape_html, '<b>', '</b>'
+        elif parse_mode == 'MarkdownV2':
+            self.escape, self._bold_open, self._bold_close = escape_markdown_v2, '*', '*'
+        else:
+            raise ValueError(f"Неподдерживаемый parse_mode: {parse_mode}")
+        self.parse_mode = parse_mode
+
+    def bold(self, text) -> str:
+        return self._bold_open + self.escape(text) + self._bold_close
+
+
+_MARKUPS = {mode: Markup(mode) for mode in ('HTML', 'MarkdownV2')}
+
+# Неделимые элементы размеченного текста: тег, HTML-сущность, экранированный символ
+_MARKUP_TOKEN_RE = {
+    'HTML': re.compile(r'<[^<>]*>|&#?\w+;|.', re.DOTALL),
+    'MarkdownV2': re.compile(r'\\.|.', re.DOTALL),
+    None: re.compile(r'.', re.DOTALL)
+}
+
+
+def get_markup(parse_mode: Optional[str] = None) -> Markup:
+    """Разметка по имени parse_mode (по умолчанию - из настроек)"""
+    parse_mode = parse_mode or config.TELEGRAM_PARSE_MODE
+    markup = _MARKUPS.get(parse_mode)
+    if markup is None:
+        raise ValueError(f"Неподдерживаемый parse_mode: {parse_mode}")
+    return markup
+
+
+def utf16_len(text: str) -> int:
+    """Длина текста в единицах UTF-16, в которых Telegram считает лимит сообщения"""
+    return len(text) if text.isascii() else len(text.encode('utf-16-le')) // 2
+
+
+def _bold_tokens(parse_mode: Optional[str]):
+    if parse_mode is None:
+        return None, None
+    markup = get_markup(parse_mode)
+    return markup._bold_open, markup._bold_close
+
+
+def _split_long_line(line: str, limit: int, parse_mode: Optional[str]) -> List[str]:
+    """
+    Деление строки длиннее лимита по пробелам.
+
+    Теги, HTML-сущности и экранированные символы не разрываются; если разрезать
+    приходится внутри выделения, оно закрывается в конце части и открывается заново.
+    """
+    bold_open, bold_close = _bold_tokens(parse_mode)
+    tokens = _MARKUP_TOKEN_RE[parse_mode].findall(line)
+    sizes = [utf16_len(token) for token in tokens]
+    # bold[i] - выделение открыто после токена i
+    bold = []
+    opened = False
+    for token in tokens:
+        if token == bold_open and (not opened or bold_open != bold_close):
+            opened = True
+        elif token == bold_close:
+            opened = False
+        bold.append(opened)
+
+    budget = max(limit - utf16_len(bold_open or '') - utf16_len(bold_close or ''), 1)
+    pieces = []
+    start = 0
+    while start < len(tokens):
+        reopen = start > 0 and bold[start - 1]
+        size = 0
+        end = start
+        while end < len(tokens) and size + sizes[end] <= budget:
+            size += sizes[end]
+            end += 1
+        end = max(end, start + 1)
+        if end < len(tokens):
+            # Лучшая граница - после пробела вне выделения, затем любая вне выделения
+            cut = next((i for i in range(end, start, -1) if tokens[i - 1].isspace() and not bold[i - 1]), None)
+            if cut is None:
+                cut = next((i for i in range(end, start, -1) if not bold[i - 1]), end)
+            end = cut
+        piece = ''.join(tokens[start:end])
+        if reopen:
+            piece = bold_open + piece
+        if bold[end - 1]:
+            piece += bold_close
+        pieces.append(piece)
+        start = end
+    return pieces
+
+
+def _split_long_block(block: str, limit: int, parse_mode: Optional[str] = None) -> List[str]:
+    """Деление слишком длинного блока по строкам (строка длиннее лимита делится по пробелам)"""
+    pieces = []
+    for line in block.splitlines(keepends=True):
+        if utf16_len(line) > limit:
+            pieces.extend(_split_long_line(line, limit, parse_mode))
+        else:
+            pieces.append(line)
+    return pieces
+
+
+def split_message(blocks: Iterable[str], limit: int = MESSAGE_CHUNK_SIZE,
+                  parse_mode: Optional[str] = None) -> List[str]:
+    """
+    Упаковать блоки в сообщения не длиннее limit, не разрывая блоки без необходимости.
+
+    parse_mode - разметка блоков (None - простой текст): по ней длинные строки
+    делятся без разрыва тегов, сущностей и экранирования.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    for block in blocks:
+        block_size = utf16_len(block)
+        if block_size > limit:
+            pieces = [(piece, utf16_len(piece)) for piece in _split_long_block(block, limit, parse_mode)]
+        else:
+            pieces = ((block, block_size),)
+        for piece, piece_size in pieces:
+            if current and size + piece_size > limit:
+                chunks.append(''.join(current).strip('\n'))
+                current, size = [], 0
+            current.append(piece)
+            size += piece_size
+
+    if current:
+        chunks.append(''.join(current).strip('\n'))
+    return [chunk for chunk in chunks if chunk] or ['']
+
+
+def _nutrients_line(calories, protein, carbs, fat) -> str:
+    """"350 ккал, Б: 30г, У: 50г, Ж: 10г" по заполненным значениям"""
+    parts = []
+    if calories:
+        parts.append(f"{calories} ккал")
+    if protein:
+        parts.append(f"Б: {protein}г")
+    if carbs:
+        parts.append(f"У: {carbs}г")
+    if fat:
+        parts.append(f"Ж: {fat}г")
+    return ', '.join(parts)
+
+
+@profiled
+def render_plan_day(plan_data: Dict, day_number: int, parse_mode: Optional[str] = None) -> List[str]:
+    """День плана питания: список сообщений, разделенных по приемам пищи"""
+    markup = get_markup(parse_mode)
+    escape, bold = markup.escape, markup.bold
+
+    days = plan_data.get('days') or []
+    if not 1 <= day_number <= len(days) or not isinstance(days[day_number - 1], dict):
+        return [escape("❌ Информация о дне плана не найдена")]
+    day = days[day_number - 1]
+
+    header = [f"📋 {bold(f'День {day_number}')}"]
+    if day.get('date'):
+        header.append(f" • {escape(day['date'])}")
+    header.append("\n\n")
+    if day.get('training_schedule'):
+        header.append(f"🏋️ {bold('Тренировка:')} {escape(day['training_schedule'])}\n\n")
+    header.append(f"🍽 {bold('Питание:')}\n")
+    blocks = [''.join(header)]
+
+    for meal in day.get('meals') or []:
+        if not isinstance(meal, dict):
+            continue
+        parts = [f"\n{bold(str(meal.get('meal_type') or 'Прием пищи').capitalize())}"]
+        if meal.get('time'):
+            parts.append(' ' + escape(f"({meal['time']})"))
+        parts.append("\n")
+
+        for item in meal.get('food_items') or []:
+            if not isinstance(item, dict):
+                continue
+            line = f"• {item.get('name', '')}"
+            if item.get('portion'):
+                line += f" - {item['portion']}"
+            nutrients = _nutrients_line(item.get('calories'), item.get('protein'),
+                                        item.get('carbs'), item.get('fat'))
+            if nutrients:
+                line += f"\n  ({nutrients})"
+            parts.append(escape(line))
+            parts.append("\n")
+
+        if meal.get('total_calories'):
+            total = f" {meal['total_calories']} ккал"
+            macros = _nutrients_line(None, meal.get('total_protein'), meal.get('total_carbs'), meal.get('total_fat'))
+            if macros:
+                total += f" ({macros})"
+            parts.append(f"\n{bold('Итого:')}{escape(total)}\n")
+
+        if meal.get('recommendations'):
+            parts.append(f"💡 {bold('Рекомендации:')} {escape(meal['recommendations'])}\n")
+        blocks.append(''.join(parts))
+
+    footer = []
+    if day.get('hydration'):
+        footer.append(f"\n💧 {bold('Гидратация:')} {escape(day['hydration'])}\n")
+    if day.get('general_recommendations'):
+        footer.append(f"\n🌟 {bold('Рекомендации на день:')} {escape(day['general_recommendations'])}\n")
+    if footer:
+        blocks.append(''.join(footer))
+
+    return split_message(blocks, parse_mode=markup.parse_mode)
+
+
+@profiled
+def render_plan_stats(plan_data: Dict, parse_mode: Optional[str] = None) -> List[str]:
+    """Общая статистика плана питания: список сообщений"""
+    markup = get_markup(parse_mode)
+    escape, bold = markup.escape, markup.bold
+
+    parts = [f"📊 {bold('Общая статистика плана:')}\n\n"]
+    for key, label, unit in (('total_calories', 'Калории:', 'ккал/день'),
+                             ('protein_grams', 'Белки:', 'г/день'),
+                             ('carbs_grams', 'Углеводы:', 'г/день'),
+                             ('fat_grams', 'Жиры:', 'г/день')):
+        if plan_data.get(key):
+            parts.append(f"• {bold(label)} {escape(f'{plan_data[key]} {unit}')}\n")
+
+    # Распределение макросов по калориям
+    protein = to_number(plan_data.get('protein_grams')) * 4
+    carbs = to_number(plan_data.get('carbs_grams')) * 4
+    fat = to_number(plan_data.get('fat_grams')) * 9
+    energy = protein + carbs + fat
+    if protein and carbs and fat and energy > 0:
+        parts.append(f"\n{bold('Распределение макросов:')}\n")
+        parts.append(escape(
+            f"• Белки: {protein / energy * 100:.1f}%\n"
+            f"• Углеводы: {carbs / energy * 100:.1f}%\n"
+            f"• Жиры: {fat / energy * 100:.1f}%\n"
+        ))
+    blocks = [''.join(parts)]
+
+    if plan_data.get('general_recommendations'):
+        blocks.append(f"\n🌟 {bold('Общие рекомендации:')}\n{escape(plan_data['general_recommendations'])}\n")
+
+    shopping_list = plan_data.get('shopping_list')
+    if isinstance(shopping_list, list) and shopping_list:
+        lines = [f"{i}. {item}" for i, item in enumerate(shopping_list[:SHOPPING_LIST_LIMIT], 1)]
+        if len(shopping_list) > SHOPPING_LIST_LIMIT:
+            lines.append(f"... и еще {len(shopping_list) - SHOPPING_LIST_LIMIT} позиций")
+        shopping = '\n'.join(lines)
+        blocks.append(f"\n🛒 {bold('Список покупок:')}\n{escape(shopping)}\n")
+
+    return split_message(blocks, parse_mode=markup.parse_mode)
@@ -0,0 +1,171 @@
+"""
+Нормализованное хранение планов питания
+Дни, приемы пищи и продукты плана раскладываются по строкам дочерних таблиц,
+а повторяющиеся тексты (названия продуктов, порции, рекомендации) кодируются
+ссылками на общий словарь plan_strings
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from plan_validation import to_number
+
+# Формат хранения meal_plans.plan_data
+STORAGE_JSONB = 1        # весь план в одном JSONB
+STORAGE_NORMALIZED = 2   # в plan_data только заголовок, дни - в дочерних таблицах
+
+NUMERIC_TOTAL_FIELDS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat')
+ITEM_NUMERIC_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+
+# Текстовые поля, кодируемые через словарь: поле в плане -> колонка в таблице
+DAY_STRING_FIELDS = {
+    'training_schedule': 'training_schedule_id',
+    'hydration': 'hydration_id',
+    'general_recommendations': 'recommendations_id'
+}
+MEAL_STRING_FIELDS = {
+    'meal_type': 'meal_type_id',
+    'recommendations': 'recommendations_id'
+}
+ITEM_STRING_FIELDS = {
+    'name': 'name_id',
+    'portion': 'portion_id'
+}
+
+DAY_KNOWN_FIELDS = {'day_number', 'date', 'meals', *DAY_STRING_FIELDS, *NUMERIC_TOTAL_FIELDS}
+MEAL_KNOWN_FIELDS = {'time', 'food_items', *MEAL_STRING_FIELDS, *NUMERIC_TOTAL_FIELDS}
+ITEM_KNOWN_FIELDS = {*ITEM_STRING_FIELDS, *ITEM_NUMERIC_FIELDS}
+
+# Порядок колонок строк для вставки (plan_id добавляется первым)
+DAY_COLUMNS = ('day_number', 'day_date', *DAY_STRING_FIELDS.values(), *NUMERIC_TOTAL_FIELDS, 'extra')
+MEAL_COLUMNS = ('day_number', 'meal_index', 'meal_time', *MEAL_STRING_FIELDS.values(),
+                *NUMERIC_TOTAL_FIELDS, 'extra')
+ITEM_COLUMNS = ('day_number', 'meal_index', 'item_index', *ITEM_STRING_FIELDS.values(),
+                *ITEM_NUMERIC_FIELDS, 'extra')
+
+
+def string_digest(value: str) -> str:
+    """Ключ строки в словаре plan_strings"""
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def _days(plan_data: Dict) -> List[Dict]:
+    return [day for day in plan_data.get('days') or [] if isinstance(day, dict)]
+
+
+def _meals(day: Dict) -> List[Dict]:
+    return [meal for meal in day.get('meals') or [] if isinstance(meal, dict)]
+
+
+def _items(meal: Dict) -> List[Dict]:
+    return [item for item in meal.get('food_items') or [] if isinstance(item, dict)]
+
+
+def collect_strings(plan_data: Dict) -> Set[str]:
+    """Все тексты плана, которые кодируются через словарь"""
+    strings = set()
+    for day in _days(plan_data):
+        strings.update(str(day[field]) for field in DAY_STRING_FIELDS if day.get(field) is not None)
+        for meal in _meals(day):
+            strings.update(str(meal[field]) for field in MEAL_STRING_FIELDS if meal.get(field) is not None)
+            for item in _items(meal):
+                strings.update(str(item[field]) for field in ITEM_STRING_FIELDS if item.get(field) is not None)
+    return strings
+
+
+def _number(value) -> Optional[float]:
+    return None if value is None or value == '' else to_number(value)
+
+
+def _extra(source: Dict, known: Set[str]) -> Optional[Dict]:
+    """Поля, для которых нет отдельной колонки (хранятся в JSONB extra)"""
+    extra = {key: value for key, value in source.items() if key not in known}
+    return extra or None
+
+
+def split_plan(plan_data: Dict, string_ids: Dict[str, int]) -> Tuple[Dict, List[tuple], List[tuple], List[tuple]]:
+    """
+    Разложить план на заголовок и строки дней, приемов пищи и продуктов.
+
+    string_ids - соответствие текста и id в plan_strings для всех строк из collect_strings.
+    JSONB-колонка extra возвращается как dict - обертку для драйвера добавляет вызывающий.
+    """
+
+    def _ref(source: Dict, field: str) -> Optional[int]:
+        value = source.get(field)
+        return None if value is None else string_ids[str(value)]
+
+    header = {key: value for key, value in plan_data.items() if key != 'days'}
+    day_rows, meal_rows, item_rows = [], [], []
+
+    # Номер дня - позиция в списке: номера из ответа LLM могут повторяться и нарушить первичный ключ
+    for day_number, day in enumerate(_days(plan_data), 1):
+        day_rows.append((
+            day_number, day.get('date'),
+            *(_ref(day, field) for field in DAY_STRING_FIELDS),
+            *(_number(day.get(field)) for field in NUMERIC_TOTAL_FIELDS),
+            _extra(day, DAY_KNOWN_FIELDS)
+        ))
+        for meal_index, meal in enumerate(_meals(day)):
+            meal_rows.append((
+                day_number, meal_index, meal.get('time'),
+                *(_ref(meal, field) for field in MEAL_STRING_FIELDS),
+                *(_number(meal.get(field)) for field in NUMERIC_TOTAL_FIELDS),
+                _extra(meal, MEAL_KNOWN_FIELDS)
+            ))
+            for item_index, item in enumerate(_items(meal)):
+                item_rows.append((
+                    day_number, meal_index, item_index,
+                    *(_ref(item, field) for field in ITEM_STRING_FIELDS),
+                    *(_number(item.get(field)) for field in ITEM_NUMERIC_FIELDS),
+                    _extra(item, ITEM_KNOWN_FIELDS)
+                ))
+
+    return header, day_rows, meal_rows, item_rows
+
+
+def _clean(value):
+    """REAL из базы обратно в число без лишней дробной части"""
+    if isinstance(value, float):
+        value = round(value, 2)
+        if value == int(value):
+            return int(value)
+    return value
+
+
+def _restore(target: Dict, row: Dict, fields: Iterable[str]) -> None:
+    for field in fields:
+        if row.get(field) is not None:
+            target[field] = _clean(row[field])
+
+
+def assemble_days(day_rows: List[Dict], meal_rows: List[Dict], item_rows: List[Dict]) -> Dict[int, List[Dict]]:
+    """
+    Собрать дни планов из строк дочерних таблиц (тексты уже раскодированы).
+
+    Возвращает {plan_id: [день, ...]} в формате plan_data['days'].
+    """
+    items_by_meal: Dict[tuple, List[Dict]] = {}
+    for row in item_rows:
+        item = {}
+        _restore(item, row, (*ITEM_STRING_FIELDS, *ITEM_NUMERIC_FIELDS))
+        item.update(row.get('extra') or {})
+        items_by_meal.setdefault((row['plan_id'], row['day_number'], row['meal_index']), []).append(item)
+
+    meals_by_day: Dict[tuple, List[Dict]] = {}
+    for row in meal_rows:
+        meal = {}
+        _restore(meal, row, (*MEAL_STRING_FIELDS, 'time', *NUMERIC_TOTAL_FIELDS))
+        meal['food_items'] = items_by_meal.get((row['plan_id'], row['day_number'], row['meal_index']), [])
+        meal.update(row.get('extra') or {})
+        meals_by_day.setdefault((row['plan_id'], row['day_number']), []).append(meal)
+
+    days_by_plan: Dict[int, List[Dict]] = {}
+    for row in day_rows:
+        day = {'day_number': row['day_number']}
+        _restore(day, row, ('date', *DAY_STRING_FIELDS, *NUMERIC_TOTAL_FIELDS))
+        day['meals'] = meals_by_day.get((row['plan_id'], row['day_number']), [])
+        day.update(row.get('extra') or {})
+        days_by_plan.setdefault(row['plan_id'], []).append(day)
+
+    return days_by_plan
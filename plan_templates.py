@@ -0,0 +1,279 @@
+"""
+Библиотека шаблонов планов питания
+Поиск ближайшего ранее сгенерированного плана по профилю спортсмена
+и масштабирование порций под новую калорийность вместо вызова LLM
+"""
+
+import copy
+import logging
+import re
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from config import config
+from metrics import metrics
+from plan_validation import validate_plan_totals
+
+logger = logging.getLogger(__name__)
+
+# Коэффициенты активности и поправки на цель для расчета калорийности
+DEFAULT_ACTIVITY_FACTOR = 1.55
+GOAL_CALORIE_FACTORS = {
+    'gain': 1.10,
+    'loss': 0.85,
+    'competition': 1.05,
+    'maintain': 1.0
+}
+
+# Шаг (в единицах признака), соответствующий расстоянию 1.0
+NUMERIC_SCALES = {'age': 5.0, 'weight': 5.0, 'height': 5.0}
+
+# Вес различия ответов интервью в общей дистанции: вдвое больше порога по умолчанию,
+# чтобы в пределах PLAN_TEMPLATE_MAX_DISTANCE совпадала хотя бы половина слов ответов
+ANSWERS_WEIGHT = 3.0
+
+# Ответы с пищевыми ограничениями должны совпадать у шаблона и нового профиля дословно
+RESTRICTION_MARKERS = (
+    'аллерг', 'непереносим', 'вегет', 'веган', 'лактоз', 'глютен',
+    'орех', 'арахис', 'морепродукт', 'рыб', 'яйц', 'свинин', 'халял'
+)
+# Маркеры, которые совпадают только целым словом ('мед' не должен находить "медленно")
+RESTRICTION_WORDS = frozenset({'мед', 'меда', 'меду', 'медом'})
+
+# Слова ответа об ограничениях без собственного содержания: "нет аллергий" - не ограничение
+_RESTRICTION_FILLER_PREFIXES = (
+    'нет', 'никак', 'ничего', 'отсутств', 'без', 'аллерг', 'непереносим', 'ограничен', 'пищев', 'продукт'
+)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_PORTION_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def classify_goal(goal: Optional[str]) -> str:
+    """Нормализация текстовой цели спортсмена в категорию"""
+    text = (goal or '').lower()
+    if 'набор' in text or 'масс' in text:
+        return 'gain'
+    if 'сниж' in text or 'похуд' in text or 'сушк' in text:
+        return 'loss'
+    if 'соревн' in text:
+        return 'competition'
+    return 'maintain'
+
+
+def estimate_calorie_target(user_data: Dict) -> Optional[float]:
+    """Оценка суточной калорийности по формуле Миффлина-Сан Жеора"""
+    try:
+        weight = float(user_data['weight'])
+        height = float(user_data['height'])
+        age = float(user_data['age'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    bmr = 10 * weight + 6.25 * height - 5 * age
+    bmr += 5 if user_data.get('gender') == 'male' else -161
+    return bmr * DEFAULT_ACTIVITY_FACTOR * GOAL_CALORIE_FACTORS[classify_goal(user_data.get('goal'))]
+
+
+def _is_restriction_word(word: str) -> bool:
+    return word in RESTRICTION_WORDS or word.startswith(RESTRICTION_MARKERS)
+
+
+def _restriction_answers(texts: List[str]) -> FrozenSet[str]:
+    """
+    Нормализованные ответы о пищевых ограничениях.
+
+    Ответ учитывается, если в нем есть маркер ограничения; от него остаются
+    содержательные слова ("аллергия на киви" -> "киви"). Ответ из одних
+    отрицаний ("аллергий нет") ограничением не считается.
+    """
+    restrictions = set()
+    for text in texts:
+        words = [word for word in _WORD_RE.findall(text.lower()) if len(word) > 2]
+        if not any(map(_is_restriction_word, words)):
+            continue
+        content = sorted({word for word in words if not word.startswith(_RESTRICTION_FILLER_PREFIXES)})
+        if content:
+            restrictions.add(' '.join(content))
+    return frozenset(restrictions)
+
+
+def _answer_texts(interview_answers: Optional[Dict]) -> List[str]:
+    """Тексты ответов из данных интервью (training/activity)"""
+    texts = []
+    for section in (interview_answers or {}).values():
+        if isinstance(section, dict):
+            answers = section.get('answers', section)
+            texts.extend(str(value) for value in answers.values() if isinstance(value, (str, int, float)))
+    return texts
+
+
+class ProfileFeatures:
+    """Вектор признаков профиля спортсмена"""
+
+    __slots__ = ('key', 'numeric', 'tokens', 'restrictions')
+
+    def __init__(self, user_data: Dict, interview_answers: Optional[Dict] = None):
+        # Категориальные признаки должны совпадать полностью
+        self.key: Tuple[str, str, str, bool] = (
+            str(user_data.get('gender') or '').lower(),
+            str(user_data.get('sport_type') or '').strip().lower(),
+            classify_goal(user_data.get('goal')),
+            bool(user_data.get('competition_date'))
+        )
+        self.numeric: Tuple[float, ...] = tuple(
+            float(user_data.get(name) or 0) / scale for name, scale in NUMERIC_SCALES.items()
+        )
+
+        texts = _answer_texts(interview_answers)
+        words = set()
+        for text in texts:
+            words.update(word for word in _WORD_RE.findall(text.lower()) if len(word) > 2)
+        self.tokens: FrozenSet[str] = frozenset(words)
+        self.restrictions: FrozenSet[str] = _restriction_answers(texts)
+
+    def distance(self, other: 'ProfileFeatures') -> Optional[float]:
+        """Дистанция между профилями; None если профили несравнимы"""
+        if self.key != other.key or self.restrictions != other.restrictions:
+            return None
+
+        numeric = sum((a - b) ** 2 for a, b in zip(self.numeric, other.numeric)) ** 0.5
+
+        union = self.tokens | other.tokens
+        common = len(self.tokens & other.tokens)
+        if union and not common:
+            # Интервью без общих слов не сравнимы при любом пороге
+            return None
+        answers = 1.0 - common / len(union) if union else 0.0
+        return numeric + ANSWERS_WEIGHT * answers
+
+
+def scale_plan(plan_data: Dict, factor: float) -> Dict:
+    """Копия плана с порциями и пищевой ценностью, умноженными на factor"""
+    plan = copy.deepcopy(plan_data)
+
+    def _scale_portion(match: re.Match) -> str:
+        value = float(match.group().replace(',', '.')) * factor
+        return str(int(round(value)))
+
+    for day in plan.get('days') or []:
+        for meal in day.get('meals') or []:
+            for item in meal.get('food_items') or []:
+                for key in ('calories', 'protein', 'carbs', 'fat'):
+                    value = item.get(key)
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        item[key] = round(value * factor, 1)
+                if isinstance(item.get('portion'), str):
+                    item['portion'] = _PORTION_RE.sub(_scale_portion, item['portion'], count=1)
+
+    # Итоги пересчитываются из отмасштабированных продуктов
+    validate_plan_totals(plan)
+    return plan
+
+
+class PlanTemplate:
+    """Сохраненный план питания с признаками профиля, для которого он создан"""
+
+    __slots__ = ('plan_id', 'features', 'plan_data', 'calories')
+
+    def __init__(self, plan_id: Optional[int], features: ProfileFeatures, plan_data: Dict, calories: float):
+        self.plan_id = plan_id
+        self.features = features
+        self.plan_data = plan_data
+        self.calories = calories
+
+
+class PlanTemplateLibrary:
+    """Индекс планов питания по признакам профиля с поиском ближайшего"""
+
+    def __init__(self, max_distance: float = None, max_size: int = None):
+        self.max_distance = config.PLAN_TEMPLATE_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_size = max_size or config.PLAN_TEMPLATE_LIBRARY_SIZE
+        # Шаблоны сгруппированы по категориальным признакам: поиск идет только внутри группы
+        self.buckets: Dict[Tuple, Deque[PlanTemplate]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        metrics.register_gauge('plan_library_size', lambda: self.size)
+        metrics.register_gauge('plan_library_hit_rate', self.hit_rate)
+
+    def hit_rate(self) -> float:
+        """Доля запросов, обслуженных шаблоном вместо LLM"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def add(self, user_data: Dict, interview_answers: Optional[Dict], plan_data: Dict,
+            plan_id: Optional[int] = None) -> bool:
+        """Добавить проверенный план в библиотеку"""
+        days = plan_data.get('days') if isinstance(plan_data, dict) else None
+        if not days or not all(isinstance(day, dict) and day.get('meals') for day in days):
+            return False
+
+        plan = copy.deepcopy(plan_data)
+        validate_plan_totals(plan)
+        calories = float(plan.get('total_calories') or 0)
+        if calories <= 0:
+            return False
+
+        features = ProfileFeatures(user_data, interview_answers)
+        bucket = self.buckets.setdefault(features.key, deque())
+        bucket.append(PlanTemplate(plan_id, features, plan, calories))
+        self.size += 1
+
+        # Ограничиваем размер библиотеки, вытесняя самый старый шаблон крупнейшей группы
+        if self.size > self.max_size:
+            largest_key = max(self.buckets, key=lambda key: len(self.buckets[key]))
+            self.buckets[largest_key].popleft()
+            self.size -= 1
+        return True
+
+    def find(self, user_data: Dict, interview_answers: Optional[Dict] = None) -> Optional[Tuple[PlanTemplate, float]]:
+        """Найти ближайший шаблон в пределах max_distance"""
+        features = ProfileFeatures(user_data, interview_answers)
+        best: Optional[Tuple[PlanTemplate, float]] = None
+
+        for template in self.buckets.get(features.key, ()):
+            distance = features.distance(template.features)
+            if distance is not None and distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (template, distance)
+        return best
+
+    def build_plan(self, user_data: Dict, interview_answers: Optional[Dict] = None) -> Optional[Dict]:
+        """План питания из ближайшего шаблона, отмасштабированный под калорийность профиля"""
+        if not config.PLAN_TEMPLATES_ENABLED:
+            return None
+
+        target = estimate_calorie_target(user_data)
+        match = self.find(user_data, interview_answers) if target else None
+        if not match:
+            self.misses += 1
+            return None
+
+        template, distance = match
+        plan = scale_plan(template.plan_data, target / template.calories)
+        plan['generated_for'] = {
+            'user_id': user_data.get('telegram_id'),
+            'generated_at': str(datetime.now()),
+            'template_plan_id': template.plan_id,
+            'template_distance': round(distance, 3)
+        }
+        self.hits += 1
+        logger.info(f"📚 План построен из шаблона {template.plan_id} (дистанция {distance:.2f})")
+        return plan
+
+    def load_from_db(self, database, limit: int = None) -> int:
+        """Заполнить библиотеку последними планами из базы данных"""
+        loaded = 0
+        # Строки идут от новых к старым - добавляем в обратном порядке, чтобы вытеснялись старые
+        for row in reversed(database.get_plan_template_candidates(limit or self.max_size)):
+            user_data = {key: row.get(key) for key in
+                         ('gender', 'age', 'weight', 'height', 'sport_type', 'goal', 'competition_date')}
+            if self.add(user_data, row.get('interview_answers'), row['plan_data'], row['id']):
+                loaded += 1
+        logger.info(f"📚 Загружено шаблонов планов питания: {loaded}")
+        return loaded
+
+
+# Глобальная библиотека шаблонов
+plan_library = PlanTemplateLibrary()
@@ -0,0 +1,152 @@
+"""
+Проверка и пересчет итоговых значений плана питания
+Итоги приемов пищи, дней и всего плана пересчитываются из строк продуктов
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Пищевая ценность строки продукта
+ITEM_KEYS = ('calories', 'protein', 'carbs', 'fat')
+
+# Итоги приема пищи и дня
+MEAL_TOTAL_KEYS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat')
+
+# Итоги плана (среднее значение в день)
+PLAN_TOTAL_KEYS = ('total_calories', 'protein_grams', 'carbs_grams', 'fat_grams')
+
+# Допустимое расхождение: относительное и абсолютное (для малых значений)
+DEFAULT_TOLERANCE = 0.05
+ABSOLUTE_TOLERANCE = 1.0
+
+_NUMBER_RE = re.compile(r'-?\d+(?:[.,]\d+)?')
+
+
+def to_number(value) -> float:
+    """Приведение значения от LLM к числу ("25", "25.5г", 25 -> float)"""
+    value_type = type(value)
+    if value_type is int or value_type is float:
+        return value
+    if value_type is str:
+        match = _NUMBER_RE.search(value)
+        if match:
+            return float(match.group().replace(',', '.'))
+    return 0.0
+
+
+def _clean(value: float):
+    """Округление до 0.1 и отбрасывание пустой дробной части"""
+    value = round(value, 1)
+    return int(value) if value == int(value) else value
+
+
+def _missing(value) -> bool:
+    return value is None or value == ''
+
+
+def _column_sums(rows: Sequence[Sequence], width: int) -> List[Optional[float]]:
+    """
+    Суммы по столбцам таблицы строк за один проход.
+
+    None - в столбце нет ни одного значения (например, у продуктов указаны
+    только название и порция): пересчитывать такой итог не из чего.
+    """
+    if not rows:
+        return [0.0] * width
+    sums = []
+    for column in zip(*rows):
+        try:
+            sums.append(float(sum(column)))
+        except TypeError:
+            # Столбец содержит строки или None - приводим поэлементно
+            if all(map(_missing, column)):
+                sums.append(None)
+            else:
+                sums.append(sum(map(to_number, column)))
+    return sums
+
+
+def _reported(target: Dict, keys: Sequence[str], computed: Sequence[Optional[float]]) -> Tuple:
+    """Пересчитанные итоги; где пересчитать не из чего - итоги LLM (или None)"""
+    return tuple(
+        (None if _missing(target.get(key)) else to_number(target.get(key))) if value is None else value
+        for key, value in zip(keys, computed)
+    )
+
+
+def _reconcile(target: Dict, keys: Sequence[str], computed: Sequence[Optional[float]],
+               path: str, tolerance: float, correct: bool, issues: List[Dict]) -> None:
+    """Сравнить указанные итоги с пересчитанными и при необходимости исправить"""
+    for key, value in zip(keys, computed):
+        if value is None:
+            # Нет данных для пересчета - итог LLM не трогаем
+            continue
+        value = _clean(value)
+        if key in target and target[key] not in (None, ''):
+            reported = to_number(target[key])
+            allowed = max(ABSOLUTE_TOLERANCE, abs(value) * tolerance)
+            if abs(reported - value) > allowed:
+                issues.append({
+                    'path': path,
+                    'field': key,
+                    'reported': target[key],
+                    'computed': value
+                })
+        if correct:
+            target[key] = value
+
+
+def validate_plan_totals(plan_data: Dict, tolerance: float = DEFAULT_TOLERANCE,
+                         correct: bool = True) -> List[Dict]:
+    """
+    Пересчитать итоги приемов пищи, дней и плана из строк продуктов.
+
+    Возвращает список расхождений (path, field, reported, computed).
+    При correct=True итоги в plan_data заменяются пересчитанными значениями.
+    """
+    issues: List[Dict] = []
+    days = plan_data.get('days') if isinstance(plan_data, dict) else None
+    if not isinstance(days, list):
+        return issues
+
+    width = len(ITEM_KEYS)
+    day_rows: List[Tuple[float, ...]] = []
+
+    for day_index, day in enumerate(days):
+        if not isinstance(day, dict):
+            continue
+
+        meal_rows: List[Tuple[float, ...]] = []
+        for meal_index, meal in enumerate(day.get('meals') or []):
+            if not isinstance(meal, dict):
+                continue
+
+            item_rows = [
+                [item.get('calories'), item.get('protein'), item.get('carbs'), item.get('fat')]
+                for item in meal.get('food_items') or []
+                if type(item) is dict
+            ]
+            if not item_rows:
+                # Без строк продуктов пересчитывать нечего - доверяем итогам LLM
+                meal_rows.append(_reported(meal, MEAL_TOTAL_KEYS, (None,) * width))
+                continue
+
+            meal_sums = _column_sums(item_rows, width)
+            _reconcile(meal, MEAL_TOTAL_KEYS, meal_sums,
+                       f"days[{day_index}].meals[{meal_index}]", tolerance, correct, issues)
+            meal_rows.append(_reported(meal, MEAL_TOTAL_KEYS, meal_sums))
+
+        if not meal_rows:
+            continue
+
+        day_sums = _column_sums(meal_rows, width)
+        _reconcile(day, MEAL_TOTAL_KEYS, day_sums, f"days[{day_index}]", tolerance, correct, issues)
+        day_rows.append(_reported(day, MEAL_TOTAL_KEYS, day_sums))
+
+    if day_rows:
+        # Итоги плана - средние значения в день
+        plan_sums = [None if total is None else total / len(day_rows)
+                     for total in _column_sums(day_rows, width)]
+        _reconcile(plan_data, PLAN_TOTAL_KEYS, plan_sums, 'plan', tolerance, correct, issues)
+
+    return issues
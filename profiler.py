@@ -0,0 +1,121 @@
+"""
+Сэмплирующий профилировщик горячих путей обработчиков
+Функции, отмеченные @profiled, только регистрируются (без обертки и накладных
+расходов). Во время окна профилирования таймер процессорного времени
+(ITIMER_PROF) присылает SIGPROF, и обработчик сигнала записывает стек основного
+потока, если в нем есть отмеченная функция. Таймер идет только пока процесс
+занимает CPU, поэтому ожидание сети и ответов БД в профиль не попадает
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """Профилирование отмеченных функций в ограниченном окне времени"""
+
+    def __init__(self):
+        # Код отмеченных функций -> имя (module.function)
+        self.targets: Dict[object, str] = {}
+        # Стек от отмеченной функции до листа -> число выборок
+        self.samples: Counter = Counter()
+        # Выборки CPU вне отмеченных функций (цикл событий, библиотеки, фоновые задачи)
+        self.other_samples = 0
+        self.interval = 0.0
+        self.running = False
+
+    def profiled(self, func: Callable) -> Callable:
+        """Отметить функцию как точку входа профилирования (функция не оборачивается)"""
+        self.targets[func.__code__] = f"{func.__module__}.{func.__qualname__}"
+        return func
+
+    def _on_sample(self, signum, frame) -> None:
+        """Обработчик SIGPROF: стек основного потока с самой внешней отмеченной функцией"""
+        targets = self.targets
+        stack = []
+        entry = -1
+        while frame is not None:
+            if frame.f_code in targets:
+                entry = len(stack)
+            stack.append(frame)
+            frame = frame.f_back
+        if entry >= 0:
+            self.samples[tuple(_frame_label(f) for f in reversed(stack[:entry + 1]))] += 1
+        else:
+            self.other_samples += 1
+
+    async def run_window(self, seconds: float = None, interval_ms: float = None) -> Tuple[str, str]:
+        """
+        Профилировать seconds секунд; вызывается из цикла событий в основном потоке.
+
+        Возвращает путь к файлу свернутых стеков (формат flamegraph.pl/speedscope)
+        и текстовый отчет с функциями, дольше всего занимавшими CPU, по обработчикам.
+        """
+        if self.running:
+            raise RuntimeError("Профилирование уже запущено")
+        if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Профилирование доступно только в основном потоке на Unix")
+        seconds = config.PROFILE_SECONDS if seconds is None else seconds
+        self.interval = (config.PROFILE_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.samples = Counter()
+        self.other_samples = 0
+        self.running = True
+
+        previous = signal.signal(signal.SIGPROF, self._on_sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        logger.info(f"🔬 Профилирование запущено на {seconds:.0f} с")
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, previous)
+            self.running = False
+
+        path = self.write_collapsed()
+        report = self.report()
+        logger.info(f"🔬 Профилирование завершено: {sum(self.samples.values())} выборок, {path}\n{report}")
+        return path, report
+
+    def write_collapsed(self, directory: str = None) -> str:
+        """Свернутые стеки: "обработчик;функция;...;лист число_выборок" в строке"""
+        directory = directory or config.PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now():%Y%m%d-%H%M%S}.collapsed")
+        with open(path, 'w', encoding='utf-8') as output:
+            for stack, count in self.samples.most_common():
+                output.write(f"{';'.join(stack)} {count}\n")
+        return path
+
+    def report(self, top: int = 10) -> str:
+        """Функции с наибольшим собственным временем (лист стека) по обработчикам"""
+        by_handler: Dict[str, Counter] = {}
+        for stack, count in self.samples.items():
+            by_handler.setdefault(stack[0], Counter())[stack[-1]] += count
+
+        lines = [f"CPU вне отмеченных обработчиков: ~{self.other_samples * self.interval * 1000:.0f} мс"]
+        for handler, leaves in sorted(by_handler.items(), key=lambda item: -sum(item[1].values())):
+            total = sum(leaves.values())
+            lines.append(f"\n🔥 {handler}: {total} выборок (~{total * self.interval * 1000:.0f} мс CPU)")
+            for function, count in leaves.most_common(top):
+                lines.append(f"  {count / total:6.1%}  {function}")
+        return '\n'.join(lines)
+
+
+# Глобальный профилировщик
+profiler = SamplingProfiler()
+profiled = profiler.profiled
@@ -0,0 +1,190 @@
+"""
+Исходящие сообщения Telegram с ограничением частоты
+Общий и початовый token bucket, ожидание по RetryAfter (429)
+и объединение ожидающих правок одного сообщения
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram.error import BadRequest, RetryAfter
+
+from config import config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket с резервированием: запрос получает время ожидания своего токена"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Занять токен; возвращает, сколько секунд ждать до его появления"""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def block(self, seconds: float) -> None:
+        """Запретить отправку на seconds секунд (после RetryAfter)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class TelegramSender:
+    """Слой отправки сообщений для всех обработчиков"""
+
+    CHAT_BUCKETS_LIMIT = 10000
+
+    def __init__(self, global_rate: float = None, chat_rate: float = None, chat_burst: float = None,
+                 max_retries: int = None):
+        self.global_bucket = TokenBucket(global_rate or config.TELEGRAM_GLOBAL_RATE,
+                                         global_rate or config.TELEGRAM_GLOBAL_RATE)
+        self.chat_rate = chat_rate or config.TELEGRAM_CHAT_RATE
+        self.chat_burst = chat_burst or config.TELEGRAM_CHAT_BURST
+        self.max_retries = config.TELEGRAM_MAX_RETRIES if max_retries is None else max_retries
+        self.chat_buckets: 'OrderedDict[int, TokenBucket]' = OrderedDict()
+        # Ожидающие правки: (chat_id, message_id) -> последняя версия и общий результат
+        self._pending_edits: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.flood_wait_seconds = 0.0
+        metrics.register_gauge('telegram_sender', self.stats, label='counter')
+
+    def _chat_bucket(self, chat_id: Optional[int]) -> Optional[TokenBucket]:
+        if chat_id is None:
+            return None
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self.chat_buckets) > self.CHAT_BUCKETS_LIMIT:
+                self.chat_buckets.popitem(last=False)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _acquire(self, chat_id: Optional[int]) -> None:
+        """Дождаться токенов чата и общего лимита"""
+        bucket = self._chat_bucket(chat_id)
+        if bucket is not None:
+            wait = bucket.reserve()
+            if wait > 0:
+                metrics.observe('telegram_send_wait_seconds', wait, limit='chat')
+                await asyncio.sleep(wait)
+        wait = self.global_bucket.reserve()
+        if wait > 0:
+            metrics.observe('telegram_send_wait_seconds', wait, limit='global')
+            await asyncio.sleep(wait)
+
+    async def _call(self, chat_id: Optional[int], call: Callable[[], Awaitable]) -> Any:
+        """Вызов API с ожиданием RetryAfter; токены уже получены"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await call()
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                retry_after = float(e.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                self.flood_wait_seconds += retry_after
+                logger.warning(f"⏳ Лимит Telegram для чата {chat_id}: ожидание {retry_after:.0f} с")
+                bucket = self._chat_bucket(chat_id)
+                (bucket or self.global_bucket).block(retry_after)
+                await self._acquire(chat_id)
+
+    async def send(self, chat_id: Optional[int], call: Callable[[], Awaitable]) -> Any:
+        """Выполнить вызов Bot API с учетом лимитов"""
+        await self._acquire(chat_id)
+        return await self._call(chat_id, call)
+
+    async def reply_text(self, message, text: str, **kwargs) -> Any:
+        """message.reply_text через лимитер"""
+        return await self.send(message.chat_id, lambda: message.reply_text(text, **kwargs))
+
+    async def send_message(self, bot, chat_id: int, text: str, **kwargs) -> Any:
+        """bot.send_message через лимитер"""
+        return await self.send(chat_id, lambda: bot.send_message(chat_id, text, **kwargs))
+
+    async def edit_message_text(self, query, text: str, **kwargs) -> Any:
+        """
+        query.edit_message_text через лимитер.
+
+        Пока правка ждет токен, новые правки того же сообщения только заменяют
+        ее содержимое: отправляется одна, последняя версия. Правки пересекаются,
+        когда пользователь листает дни плана быстрее лимита чата: обработчики
+        диалога неблокирующие, и переходы по дням выполняются параллельно.
+        """
+        call = lambda: self._edit(query, text, **kwargs)
+        message = query.message
+        if message is None:
+            return await self.send(None, call)
+
+        key = (message.chat_id, message.message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            pending['call'] = call
+            self.coalesced += 1
+            return await asyncio.shield(pending['future'])
+
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending_edits[key] = {'call': call, 'future': future}
+        try:
+            try:
+                await self._acquire(message.chat_id)
+            finally:
+                # Правки, пришедшие после этого момента, отправляются уже отдельно
+                self._pending_edits.pop(key, None)
+            result = await self._call(message.chat_id, pending['call'])
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            # Исключение получат и вызвавший, и объединенные с ним правки
+            future.set_exception(e)
+            future.exception()
+            raise
+        future.set_result(result)
+        return result
+
+    @staticmethod
+    async def _edit(query, text: str, **kwargs) -> Any:
+        try:
+            return await query.edit_message_text(text, **kwargs)
+        except BadRequest as e:
+            # Повторный клик по той же кнопке - содержимое не изменилось
+            if 'not modified' in str(e).lower():
+                return None
+            raise
+
+    def stats(self) -> Dict:
+        """Счетчики отправки для мониторинга"""
+        return {
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'flood_wait_seconds': round(self.flood_wait_seconds, 1),
+            'pending_edits': len(self._pending_edits),
+            'chats': len(self.chat_buckets)
+        }
+
+
+# Глобальный экземпляр отправителя
+sender = TelegramSender()
@@ -0,0 +1,55 @@
+"""Тесты Database без подключения к PostgreSQL"""
+
+import re
+
+from database import Database
+from plan_storage import string_digest
+
+
+class FakeStringsCursor:
+    """Курсор, эмулирующий таблицу plan_strings"""
+
+    def __init__(self):
+        self.ids = {}
+        self.rows = []
+
+    def execute(self, query, params=None):
+        query = re.sub(r'\s+', ' ', query).strip()
+        if query.startswith('INSERT INTO plan_strings'):
+            for value in params[1]:
+                self.ids.setdefault(value, len(self.ids) + 1)
+        elif query.startswith('SELECT id, value FROM plan_strings'):
+            digests = set(params[0])
+            self.rows = [{'id': id_, 'value': value} for value, id_ in self.ids.items()
+                         if string_digest(value) in digests]
+        else:
+            raise AssertionError(f"Неожиданный запрос: {query}")
+
+    def fetchall(self):
+        return self.rows
+
+
+def _plan(*names):
+    return {'days': [{'meals': [{'food_items': [{'name': name} for name in names]}]}]}
+
+
+def test_intern_strings_after_cache_eviction():
+    database = Database()
+    database.STRING_CACHE_LIMIT = 3
+    cursor = FakeStringsCursor()
+
+    first = database._intern_strings(cursor, _plan('Овсянка', 'Банан'))
+    assert first == {'Овсянка': cursor.ids['Овсянка'], 'Банан': cursor.ids['Банан']}
+
+    # Новые строки переполняют кэш: уже известные строки плана тоже должны вернуться
+    second = database._intern_strings(cursor, _plan('Овсянка', 'Банан', 'Гречка', 'Творог'))
+    assert second == {name: cursor.ids[name] for name in ('Овсянка', 'Банан', 'Гречка', 'Творог')}
+    assert len(database._string_ids) == 4
+
+
+def test_intern_strings_uses_cache():
+    database = Database()
+    cursor = FakeStringsCursor()
+    database._intern_strings(cursor, _plan('Овсянка'))
+    cursor.ids.clear()  # без повторного запроса id берется из кэша
+    assert database._intern_strings(cursor, _plan('Овсянка')) == {'Овсянка': 1}
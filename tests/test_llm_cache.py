@@ -0,0 +1,36 @@
+"""Тесты приближенного кэша ответов LLM"""
+
+from llm_cache import SemanticCache
+from llm_integration import INTERVIEW_SYSTEM_PROMPT, llm
+
+USER = {
+    'first_name': 'Иван', 'gender': 'male', 'age': 25, 'weight': 75, 'height': 180,
+    'sport_type': 'триатлон', 'experience': '5 лет',
+    'goal': ('подготовка к полуэкстремальному триатлону: улучшить выносливость на длинной дистанции, '
+             'сохранить мышечную массу, наладить восстановление после объемных тренировок '
+             'и подобрать питание на дни с двумя тренировками подряд')
+}
+
+
+def _messages(interview_type):
+    return [
+        {"role": "system", "content": INTERVIEW_SYSTEM_PROMPT},
+        {"role": "user", "content": llm._build_interview_prompt(USER, interview_type)}
+    ]
+
+
+def test_interview_topics_do_not_share_cached_questions():
+    cache = SemanticCache(max_size=10, threshold=0.9)
+    training = {'choices': [{'message': {'content': '1. Сколько тренировок в неделю?'}}]}
+    cache.put(_messages('training'), 1000, training, 'training')
+
+    assert cache.get(_messages('activity'), 1000, 'activity') is None
+    assert cache.get(_messages('training'), 1000, 'training') is training
+
+
+def test_similar_prompts_share_answer_within_scope():
+    cache = SemanticCache(max_size=10, threshold=0.5)
+    response = {'choices': []}
+    cache.put(_messages('training'), 1000, response, 'training')
+
+    assert cache.get(_messages('activity'), 1000, 'training') is response
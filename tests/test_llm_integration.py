@@ -0,0 +1,28 @@
+"""Тесты разбора ответа LLM с планом питания"""
+
+import json
+
+from llm_integration import llm
+
+
+def test_compact_plan_with_scalar_rows_is_expanded_empty():
+    plan = llm._expand_compact_plan({'d': 5, 'r': 'Пей воду'})
+
+    assert plan['days'] == []
+    assert plan['general_recommendations'] == 'Пей воду'
+
+
+def test_compact_plan_skips_scalar_meal_and_item_rows():
+    plan = llm._expand_compact_plan({'d': [['Бег', '2 л', 3], ['', '', [['breakfast', '08:00', '', 7]]]]})
+
+    assert plan['days'][0]['meals'] == []
+    assert plan['days'][1]['meals'][0]['food_items'] == []
+
+
+def test_parse_meal_plan_with_scalar_rows_does_not_raise():
+    content = json.dumps({'d': [['', '', [['lunch', '13:00', '', [['Рис', '150 г', 200, 4, 45, 1]]], 9]]]})
+
+    plan = llm._parse_meal_plan(content, {'telegram_id': 1})
+
+    assert plan is not None
+    assert plan['days'][0]['meals'][0]['food_items'][0]['name'] == 'Рис'
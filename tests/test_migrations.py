@@ -0,0 +1,53 @@
+"""Тесты применения миграций без подключения к PostgreSQL"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import migrations
+from migrations import Migration
+
+
+class FakeDatabase:
+    def __init__(self, applied=()):
+        self.versions = set(applied)
+        self.statements = []
+        self.connection = SimpleNamespace(commit=lambda: None)
+
+    def execute_query(self, query, params=None):
+        if query.startswith('INSERT INTO schema_version'):
+            self.versions.add(params[0])
+        elif query.startswith('SELECT version FROM schema_version'):
+            return [{'version': version} for version in self.versions]
+        elif 'MAX(version)' in query:
+            return [{'version': max(self.versions, default=0)}]
+        return []
+
+    @contextmanager
+    def transaction(self):
+        yield SimpleNamespace(execute=self.statements.append)
+
+
+def _migrations(monkeypatch):
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [
+        Migration(1, 'first', ['SELECT 1']),
+        Migration(2, 'rewrite', ['SELECT 2'], manual=True),
+        Migration(3, 'third', ['SELECT 3'])
+    ])
+
+
+def test_manual_migration_is_skipped_by_default(monkeypatch):
+    _migrations(monkeypatch)
+    database = FakeDatabase()
+
+    assert migrations.run_migrations(database) == 3
+    assert database.versions == {1, 3}
+    assert database.statements == ['SELECT 1', 'SELECT 3']
+
+
+def test_manual_migration_applied_on_request(monkeypatch):
+    _migrations(monkeypatch)
+    database = FakeDatabase(applied={1, 3})
+
+    migrations.run_migrations(database, include_manual=True)
+    assert database.versions == {1, 2, 3}
+    assert database.statements == ['SELECT 2']
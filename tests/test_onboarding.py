@@ -0,0 +1,38 @@
+"""Тесты сбора основных параметров пользователя"""
+
+import pytest
+
+from onboarding import apply_input
+
+
+def _state(step):
+    return {'current_step': step}
+
+
+@pytest.mark.parametrize('text', ['м nan', 'м inf', 'м -inf', 'м 25.5'])
+def test_invalid_age_is_rejected(text):
+    state = _state('gender')
+
+    step, error = apply_input(state, text)
+
+    assert step.field == 'age' and error
+    assert 'age' not in state
+
+
+@pytest.mark.parametrize('weight', ['nan', 'NaN', 'inf', 'infinity'])
+def test_non_finite_weight_is_rejected(weight):
+    state = _state('gender')
+
+    step, error = apply_input(state, f'м 25 {weight} 180')
+
+    assert step.field == 'weight' and error
+    assert state['age'] == 25 and 'weight' not in state
+
+
+def test_all_parameters_in_one_message():
+    state = _state('gender')
+
+    step, error = apply_input(state, 'м 25 75,5 180')
+
+    assert step.field == 'goal' and error is None
+    assert (state['gender'], state['age'], state['weight'], state['height']) == ('male', 25, 75.5, 180)
@@ -0,0 +1,67 @@
+"""Тесты создания секций без подключения к PostgreSQL"""
+
+from contextlib import contextmanager
+from datetime import date
+
+import partitions
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.count = 0
+
+    def execute(self, query, params=None):
+        if query.startswith('SELECT COUNT(*)'):
+            table = query.split(' FROM ')[1].split('_default')[0]
+            self.count = self.database.default_rows.get((table, params[0]), 0)
+            return
+        if query.startswith('CREATE TABLE') and any(name in query for name in self.database.failing):
+            raise RuntimeError('updated partition constraint for default partition would be violated')
+        self.database.pending.append(query)
+
+    def fetchone(self):
+        return {'count': self.count}
+
+
+class FakeDatabase:
+    def __init__(self, failing=(), default_rows=None):
+        self.failing = failing
+        self.default_rows = default_rows or {}
+        self.pending = []
+        self.committed = []
+
+    def execute_query(self, query, params=None):
+        if 'relkind' in query:
+            return [{'relkind': 'p'}]
+        return []
+
+    @contextmanager
+    def transaction(self):
+        self.pending = []
+        yield FakeCursor(self)
+        self.committed.extend(self.pending)
+
+
+def test_failed_partition_does_not_roll_back_others():
+    today = date.today().replace(day=1)
+    failing = partitions.partition_name('workouts', partitions._add_months(today, 1))
+    database = FakeDatabase(failing=(failing,))
+
+    created = partitions.ensure_partitions(database, months_ahead=1)
+
+    assert created == 5
+    assert not any(failing in query for query in database.committed)
+    assert any(partitions.partition_name('meals', today) in query for query in database.committed)
+
+
+def test_default_rows_are_moved_into_new_partition():
+    today = date.today().replace(day=1)
+    database = FakeDatabase(default_rows={('workouts', today): 3})
+
+    partitions.ensure_partitions(database, months_ahead=0)
+
+    workouts = [query for query in database.committed if 'workouts' in query]
+    assert workouts[0] == 'ALTER TABLE workouts DETACH PARTITION workouts_default'
+    assert workouts[1].startswith(f"CREATE TABLE IF NOT EXISTS {partitions.partition_name('workouts', today)}")
+    assert workouts[-1] == 'ALTER TABLE workouts ATTACH PARTITION workouts_default DEFAULT'
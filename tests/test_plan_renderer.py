@@ -0,0 +1,52 @@
+"""Тесты деления плана питания на сообщения Telegram"""
+
+import re
+
+from plan_renderer import MESSAGE_CHUNK_SIZE, render_plan_day, split_message, utf16_len
+
+LONG_TEXT = ' '.join(f"совет&{i} <ешь> овощи (много) 🥦💪" for i in range(400))
+
+
+def _plan(recommendations, name='Овсянка'):
+    return {'days': [{'meals': [{
+        'meal_type': 'breakfast',
+        'food_items': [{'name': name, 'portion': '100 г', 'calories': 350}],
+        'recommendations': recommendations
+    }]}]}
+
+
+def test_long_html_recommendation_keeps_tags_and_entities():
+    chunks = render_plan_day(_plan(LONG_TEXT), 1, 'HTML')
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert utf16_len(chunk) <= MESSAGE_CHUNK_SIZE
+        assert chunk.count('<b>') == chunk.count('</b>')
+        assert not re.search(r'&(?!amp;|lt;|gt;)', chunk)
+        assert not re.search(r'<(?!/?b>)', chunk)
+    text = re.sub(r'</?b>', '', ''.join(chunks))
+    assert text.count('совет&amp;') == 400
+
+
+def test_long_markdown_item_name_keeps_escapes_and_bold():
+    chunks = render_plan_day(_plan('', name=LONG_TEXT), 1, 'MarkdownV2')
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert utf16_len(chunk) <= MESSAGE_CHUNK_SIZE
+        assert not re.search(r'(?<!\\)(?:\\\\)*\\$', chunk)
+        assert len(re.findall(r'(?<!\\)\*', chunk)) % 2 == 0
+
+
+def test_long_bold_text_is_reopened_in_next_piece():
+    chunks = split_message(['<b>' + 'ж' * 50 + '</b>'], limit=20, parse_mode='HTML')
+
+    assert all(chunk.startswith('<b>') and chunk.endswith('</b>') for chunk in chunks)
+    assert ''.join(re.sub(r'</?b>', '', chunk) for chunk in chunks) == 'ж' * 50
+
+
+def test_emoji_counted_in_utf16_units():
+    chunks = split_message(['💪' * 3000])
+
+    assert len(chunks) == 2
+    assert all(utf16_len(chunk) <= MESSAGE_CHUNK_SIZE for chunk in chunks)
@@ -0,0 +1,43 @@
+"""Тесты раскладки плана по строкам дочерних таблиц"""
+
+from database import Database
+from plan_storage import STORAGE_JSONB, collect_strings, split_plan
+
+
+def test_split_plan_numbers_days_by_position():
+    plan = {'days': [
+        {'day_number': 1, 'meals': [{'meal_type': 'breakfast', 'food_items': []}]},
+        {'day_number': 1, 'meals': [{'meal_type': 'lunch', 'food_items': []}]},
+        {'meals': []},
+        {'day_number': 2, 'date': 'понедельник, 1 сентября 2025 года', 'meals': []}
+    ]}
+    string_ids = {value: index for index, value in enumerate(collect_strings(plan), 1)}
+
+    _, day_rows, meal_rows, _ = split_plan(plan, string_ids)
+
+    assert [row[0] for row in day_rows] == [1, 2, 3, 4]
+    assert [row[0] for row in meal_rows] == [1, 2]
+    assert day_rows[3][1] == 'понедельник, 1 сентября 2025 года'
+
+
+class FakePlanDatabase(Database):
+    """Database, возвращающая план в формате JSONB без обращения к PostgreSQL"""
+
+    def __init__(self, plan_data):
+        super().__init__()
+        self.plan_data = plan_data
+
+    def execute_query(self, query, params=None):
+        return [{'storage_format': STORAGE_JSONB, 'plan_data': self.plan_data}]
+
+
+def test_get_plan_day_jsonb_indexes_by_position():
+    database = FakePlanDatabase({'days': [
+        {'meals': [{'meal_type': 'breakfast'}]},
+        {'day_number': 1, 'meals': [{'meal_type': 'lunch'}]}
+    ]})
+
+    assert database.get_plan_day(1, 1)['meals'][0]['meal_type'] == 'breakfast'
+    assert database.get_plan_day(1, 2)['meals'][0]['meal_type'] == 'lunch'
+    assert database.get_plan_day(1, 3) is None
+    assert database.get_plan_day(1, 0) is None
@@ -0,0 +1,49 @@
+"""Тесты поиска шаблонов планов питания"""
+
+from plan_templates import PlanTemplateLibrary, ProfileFeatures
+
+USER = {'gender': 'male', 'age': 25, 'weight': 75, 'height': 180, 'sport_type': 'бег', 'goal': 'поддержание'}
+
+PLAN = {'days': [{'meals': [{'meal_type': 'breakfast', 'food_items': [
+    {'name': 'Овсянка', 'portion': '100 г', 'calories': 2500, 'protein': 150, 'carbs': 300, 'fat': 80}
+]}]}]}
+
+
+def _answers(*texts):
+    return {'training': {'answers': {str(i): text for i, text in enumerate(texts)}}}
+
+
+def test_negated_allergy_is_not_a_restriction():
+    features = ProfileFeatures(USER, _answers('Аллергий нет', 'Никаких пищевых ограничений'))
+
+    assert features.restrictions == frozenset()
+
+
+def test_different_allergens_are_not_comparable():
+    kiwi = ProfileFeatures(USER, _answers('бегаю 5 раз в неделю', 'аллергия на киви'))
+    strawberry = ProfileFeatures(USER, _answers('бегаю 5 раз в неделю', 'аллергия на клубнику'))
+
+    assert kiwi.distance(strawberry) is None
+
+
+def test_honey_marker_matches_whole_word_only():
+    features = ProfileFeatures(USER, _answers('бегаю медленно'))
+
+    assert features.restrictions == frozenset()
+    assert ProfileFeatures(USER, _answers('не ем мед')).restrictions == frozenset({'мед'})
+
+
+def test_disjoint_interviews_never_match():
+    library = PlanTemplateLibrary(max_distance=100.0)
+    library.add(USER, _answers('бегаю утром по стадиону'), PLAN, plan_id=1)
+
+    assert library.find(USER, _answers('плавание вечером в бассейне')) is None
+
+
+def test_similar_interview_matches():
+    library = PlanTemplateLibrary()
+    library.add(USER, _answers('бегаю утром по стадиону', 'аллергий нет'), PLAN, plan_id=1)
+
+    match = library.find(USER, _answers('бегаю утром по стадиону', 'нет'))
+
+    assert match is not None and match[0].plan_id == 1
@@ -0,0 +1,46 @@
+"""Тесты пересчета итогов плана питания"""
+
+from plan_validation import validate_plan_totals
+
+
+def _plan(items, meal_totals=None, day_totals=None, plan_totals=None):
+    meal = {'meal_type': 'breakfast', 'food_items': items, **(meal_totals or {})}
+    return {'days': [{'meals': [meal], **(day_totals or {})}], **(plan_totals or {})}
+
+
+def test_totals_recomputed_from_items():
+    plan = _plan([{'name': 'Овсянка', 'calories': 300, 'protein': 10, 'carbs': 50, 'fat': 5},
+                  {'name': 'Банан', 'calories': '100 ккал', 'protein': 1, 'carbs': 25, 'fat': 0}],
+                 meal_totals={'total_calories': 500})
+
+    issues = validate_plan_totals(plan)
+
+    meal = plan['days'][0]['meals'][0]
+    assert meal['total_calories'] == 400 and meal['total_protein'] == 11
+    assert plan['total_calories'] == 400
+    assert [issue['field'] for issue in issues] == ['total_calories']
+
+
+def test_items_without_nutrients_keep_reported_totals():
+    plan = _plan([{'name': 'Овсянка', 'portion': '250 г'}, {'name': 'Банан', 'portion': '1 шт'}],
+                 meal_totals={'total_calories': 420, 'total_protein': 14},
+                 day_totals={'total_calories': 420},
+                 plan_totals={'total_calories': 420, 'protein_grams': 14})
+
+    assert validate_plan_totals(plan) == []
+
+    meal = plan['days'][0]['meals'][0]
+    assert meal['total_calories'] == 420 and meal['total_protein'] == 14
+    assert 'total_carbs' not in meal
+    # Итог дня пересчитывается из итогов приемов пищи, которые указал LLM
+    assert plan['days'][0]['total_calories'] == 420
+    assert plan['protein_grams'] == 14
+
+
+def test_nothing_to_recompute_leaves_plan_untouched():
+    plan = _plan([{'name': 'Овсянка'}], day_totals={'total_calories': 2500},
+                 plan_totals={'total_calories': 2500})
+
+    assert validate_plan_totals(plan) == []
+    assert plan['days'][0]['total_calories'] == 2500
+    assert plan['total_calories'] == 2500
@@ -4,144 +4,175 @@
 """
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from typing import List, Dict, Optional
-from datetime import datetime, date
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+import math
 import re
 
+from config import config
+
+# Версия формата callback_data: старые кнопки в истории чата продолжают работать
+CALLBACK_VERSION = '1'
+
+# Действие -> однобуквенный код в callback_data
+CALLBACK_ACTIONS = {
+    'view_plan': 'p',
+    'day': 'd',
+    'save_plan': 's',
+    'stats': 't',
+    'plans_page': 'g',
+    'noop': 'n'
+}
+_ACTIONS_BY_CODE = {code: action for action, code in CALLBACK_ACTIONS.items()}
+
+# Формат до версии 1: {префикс}{аргументы через "_"}
+_LEGACY_PREFIXES = {
+    'view_plan': 'view_plan_',
+    'day': 'day_',
+    'save_plan': 'save_plan_',
+    'stats': 'stats_',
+    'plans_page': 'plans_page_'
+}
+
+TELEGRAM_CALLBACK_LIMIT = 64
+
+# Точка отсчета курсора страницы (created_at хранится без часового пояса)
+_CURSOR_EPOCH = datetime(2000, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _to_base36(value: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    if value < 0:
+        return '-' + _to_base36(-value)
+    result = ''
+    while True:
+        value, remainder = divmod(value, 36)
+        result = digits[remainder] + result
+        if not value:
+            return result
+
+def encode_callback(action: str, *args: int) -> str:
+    """Компактный callback_data: версия, код действия и аргументы в base36"""
+    data = f"{CALLBACK_VERSION}{CALLBACK_ACTIONS[action]}:" + ':'.join(_to_base36(arg) for arg in args)
+    if len(data.encode('utf-8')) > TELEGRAM_CALLBACK_LIMIT:
+        raise ValueError(f"callback_data длиннее {TELEGRAM_CALLBACK_LIMIT} байт: {data}")
+    return data
+
+def decode_callback(data: str) -> Optional[Tuple[str, List[int]]]:
+    """Разбор callback_data (текущего и старого формата) в действие и аргументы"""
+    try:
+        if data[:1] == CALLBACK_VERSION and data[2:3] == ':' and data[1] in _ACTIONS_BY_CODE:
+            return _ACTIONS_BY_CODE[data[1]], [int(arg, 36) for arg in data[3:].split(':') if arg]
+        
+        for action, prefix in _LEGACY_PREFIXES.items():
+            if data.startswith(prefix):
+                if action == 'plans_page':
+                    # Старый курсор страницы не переносим - открываем первую страницу
+                    return action, []
+                return action, [int(arg) for arg in data[len(prefix):].split('_')]
+    except ValueError:
+        pass
+    return None
+
+def callback_pattern(action: str) -> str:
+    """Регулярное выражение для CallbackQueryHandler: текущий и старый формат действия"""
+    patterns = [re.escape(f"{CALLBACK_VERSION}{CALLBACK_ACTIONS[action]}:")]
+    if action in _LEGACY_PREFIXES:
+        patterns.append(re.escape(_LEGACY_PREFIXES[action]))
+    return f"^({'|'.join(patterns)})"
+
+def encode_page_cursor(cursor: Tuple[datetime, int]) -> Tuple[int, int]:
+    """Курсор страницы (created_at, id) в аргументы callback_data"""
+    created_at, item_id = cursor
+    return (created_at - _CURSOR_EPOCH) // _MICROSECOND, item_id
+
+def decode_page_cursor(args: List[int]) -> Optional[Tuple[datetime, int]]:
+    """Курсор страницы из аргументов callback_data (None - первая страница)"""
+    if len(args) != 2:
+        return None
+    return _CURSOR_EPOCH + args[0] * _MICROSECOND, args[1]
+
+# Неизменяемые клавиатуры создаются один раз при импорте
+_BACK_TO_MENU_BUTTON = InlineKeyboardButton("← Назад", callback_data="back_to_menu")
+
+_MAIN_MENU_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🍽 Создать план питания", callback_data="generate_plan")],
+    [InlineKeyboardButton("📋 Мои планы", callback_data="view_saved_plans")],
+    [InlineKeyboardButton("⚙️ Настройки", callback_data="settings")],
+    [InlineKeyboardButton("❌ Отмена", callback_data="cancel")]
+])
+
+_START_INTERVIEW_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Начать интервью 🏋️‍♂️", callback_data="start_interview")]
+])
+
+_CONTINUE_INTERVIEW_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Продолжить интервью 🚶‍♂️", callback_data="continue_activity_interview")]
+])
+
 def main_menu_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура главного меню"""
-    keyboard = [
-        [InlineKeyboardButton("🍽 Создать план питания", callback_data="generate_plan")],
-        [InlineKeyboardButton("📋 Мои планы", callback_data="view_saved_plans")],
-        [InlineKeyboardButton("⚙️ Настройки", callback_data="settings")],
-        [InlineKeyboardButton("❌ Отмена", callback_data="cancel")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return _MAIN_MENU_KEYBOARD
 
+def start_interview_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура начала интервью о тренировках"""
+    return _START_INTERVIEW_KEYBOARD
+
+def continue_interview_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура перехода к интервью об активности"""
+    return _CONTINUE_INTERVIEW_KEYBOARD
+
+@lru_cache(maxsize=config.KEYBOARD_CACHE_SIZE)
 def view_plan_keyboard(plan_id: int, current_day: int, total_days: int = 7) -> InlineKeyboardMarkup:
-    """Клавиатура для навигации по дням плана питания"""
+    """Клавиатура для навигации по дням плана питания (одна на план и день)"""
     keyboard = []
     
     # Кнопки навигации по дням
     nav_buttons = []
     if current_day > 1:
-        nav_buttons.append(InlineKeyboardButton("◀️ Предыдущий", callback_data=f"day_{plan_id}_{current_day-1}"))
+        nav_buttons.append(InlineKeyboardButton("◀️ Предыдущий", callback_data=encode_callback('day', plan_id, current_day - 1)))
     
-    nav_buttons.append(InlineKeyboardButton(f"День {current_day}", callback_data=f"day_info_{current_day}"))
+    nav_buttons.append(InlineKeyboardButton(f"День {current_day}", callback_data=encode_callback('noop')))
     
     if current_day < total_days:
-        nav_buttons.append(InlineKeyboardButton("Следующий ▶️", callback_data=f"day_{plan_id}_{current_day+1}"))
+        nav_buttons.append(InlineKeyboardButton("Следующий ▶️", callback_data=encode_callback('day', plan_id, current_day + 1)))
     
     if nav_buttons:
         keyboard.append(nav_buttons)
     
     # Дополнительные кнопки
     keyboard.extend([
-        [InlineKeyboardButton("💾 Сохранить план", callback_data=f"save_plan_{plan_id}")],
-        [InlineKeyboardButton("📊 Общая статистика", callback_data=f"stats_{plan_id}")],
+        [InlineKeyboardButton("💾 Сохранить план", callback_data=encode_callback('save_plan', plan_id))],
+        [InlineKeyboardButton("📊 Общая статистика", callback_data=encode_callback('stats', plan_id))],
         [InlineKeyboardButton("← Назад в меню", callback_data="back_to_menu")]
     ])
     
     return InlineKeyboardMarkup(keyboard)
 
-def format_meal_plan_day(plan_data: Dict, day_number: int) -> str:
-    """Форматирование дня плана питания для отображения"""
-    if 'days' not in plan_data or day_number < 1 or day_number > len(plan_data['days']):
-        return "❌ Информация о дне плана не найдена"
-    
-    day_info = plan_data['days'][day_number - 1]
-    response = f"📋 *День {day_number}* • {day_info.get('date', '')}\n\n"
-    
-    # Тренировочное расписание
-    if day_info.get('training_schedule'):
-        response += f"🏋️ *Тренировка:* {day_info['training_schedule']}\n\n"
-    
-    # Приемы пищи
-    response += "🍽 *Питание:*\n"
-    for meal in day_info.get('meals', []):
-        response += f"\n*{meal['meal_type'].capitalize()}* ({meal['time']})\n"
-        
-        for item in meal.get('food_items', []):
-            response += f"• {item['name']} - {item['portion']}\n"
-            
-            # Пищевая ценность
-            nutrients = []
-            if item.get('calories'):
-                nutrients.append(f"{item['calories']} ккал")
-            if item.get('protein'):
-                nutrients.append(f"Б: {item['protein']}г")
-            if item.get('carbs'):
-                nutrients.append(f"У: {item['carbs']}г")
-            if item.get('fat'):
-                nutrients.append(f"Ж: {item['fat']}г")
-                
-            if nutrients:
-                response += f"  ({', '.join(nutrients)})\n"
-        
-        # Итоги по приему пищи
-        if meal.get('total_calories'):
-            response += f"\n*Итого:* {meal['total_calories']} ккал"
-            if meal.get('total_protein'):
-                response += f" (Б: {meal['total_protein']}г"
-            if meal.get('total_carbs'):
-                response += f", У: {meal['total_carbs']}г"
-            if meal.get('total_fat'):
-                response += f", Ж: {meal['total_fat']}г"
-            response += ")\n"
-        
-        # Рекомендации
-        if meal.get('recommendations'):
-            response += f"💡 *Рекомендации:* {meal['recommendations']}\n"
-    
-    # Гидратация
-    if day_info.get('hydration'):
-        response += f"\n💧 *Гидратация:* {day_info['hydration']}\n"
-    
-    # Общие рекомендации дня
-    if day_info.get('general_recommendations'):
-        response += f"\n🌟 *Рекомендации на день:* {day_info['general_recommendations']}\n"
-    
-    return response
-
-def format_plan_stats(plan_data: Dict) -> str:
-    """Форматирование статистики плана питания"""
-    response = "📊 *Общая статистика плана:*\n\n"
-    
-    if plan_data.get('total_calories'):
-        response += f"• *Калории:* {plan_data['total_calories']} ккал/день\n"
-    if plan_data.get('protein_grams'):
-        response += f"• *Белки:* {plan_data['protein_grams']} г/день\n"
-    if plan_data.get('carbs_grams'):
-        response += f"• *Углеводы:* {plan_data['carbs_grams']} г/день\n"
-    if plan_data.get('fat_grams'):
-        response += f"• *Жиры:* {plan_data['fat_grams']} г/день\n"
-    
-    # Расчет макросов в процентах
-    if all([plan_data.get('protein_grams'), plan_data.get('carbs_grams'), plan_data.get('fat_grams')]):
-        total_grams = plan_data['protein_grams'] + plan_data['carbs_grams'] + plan_data['fat_grams']
-        if total_grams > 0:
-            protein_pct = (plan_data['protein_grams'] * 4 / (plan_data['protein_grams'] * 4 + plan_data['carbs_grams'] * 4 + plan_data['fat_grams'] * 9)) * 100
-            carbs_pct = (plan_data['carbs_grams'] * 4 / (plan_data['protein_grams'] * 4 + plan_data['carbs_grams'] * 4 + plan_data['fat_grams'] * 9)) * 100
-            fat_pct = (plan_data['fat_grams'] * 9 / (plan_data['protein_grams'] * 4 + plan_data['carbs_grams'] * 4 + plan_data['fat_grams'] * 9)) * 100
-            
-            response += f"\n*Распределение макросов:*\n"
-            response += f"• Белки: {protein_pct:.1f}%\n"
-            response += f"• Углеводы: {carbs_pct:.1f}%\n"
-            response += f"• Жиры: {fat_pct:.1f}%\n"
-    
-    # Общие рекомендации
-    if plan_data.get('general_recommendations'):
-        response += f"\n🌟 *Общие рекомендации:*\n{plan_data['general_recommendations']}\n"
+def saved_plans_keyboard(plans: List[Dict], next_cursor: Optional[Tuple[datetime, int]],
+                         is_first_page: bool = True) -> InlineKeyboardMarkup:
+    """Клавиатура страницы сохраненных планов"""
+    keyboard = []
+    for plan in plans:
+        plan_date = plan['created_at'].strftime('%d.%m.%Y')
+        keyboard.append([
+            InlineKeyboardButton(
+                f"План от {plan_date} ({plan['plan_type']})",
+                callback_data=encode_callback('view_plan', plan['id'])
+            )
+        ])
     
-    # Список покупок
-    if plan_data.get('shopping_list'):
-        response += f"\n🛒 *Список покупок:*\n"
-        for i, item in enumerate(plan_data['shopping_list'][:10], 1):  # Первые 10 items
-            response += f"{i}. {item}\n"
-        if len(plan_data['shopping_list']) > 10:
-            response += f"... и еще {len(plan_data['shopping_list']) - 10} позиций\n"
+    nav_buttons = []
+    if not is_first_page:
+        nav_buttons.append(InlineKeyboardButton("⏮ В начало", callback_data=encode_callback('plans_page')))
+    if next_cursor:
+        nav_buttons.append(InlineKeyboardButton("Дальше ▶️", callback_data=encode_callback('plans_page', *encode_page_cursor(next_cursor))))
+    if nav_buttons:
+        keyboard.append(nav_buttons)
     
-    return response
+    keyboard.append([_BACK_TO_MENU_BUTTON])
+    return InlineKeyboardMarkup(keyboard)
 
 def validate_date(date_str: str) -> Optional[date]:
     """Валидация даты в формате ДД.ММ.ГГГГ"""
@@ -154,6 +185,9 @@ def validate_number(input_str: str, min_val: float = None, max_val: float = None
     """Валидация числового ввода"""
     try:
         num = float(input_str.replace(',', '.'))
+        # float() принимает "nan" и "inf": такие значения не проходят сравнения с границами
+        if not math.isfinite(num):
+            return None
         if min_val is not None and num < min_val:
             return None
         if max_val is not None and num > max_val:
@@ -165,9 +199,9 @@ def validate_number(input_str: str, min_val: float = None, max_val: float = None
 def validate_gender(gender_str: str) -> Optional[str]:
     """Валидация ввода пола"""
     gender = gender_str.lower()
-    if gender in ['мужской', 'муж', 'm', 'male']:
+    if gender in ['мужской', 'муж', 'м', 'm', 'male']:
         return 'male'
-    elif gender in ['женский', 'жен', 'f', 'female']:
+    elif gender in ['женский', 'жен', 'ж', 'f', 'female']:
         return 'female'
     return None
 
@@ -0,0 +1,136 @@
+"""
+HTTP-сервер бота на aiohttp
+Вебхук Telegram, проверки здоровья (/health, /healthz) и метрики
+в формате Prometheus (/metrics) на одном порту
+"""
+
+import asyncio
+import hmac
+import logging
+import resource
+import signal
+import time
+from typing import Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from config import config
+from database import db
+from llm_integration import llm
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_UPDATES = ['message', 'callback_query']
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _resident_memory_bytes() -> float:
+    """Резидентная память процесса (на Linux - текущая, иначе - пиковая)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+metrics.register_gauge('process_resident_memory_bytes', _resident_memory_bytes)
+metrics.register_gauge('process_cpu_seconds', time.process_time)
+
+
+async def webhook(request: web.Request) -> web.Response:
+    """Обновление от Telegram: в очередь приложения"""
+    application: Application = request.app['application']
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    await application.update_queue.put(Update.de_json(data, application.bot))
+    return web.Response()
+
+
+async def health(request: web.Request) -> web.Response:
+    """Процесс жив и обрабатывает HTTP-запросы"""
+    return web.json_response({'status': 'ok'})
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """Готовность: соединение с БД и состояние цепи DeepSeek"""
+    database_ok = db.ping()
+    llm_state = llm.breaker.state
+    if not database_ok:
+        status = 'unavailable'
+    elif llm_state != llm.breaker.CLOSED:
+        # Без LLM бот работает на шаблонах и запасных вопросах
+        status = 'degraded'
+    else:
+        status = 'ok'
+    return web.json_response(
+        {'status': status, 'database': 'ok' if database_ok else 'error', 'llm': llm_state},
+        status=200 if database_ok else 503
+    )
+
+
+async def prometheus_metrics(request: web.Request) -> web.Response:
+    """Метрики в формате Prometheus"""
+    if config.METRICS_TOKEN:
+        expected = f"Bearer {config.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return web.Response(status=401)
+    return web.Response(body=metrics.render_prometheus().encode('utf-8'),
+                        headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+
+def create_web_app(application: Application, webhook_path: Optional[str] = None) -> web.Application:
+    """aiohttp-приложение с вебхуком (если задан путь) и служебными маршрутами"""
+    web_app = web.Application()
+    web_app['application'] = application
+    if webhook_path:
+        web_app.router.add_post(webhook_path, webhook)
+    web_app.router.add_get('/health', health)
+    web_app.router.add_get('/healthz', healthz)
+    web_app.router.add_get('/metrics', prometheus_metrics)
+    return web_app
+
+
+async def serve(application: Application, port: int, webhook_url: Optional[str] = None) -> None:
+    """
+    Запустить бота и HTTP-сервер до SIGINT/SIGTERM.
+
+    С webhook_url обновления приходят на вебхук, иначе бот опрашивает
+    Telegram (polling), а сервер отдает только служебные маршруты.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    runner = web.AppRunner(create_web_app(application, f"/{config.BOT_TOKEN}" if webhook_url else None))
+    await runner.setup()
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if webhook_url:
+            await application.bot.set_webhook(webhook_url, allowed_updates=ALLOWED_UPDATES,
+                                              drop_pending_updates=True)
+        else:
+            await application.updater.start_polling(allowed_updates=ALLOWED_UPDATES, drop_pending_updates=True)
+
+        await web.TCPSite(runner, '0.0.0.0', port).start()
+        logger.info(f"🌐 HTTP-сервер запущен на порту {port}")
+        try:
+            await stop.wait()
+        finally:
+            logger.info("🛑 Остановка бота")
+            await runner.cleanup()
+            if application.updater and application.updater.running:
+                await application.updater.stop()
+            await application.stop()